@@ -16,34 +16,13 @@ if [[ -z "$source_paths" ]]; then
   exit 0
 fi
 
-# Update metadata of dbt sources one by one.
+# Update metadata of dbt sources in a process.
 # NOTE: append `--dry_run` if `$dry_run` is not 0.
 # shellcheck disable=SC2046
-# shellcheck disable=SC2005
-for source_path in ${source_paths}; do
-  # Validate the file.
-  if [[ ! -f "$source_path" ]]; then
-    echo "WARN: ${source_path} is not a file."
-    continue
-  fi
-
-  # Update metadata.
-  # NOTE:
-  # It doesn't use '--client_project' option,
-  # because we have to set a GCP project with the default credentials.
-  echo "update ${source_path}"
-  if [[ -z "$client_project" ]]; then
-    dbt-helper source update-from-source \
-      --models_dir "$models_dir" \
-      --vars_path "$vars_path" \
-      --source_path "$source_path" \
-      --client_project "$client_project" \
-      $([[ $dry_run -ne 0 ]] && echo "--dry_run")
-  else
-    dbt-helper source update-from-source \
-      --models_dir "$models_dir" \
-      --vars_path "$vars_path" \
-      --source_path "$source_path" \
-      $([[ $dry_run -ne 0 ]] && echo "--dry_run")
-  fi
-done
+echo "$source_paths" |
+  dbt-helper source update-from-sources \
+    --models_dir "$models_dir" \
+    --vars_path "$vars_path" \
+    --source_paths_from_stdin \
+    $([[ -n "$client_project" ]] && echo "--client_project $client_project") \
+    $([[ $dry_run -ne 0 ]] && echo "--dry_run")
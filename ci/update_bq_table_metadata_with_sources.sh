@@ -33,25 +33,15 @@ source_paths=$(
 )
 echo "# selected resources: $(echo "$source_paths" | wc -w)"
 
-# Update metadata of dbt sources one by one.
+# Update metadata of dbt sources in a process.
 # NOTE: append `--dry_run` if `$dry_run` is not 0.
+# NOTE:
+# It doesn't use '--client_project' option,
+# because we have to set a GCP project with the default credentials.
 # shellcheck disable=SC2046
-# shellcheck disable=SC2005
-for source_path in ${source_paths}; do
-  # Validate the file.
-  if [[ ! -f "$source_path" ]]; then
-    echo "WARN: ${source_path} is not a file."
-    continue
-  fi
-
-  # Update metadata.
-  # NOTE:
-  # It doesn't use '--client_project' option,
-  # because we have to set a GCP project with the default credentials.
-  echo "update ${source_path}"
-  dbt-helper source update-from-source \
+echo "$source_paths" |
+  dbt-helper source update-from-sources \
     --models_dir "$models_dir" \
     --vars_path "$vars_path" \
-    --source_path "$source_path" \
+    --source_paths_from_stdin \
     $([[ $dry_run -ne 0 ]] && echo "--dry_run")
-done
@@ -0,0 +1,231 @@
+# -*- coding: utf-8 -*-
+
+#
+# Licensed to the Apache Software Foundation (ASF) under one or more
+# contributor license agreements.  See the NOTICE file distributed with
+# this work for additional information regarding copyright ownership.
+# The ASF licenses this file to You under the Apache License, Version 2.0
+# (the "License"); you may not use this file except in compliance with
+# the License.  You may obtain a copy of the License at
+#
+#    http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+#
+"""Benchmark CLI commands end to end against a local fake BigQuery server.
+
+Usage:
+    python -m benchmarks.bench_cli_with_fake_server \\
+        --num_tables 100 --num_fields 200 --latency 0.02 --concurrency 8
+"""
+from __future__ import absolute_import, division, print_function
+
+import argparse
+import json
+import os
+import shutil
+import tempfile
+import time
+from typing import Dict, List
+from unittest import mock
+
+from click.testing import CliRunner
+
+from dbt_helper.bigquery import API_ENDPOINT_ENV, close_shared_bigquery_clients
+from dbt_helper.cli.main import cli
+from dbt_helper.renderer.v2.source import find_source_schema_paths
+from dbt_helper.testing.fake_server import FakeBigQueryServer
+
+from benchmarks.fixtures import generate_nested_schema
+
+PROJECT = "benchmark-project-prod"
+PROJECT_ALIAS = "benchmark-project"
+DATASET = "benchmark_dataset"
+
+
+def seed_tables(
+        server: FakeBigQueryServer, num_tables: int, num_fields: int,
+        description: str):
+    """Add synthetic tables to the fake server
+
+    Args:
+        server (FakeBigQueryServer): the fake server
+        num_tables (int): the number of tables
+        num_fields (int): the number of leaf fields of each table
+        description (str): description of the tables
+    """
+    schema = [
+        field.to_api_repr()
+        for field in generate_nested_schema(num_fields=num_fields)
+    ]
+    for i in range(num_tables):
+        server.add_table(
+            project=PROJECT,
+            dataset_id=DATASET,
+            table_id="table_{}".format(i),
+            schema=schema,
+            description=description,
+            labels={"owner": "benchmark"})
+
+
+def write_manifest(path: str, num_tables: int):
+    """Write a manifest.json whose models are all disabled
+
+    Args:
+        path (str): path to the manifest.json
+        num_tables (int): the number of tables
+    """
+    disabled = [
+        {
+            "unique_id": "model.benchmark.table_{}".format(i),
+            "resource_type": "model",
+            "database": PROJECT,
+            "schema": DATASET,
+            "alias": "table_{}".format(i),
+            "name": "table_{}".format(i),
+            "config": {
+                "enabled": False,
+                "materialized": "table"
+            },
+        } for i in range(num_tables)
+    ]
+    with open(path, "w") as f:
+        json.dump({"disabled": disabled}, f)
+
+
+def invoke(server: FakeBigQueryServer, args: List[str]) -> Dict[str, float]:
+    """Invoke a CLI command and measure it
+
+    Args:
+        server (FakeBigQueryServer): the fake server
+        args (List[str]): arguments of the command
+
+    Returns:
+        dict: elapsed seconds and the number of API requests
+    """
+    close_shared_bigquery_clients()
+    num_requests = sum(server.request_counts.values())
+    start = time.perf_counter()
+    result = CliRunner().invoke(cli, args, catch_exceptions=False)
+    elapsed = time.perf_counter() - start
+    if result.exit_code != 0:
+        raise RuntimeError(
+            "Failed to run {}: {}".format(" ".join(args), result.output))
+    return {
+        "elapsed_seconds": elapsed,
+        "requests": sum(server.request_counts.values()) - num_requests,
+    }
+
+
+def run(num_tables: int, num_fields: int, latency: float,
+        concurrency: int) -> Dict[str, Dict[str, float]]:
+    """Run the benchmark
+
+    Args:
+        num_tables (int): the number of tables
+        num_fields (int): the number of leaf fields of each table
+        latency (float): latency of each API request in seconds
+        concurrency (int): the number of threads of commands
+
+    Returns:
+        dict: results of each command
+    """
+    temp_dir = tempfile.mkdtemp()
+    models_dir = os.path.join(temp_dir, "models")
+    os.makedirs(models_dir)
+    vars_path = os.path.join(temp_dir, "vars.yml")
+    with open(vars_path, "w") as f:
+        f.write("projects:\n  {}: {}\n".format(PROJECT_ALIAS, PROJECT))
+    manifest_path = os.path.join(temp_dir, "manifest.json")
+    write_manifest(path=manifest_path, num_tables=num_tables)
+
+    results = {}
+    with FakeBigQueryServer(latency=latency) as server:
+        environ = {
+            API_ENDPOINT_ENV: server.url,
+            "GOOGLE_CLOUD_PROJECT": PROJECT
+        }
+        with mock.patch.dict(os.environ, environ):
+            seed_tables(
+                server,
+                num_tables=num_tables,
+                num_fields=num_fields,
+                description="imported")
+            results["importing"] = invoke(
+                server, [
+                    "source", "importing", "--models_dir", models_dir,
+                    "--project", PROJECT, "--project_alias", PROJECT_ALIAS,
+                    "--dataset", DATASET, "--table", ".*", "--overwrite",
+                    "--concurrency",
+                    str(concurrency)
+                ])
+
+            # Make the tables different from the imported sources.
+            seed_tables(
+                server,
+                num_tables=num_tables,
+                num_fields=num_fields,
+                description="stale")
+            results["update"] = invoke(
+                server, [
+                    "source", "update", "--models_dir", models_dir,
+                    "--vars_path", vars_path, "--project_alias", PROJECT_ALIAS,
+                    "--dataset", DATASET
+                ])
+
+            seed_tables(
+                server,
+                num_tables=num_tables,
+                num_fields=num_fields,
+                description="stale")
+            source_paths = list(
+                find_source_schema_paths(
+                    models_dir=models_dir,
+                    project_alias=PROJECT_ALIAS,
+                    dataset=DATASET))
+            update_dbt_source = {"elapsed_seconds": 0.0, "requests": 0}
+            for source_path in source_paths:
+                result = invoke(
+                    server, [
+                        "source", "update-dbt-source", "--vars_path", vars_path,
+                        "--models_dir", models_dir, "--source_path", source_path
+                    ])
+                for key, value in result.items():
+                    update_dbt_source[key] += value
+            results["update-dbt-source"] = update_dbt_source
+
+            results["drop-disabled-models"] = invoke(
+                server, [
+                    "model", "drop-disabled-models", "--manifest",
+                    manifest_path, "--delete_empty_dataset"
+                ])
+    close_shared_bigquery_clients()
+    shutil.rmtree(temp_dir)
+    return results
+
+
+def main():
+    """Show results of the benchmark"""
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--num_tables", type=int, default=100)
+    parser.add_argument("--num_fields", type=int, default=200)
+    parser.add_argument("--latency", type=float, default=0.02)
+    parser.add_argument("--concurrency", type=int, default=8)
+    args = parser.parse_args()
+    results = run(
+        num_tables=args.num_tables,
+        num_fields=args.num_fields,
+        latency=args.latency,
+        concurrency=args.concurrency)
+    for name, result in results.items():
+        print(
+            "{:>20}: {:>8.3f} sec, {:>6} requests".format(
+                name, result["elapsed_seconds"], result["requests"]))
+
+
+if __name__ == "__main__":
+    main()
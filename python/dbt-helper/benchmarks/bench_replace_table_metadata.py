@@ -0,0 +1,107 @@
+# -*- coding: utf-8 -*-
+
+#
+# Licensed to the Apache Software Foundation (ASF) under one or more
+# contributor license agreements.  See the NOTICE file distributed with
+# this work for additional information regarding copyright ownership.
+# The ASF licenses this file to You under the Apache License, Version 2.0
+# (the "License"); you may not use this file except in compliance with
+# the License.  You may obtain a copy of the License at
+#
+#    http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+#
+"""Benchmark memory usage of `replace_bq_table_metadata`.
+
+Usage:
+    python -m benchmarks.bench_replace_table_metadata --num_fields 5000
+"""
+from __future__ import absolute_import, division, print_function
+
+import argparse
+import copy
+import time
+import tracemalloc
+from typing import Callable, Dict
+
+from google.cloud import bigquery
+
+from dbt_helper.bigquery import (
+    merge_bigquery_labels, replace_bq_table_metadata,
+    update_schema_metadata_with_dbt_source_table)
+from dbt_helper.parser.v2.source import DbtSourceTable
+
+from benchmarks.fixtures import generate_bq_table, generate_dbt_source_table
+
+
+def replace_with_deepcopy(
+        table: bigquery.Table,
+        dbt_source_table: DbtSourceTable) -> bigquery.Table:
+    """The former implementation which deeply copies the whole table."""
+    replaced_table = copy.deepcopy(table)
+    replaced_table.description = dbt_source_table.description
+    replaced_table.labels = merge_bigquery_labels(
+        base_labels=replaced_table.labels, new_labels=dbt_source_table.meta)
+    replaced_table.schema = update_schema_metadata_with_dbt_source_table(
+        schema=table.schema, dbt_source_table=dbt_source_table)
+    return replaced_table
+
+
+def measure(func: Callable[[], object]) -> Dict[str, float]:
+    """Measure the peak memory and the elapsed time of a function
+
+    Args:
+        func: a function to measure
+
+    Returns:
+        dict: peak memory in bytes and elapsed time in seconds
+    """
+    tracemalloc.start()
+    start = time.perf_counter()
+    result = func()
+    elapsed = time.perf_counter() - start
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    del result
+    return {"peak_bytes": peak, "elapsed_seconds": elapsed}
+
+
+def run(num_fields: int) -> Dict[str, Dict[str, float]]:
+    """Run the benchmark
+
+    Args:
+        num_fields (int): the number of leaf fields of the synthetic table
+
+    Returns:
+        dict: results of each implementation
+    """
+    table = generate_bq_table(num_fields=num_fields)
+    dbt_source_table = generate_dbt_source_table(table.schema)
+    return {
+        "deepcopy":
+            measure(lambda: replace_with_deepcopy(table, dbt_source_table)),
+        "patch":
+            measure(lambda: replace_bq_table_metadata(table, dbt_source_table)),
+    }
+
+
+def main():
+    """Show results of the benchmark"""
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--num_fields", type=int, default=5000)
+    args = parser.parse_args()
+    results = run(num_fields=args.num_fields)
+    for name, result in results.items():
+        print(
+            "{:>10}: peak {:>8.2f} MiB, {:>8.3f} sec".format(
+                name, result["peak_bytes"] / 1024 / 1024,
+                result["elapsed_seconds"]))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,88 @@
+# -*- coding: utf-8 -*-
+
+#
+# Licensed to the Apache Software Foundation (ASF) under one or more
+# contributor license agreements.  See the NOTICE file distributed with
+# this work for additional information regarding copyright ownership.
+# The ASF licenses this file to You under the Apache License, Version 2.0
+# (the "License"); you may not use this file except in compliance with
+# the License.  You may obtain a copy of the License at
+#
+#    http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+#
+"""Compare results of the benchmark suite between commits.
+
+Usage:
+    python -m benchmarks.compare base.json head.json --threshold 0.1
+"""
+from __future__ import absolute_import, division, print_function
+
+import argparse
+import sys
+from typing import Any, Dict, List, Tuple
+
+from dbt_helper.utils import load_json
+
+
+def compare_results(
+        base: Dict[str, Any], head: Dict[str, Any],
+        threshold: float) -> List[Tuple[str, float, float, float, bool]]:
+    """Compare median elapsed time of common cases
+
+    Args:
+        base (dict): a report of the base commit
+        head (dict): a report of the head commit
+        threshold (float): allowed ratio of slowdown (e.g. 0.1 for 10%)
+
+    Returns:
+        list: tuples of a case name, base median, head median,
+            a ratio of head to base, and if it is regressed or not
+    """
+    rows = []
+    for name, base_result in base["results"].items():
+        head_result = head["results"].get(name)
+        if head_result is None:
+            continue
+        ratio = head_result["median"] / base_result["median"]
+        is_regressed = ratio > 1.0 + threshold
+        rows.append(
+            (
+                name, base_result["median"], head_result["median"], ratio,
+                is_regressed))
+    return rows
+
+
+def main():
+    """Show a comparison and exit with 1 if any case is regressed"""
+    parser = argparse.ArgumentParser()
+    parser.add_argument("base", type=str, help="a JSON file of the base")
+    parser.add_argument("head", type=str, help="a JSON file of the head")
+    parser.add_argument("--threshold", type=float, default=0.1)
+    args = parser.parse_args()
+
+    base = load_json(args.base)
+    head = load_json(args.head)
+    for report in [base, head]:
+        if report["metadata"]["scale"] != base["metadata"]["scale"]:
+            print("[WARN] scales are different", file=sys.stderr)
+    rows = compare_results(base=base, head=head, threshold=args.threshold)
+    print(
+        "{:>25} {:>12} {:>12} {:>8}".format(
+            "case", "base (sec)", "head (sec)", "ratio"))
+    for name, base_median, head_median, ratio, is_regressed in rows:
+        print(
+            "{:>25} {:>12.4f} {:>12.4f} {:>7.2f}x{}".format(
+                name, base_median, head_median, ratio,
+                " REGRESSED" if is_regressed else ""))
+    if any(row[4] for row in rows):
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
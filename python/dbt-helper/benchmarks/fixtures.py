@@ -0,0 +1,246 @@
+# -*- coding: utf-8 -*-
+
+#
+# Licensed to the Apache Software Foundation (ASF) under one or more
+# contributor license agreements.  See the NOTICE file distributed with
+# this work for additional information regarding copyright ownership.
+# The ASF licenses this file to You under the Apache License, Version 2.0
+# (the "License"); you may not use this file except in compliance with
+# the License.  You may obtain a copy of the License at
+#
+#    http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+#
+
+from __future__ import absolute_import, division, print_function
+
+import json
+import os
+from typing import Any, Dict, List
+
+from google.cloud import bigquery
+
+from dbt_helper.parser.bigquery import extract_schema_info
+from dbt_helper.parser.v2.source import DbtSourceTable, DbtSourceTableColumn
+from dbt_helper.renderer.v2.source import (
+    _render_source_yaml_for_bq_table, get_source_yaml_file_name)
+from dbt_helper.utils import get_table_dir
+
+
+def generate_nested_schema(
+        num_fields: int, num_children: int = 50) -> List[bigquery.SchemaField]:
+    """Generate a synthetic schema with nested fields
+
+    Args:
+        num_fields (int): the number of leaf fields
+        num_children (int): the number of leaf fields under a STRUCT field
+
+    Returns:
+        List[bigquery.SchemaField]: A list of schema fields
+    """
+    schema = []
+    num_generated = 0
+    while num_generated < num_fields:
+        index = len(schema)
+        size = min(num_children, num_fields - num_generated)
+        if index % 2 == 0:
+            # A STRUCT field whose last child is a nested STRUCT field.
+            children = [
+                bigquery.SchemaField(
+                    "field_{}".format(i),
+                    "STRING",
+                    description="description of field_{}".format(i))
+                for i in range(size - 1)
+            ]
+            children.append(
+                bigquery.SchemaField(
+                    "nested",
+                    "RECORD",
+                    mode="REPEATED",
+                    fields=[bigquery.SchemaField("leaf", "INTEGER")]))
+            schema.append(
+                bigquery.SchemaField(
+                    "struct_{}".format(index), "STRUCT", fields=children))
+            num_generated += size
+        else:
+            schema.append(
+                bigquery.SchemaField(
+                    "column_{}".format(index),
+                    "TIMESTAMP",
+                    description="description of column_{}".format(index)))
+            num_generated += 1
+    return schema
+
+
+def generate_bq_table(num_fields: int) -> bigquery.Table:
+    """Generate a synthetic BigQuery table
+
+    Args:
+        num_fields (int): the number of leaf fields
+
+    Returns:
+        bigquery.Table: A BigQuery table
+    """
+    table = bigquery.Table(
+        "benchmark-project.benchmark_dataset.benchmark_table",
+        schema=generate_nested_schema(num_fields=num_fields))
+    table.description = "benchmark table"
+    table.labels = {"owner": "benchmark", "contains_pii": "false"}
+    return table
+
+
+def generate_dbt_source_table(
+        schema: List[bigquery.SchemaField]) -> DbtSourceTable:
+    """Generate a dbt source table whose columns match a schema
+
+    Args:
+        schema (List[bigquery.SchemaField]): A list of schema fields
+
+    Returns:
+        DbtSourceTable: A dbt source table with updated descriptions
+    """
+    columns = [
+        DbtSourceTableColumn(
+            name=schema_info.name,
+            description="updated description of {}".format(schema_info.name))
+        for schema_info in extract_schema_info(schema)
+    ]
+    return DbtSourceTable(
+        name="benchmark_table",
+        description="updated benchmark table",
+        meta={"owner": "benchmark"},
+        identifier="benchmark_table",
+        columns=columns)
+
+
+def render_source_yaml(
+        project_alias: str, dataset: str, table: str,
+        schema: List[bigquery.SchemaField]) -> str:
+    """Render a dbt source YAML of a synthetic table
+
+    Args:
+        project_alias (str): GCP project alias
+        dataset (str): BigQuery dataset ID
+        table (str): BigQuery table ID
+        schema (List[bigquery.SchemaField]): A list of schema fields
+
+    Returns:
+        str: A rendered dbt source YAML
+    """
+    return _render_source_yaml_for_bq_table(
+        project="{}-prod".format(project_alias),
+        project_alias=project_alias,
+        dataset=dataset,
+        table=table,
+        table_description="description of {}".format(table),
+        columns=extract_schema_info(schema),
+        labels={"owner": "benchmark"})
+
+
+def write_source_project(
+        models_dir: str,
+        num_files: int,
+        num_fields: int = 10,
+        num_datasets: int = 10,
+        project_alias: str = "benchmark-project") -> List[str]:
+    """Write a synthetic dbt project with dbt source YAML files
+
+    Files are laid out as `{models_dir}/{project}/{dataset}/{table}/`.
+
+    Args:
+        models_dir (str): path to the dbt models dir
+        num_files (int): the number of dbt source YAML files
+        num_fields (int): the number of leaf fields of each table
+        num_datasets (int): the number of datasets
+        project_alias (str): GCP project alias
+
+    Returns:
+        List[str]: paths to the written files
+    """
+    schema = generate_nested_schema(num_fields=num_fields)
+    paths = []
+    for i in range(num_files):
+        dataset = "dataset_{}".format(i % num_datasets)
+        table = "table_{}".format(i)
+        table_dir = get_table_dir(
+            models_dir=models_dir,
+            project=project_alias,
+            dataset=dataset,
+            table=table)
+        os.makedirs(table_dir, exist_ok=True)
+        path = os.path.join(
+            table_dir,
+            get_source_yaml_file_name(
+                project_alias=project_alias, dataset=dataset, table=table))
+        with open(path, "w") as f:
+            f.write(
+                render_source_yaml(
+                    project_alias=project_alias,
+                    dataset=dataset,
+                    table=table,
+                    schema=schema))
+        paths.append(path)
+    return paths
+
+
+def generate_manifest(num_nodes: int,
+                      disabled_ratio: float = 0.2) -> Dict[str, Any]:
+    """Generate a synthetic manifest.json
+
+    Args:
+        num_nodes (int): the number of model nodes
+        disabled_ratio (float): the ratio of disabled nodes
+
+    Returns:
+        dict: A JSON object of manifest.json v1
+    """
+    nodes = {}
+    disabled = []
+    num_disabled = int(num_nodes * disabled_ratio)
+    for i in range(num_nodes):
+        unique_id = "model.benchmark.model_{}".format(i)
+        node = {
+            "unique_id": unique_id,
+            "package_name": "benchmark",
+            "root_path": "/benchmark",
+            "path": "benchmark/model_{}.sql".format(i),
+            "original_file_path": "models/benchmark/model_{}.sql".format(i),
+            "resource_type": "model",
+            "database": "benchmark-project-prod",
+            "schema": "dataset_{}".format(i % 100),
+            "alias": "model_{}".format(i),
+            "name": "model_{}".format(i),
+            "fqn": ["benchmark", "model_{}".format(i)],
+            "config": {
+                "enabled": i >= num_disabled,
+                "materialized": "table",
+            },
+        }
+        if i < num_disabled:
+            disabled.append(node)
+        else:
+            nodes[unique_id] = node
+    return {
+        "dbt_schema_version": "https://schemas.getdbt.com/dbt/manifest/v1.json",
+        "dbt_version": "0.19.0",
+        "generated_at": "2021-01-01T00:00:00.000000Z",
+        "adapter_type": "bigquery",
+        "nodes": nodes,
+        "disabled": disabled,
+    }
+
+
+def write_manifest(path: str, num_nodes: int):
+    """Write a synthetic manifest.json
+
+    Args:
+        path (str): path to the written file
+        num_nodes (int): the number of model nodes
+    """
+    with open(path, "w") as f:
+        json.dump(generate_manifest(num_nodes=num_nodes), f)
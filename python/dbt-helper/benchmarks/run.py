@@ -0,0 +1,278 @@
+# -*- coding: utf-8 -*-
+
+#
+# Licensed to the Apache Software Foundation (ASF) under one or more
+# contributor license agreements.  See the NOTICE file distributed with
+# this work for additional information regarding copyright ownership.
+# The ASF licenses this file to You under the Apache License, Version 2.0
+# (the "License"); you may not use this file except in compliance with
+# the License.  You may obtain a copy of the License at
+#
+#    http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+#
+"""Run the benchmark suite of dbt-helper hot paths.
+
+Results are stored as JSON, so that they can be compared between commits
+with `python -m benchmarks.compare`.
+
+Usage:
+    python -m benchmarks.run --output benchmarks/results/head.json
+    python -m benchmarks.run --scale small --case compare --case extract_schema_info
+"""
+from __future__ import absolute_import, division, print_function
+
+import argparse
+import datetime
+import gc
+import json
+import os
+import platform
+import shutil
+import statistics
+import subprocess
+import tempfile
+import time
+from collections import OrderedDict
+from typing import Any, Callable, Dict, List, Optional
+
+from dbt_helper.parser.artifacts.manifest.manifest_v1 import ManifestV1
+from dbt_helper.parser.bigquery import extract_schema_info
+from dbt_helper.renderer.v2.source import (
+    _render_source_yaml_for_bq_dataset, _render_source_yaml_for_bq_table,
+    find_source_schema_paths)
+from dbt_helper.source_loader import DbtSourcesLoader
+from dbt_helper.tools.v2.source_updater import SourceTableUpdaterV2
+from dbt_helper.utils import get_ruamel_yaml, load_json
+
+from benchmarks.fixtures import (
+    generate_bq_table, generate_dbt_source_table, generate_nested_schema,
+    render_source_yaml, write_manifest, write_source_project)
+
+# Sizes of synthetic fixtures.
+SCALES = {
+    "full": {
+        "num_source_files": 10000,
+        "num_fields": 5000,
+        "num_nodes": 50000,
+    },
+    "small": {
+        "num_source_files": 200,
+        "num_fields": 500,
+        "num_nodes": 2000,
+    },
+}
+
+# A case takes sizes of fixtures and a working directory.
+# It returns a factory of a function to measure, which is called per run.
+BenchmarkCase = Callable[[Dict[str, int], str], Callable[[], Callable[[], Any]]]
+
+
+def setup_find_source_schema_paths(params: Dict[str, int], work_dir: str):
+    """Find all the dbt source YAML files in a synthetic project"""
+    models_dir = os.path.join(work_dir, "models")
+    write_source_project(
+        models_dir=models_dir, num_files=params["num_source_files"])
+
+    def create_run():
+        # A new loader is created per run not to reuse parsed results.
+        loader = DbtSourcesLoader()
+        return lambda: list(
+            find_source_schema_paths(models_dir=models_dir, loader=loader))
+
+    return create_run
+
+
+def setup_extract_schema_info(params: Dict[str, int], work_dir: str):  # pylint: disable=W0613
+    """Flatten a nested BigQuery schema"""
+    schema = generate_nested_schema(num_fields=params["num_fields"])
+    return lambda: lambda: extract_schema_info(schema)
+
+
+def setup_update_columns(params: Dict[str, int], work_dir: str):  # pylint: disable=W0613
+    """Update columns of a dbt source YAML with a partially changed schema"""
+    yaml_text = render_source_yaml(
+        project_alias="benchmark-project",
+        dataset="benchmark_dataset",
+        table="benchmark_table",
+        schema=generate_nested_schema(num_fields=params["num_fields"]))
+    # Different sizes of STRUCT fields add, remove and move columns.
+    new_schema = generate_nested_schema(
+        num_fields=params["num_fields"], num_children=45)
+    yaml = get_ruamel_yaml()
+
+    def create_run():
+        updater = SourceTableUpdaterV2.loads(yaml.load(yaml_text))
+        return lambda: updater.update_columns(new_schema)
+
+    return create_run
+
+
+def setup_compare(params: Dict[str, int], work_dir: str):  # pylint: disable=W0613
+    """Compare a dbt source table with a BigQuery table"""
+    table = generate_bq_table(num_fields=params["num_fields"])
+
+    def create_run():
+        # A new object is created per run not to reuse its column index.
+        dbt_source_table = generate_dbt_source_table(table.schema)
+        return lambda: dbt_source_table.compare(table)
+
+    return create_run
+
+
+def setup_render_source_table(params: Dict[str, int], work_dir: str):  # pylint: disable=W0613
+    """Render a dbt source YAML of a table with many columns"""
+    columns = extract_schema_info(
+        generate_nested_schema(num_fields=params["num_fields"]))
+    return lambda: lambda: _render_source_yaml_for_bq_table(
+        project="benchmark-project-prod",
+        project_alias="benchmark-project",
+        dataset="benchmark_dataset",
+        table="benchmark_table",
+        table_description="benchmark table",
+        columns=columns,
+        labels={"owner": "benchmark"})
+
+
+def setup_render_source_datasets(params: Dict[str, int], work_dir: str):  # pylint: disable=W0613
+    """Render dbt source YAMLs of 100 datasets"""
+
+    def run():
+        for i in range(100):
+            _render_source_yaml_for_bq_dataset(
+                project="benchmark-project-prod",
+                project_alias="benchmark-project",
+                dataset="dataset_{}".format(i),
+                dataset_description="benchmark dataset",
+                dataset_labels={"owner": "benchmark"})
+
+    return lambda: run
+
+
+def setup_parse_manifest(params: Dict[str, int], work_dir: str):
+    """Load and parse a manifest.json with many nodes"""
+    path = os.path.join(work_dir, "manifest.json")
+    write_manifest(path=path, num_nodes=params["num_nodes"])
+    return lambda: lambda: ManifestV1.parse(load_json(path))
+
+
+CASES = OrderedDict(
+    [
+        ("find_source_schema_paths", setup_find_source_schema_paths),
+        ("extract_schema_info", setup_extract_schema_info),
+        ("update_columns", setup_update_columns),
+        ("compare", setup_compare),
+        ("render_source_table", setup_render_source_table),
+        ("render_source_datasets", setup_render_source_datasets),
+        ("parse_manifest", setup_parse_manifest),
+    ])  # type: Dict[str, BenchmarkCase]
+
+
+def measure(create_run: Callable[[], Callable[[], Any]],
+            repeat: int) -> Dict[str, Any]:
+    """Measure elapsed time of runs
+
+    Args:
+        create_run: a factory of a function to measure
+        repeat (int): the number of runs
+
+    Returns:
+        dict: elapsed seconds of each run and their statistics
+    """
+    times = []
+    for _ in range(repeat):
+        run = create_run()
+        gc.collect()
+        start = time.perf_counter()
+        run()
+        times.append(time.perf_counter() - start)
+    return {
+        "times": times,
+        "min": min(times),
+        "median": statistics.median(times),
+        "mean": statistics.mean(times),
+    }
+
+
+def get_git_commit() -> Optional[str]:
+    """Get the current git commit if available"""
+    try:
+        return subprocess.check_output(
+            ["git", "rev-parse", "HEAD"],
+            stderr=subprocess.DEVNULL).decode("utf-8").strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def run_suite(scale: str,
+              repeat: int,
+              case_names: Optional[List[str]] = None) -> Dict[str, Any]:
+    """Run benchmark cases
+
+    Args:
+        scale (str): a key of `SCALES`
+        repeat (int): the number of runs per case
+        case_names (list): names of cases to run. All cases if it is None.
+
+    Returns:
+        dict: metadata and results of the cases
+    """
+    params = SCALES[scale]
+    if not case_names:
+        case_names = list(CASES.keys())
+    results = OrderedDict()
+    for case_name in case_names:
+        work_dir = tempfile.mkdtemp()
+        try:
+            create_run = CASES[case_name](params, work_dir)
+            results[case_name] = measure(create_run, repeat=repeat)
+        finally:
+            shutil.rmtree(work_dir)
+        print(
+            "{:>25}: median {:>9.4f} sec, min {:>9.4f} sec".format(
+                case_name, results[case_name]["median"],
+                results[case_name]["min"]))
+    return {
+        "metadata":
+            {
+                "commit": get_git_commit(),
+                "python": platform.python_version(),
+                "created_at": datetime.datetime.utcnow().isoformat(),
+                "scale": scale,
+                "params": params,
+                "repeat": repeat,
+            },
+        "results": results,
+    }
+
+
+def main():
+    """Run the benchmark suite and store the results"""
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--scale", choices=list(SCALES.keys()), default="full")
+    parser.add_argument("--repeat", type=int, default=3)
+    parser.add_argument(
+        "--case",
+        dest="cases",
+        action="append",
+        choices=list(CASES.keys()),
+        help="case to run (default: all)")
+    parser.add_argument("--output", type=str, help="path to a JSON file")
+    args = parser.parse_args()
+    report = run_suite(
+        scale=args.scale, repeat=args.repeat, case_names=args.cases)
+    if args.output:
+        output_dir = os.path.dirname(os.path.abspath(args.output))
+        os.makedirs(output_dir, exist_ok=True)
+        with open(args.output, "w") as f:
+            json.dump(report, f, indent=2)
+        print("Results are stored in {}".format(args.output))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,245 @@
+# -*- coding: utf-8 -*-
+
+#
+# Licensed to the Apache Software Foundation (ASF) under one or more
+# contributor license agreements.  See the NOTICE file distributed with
+# this work for additional information regarding copyright ownership.
+# The ASF licenses this file to You under the Apache License, Version 2.0
+# (the "License"); you may not use this file except in compliance with
+# the License.  You may obtain a copy of the License at
+#
+#    http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+#
+
+from __future__ import absolute_import, division, print_function
+
+import asyncio
+import functools
+import threading
+import weakref
+from concurrent.futures import Executor, ThreadPoolExecutor
+from typing import Any, Callable, Dict, Iterable, List, Optional
+
+from google.cloud import bigquery
+
+from dbt_helper.bigquery import (
+    TableFetchResult, get_bigquery_dataset, get_bigquery_table,
+    get_bigquery_table_items, DEFAULT_CONCURRENCY)
+from dbt_helper.cache import MetadataCache
+
+
+class AsyncBigQueryClient:
+    """An asyncio interface of BigQuery metadata API
+
+    Blocking calls of a `bigquery.Client` run on a managed executor.
+    The number of in-flight calls is bounded by a semaphore per event loop,
+    so that thousands of coroutines can be awaited on a single event loop
+    with only `concurrency` threads. The object can be reused by event
+    loops one after another (e.g. repeated `asyncio.run`).
+
+    `update-dbt-source` uses it to fetch tables of all the datasets in a
+    file on an event loop at once.
+
+    Args:
+        client (bigquery.Client): BigQuery client
+        concurrency (int): the maximum number of in-flight calls
+        executor (Executor): an executor to run blocking calls.
+            A thread pool owned by the object is used, if it is None.
+        cache (MetadataCache): A cache of metadata on disk
+    """
+
+    def __init__(
+            self,
+            client: bigquery.Client,
+            concurrency: int = DEFAULT_CONCURRENCY,
+            executor: Optional[Executor] = None,
+            cache: Optional[MetadataCache] = None):
+        if concurrency < 1:
+            raise ValueError(
+                "concurrency must be positive: {}".format(concurrency))
+        self.client = client
+        self.concurrency = concurrency
+        self.cache = cache
+        self._is_own_executor = executor is None
+        self._executor = executor if executor is not None else ThreadPoolExecutor(
+            max_workers=concurrency)
+        # NOTE: a semaphore is bound to an event loop,
+        #       so one is created per running loop.
+        self._semaphores = weakref.WeakKeyDictionary()
+        self._semaphores_lock = threading.Lock()
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, exc_type, exc_value, traceback):
+        self.close()
+
+    def close(self):
+        """Shut down the owned executor. The BigQuery client isn't closed."""
+        if self._is_own_executor:
+            self._executor.shutdown(wait=True)
+
+    async def _call(self, func: Callable, *args, **kwargs) -> Any:
+        """Run a blocking call on the executor within the concurrency
+
+        Args:
+            func (Callable): a blocking function
+            *args: positional arguments of the function
+            **kwargs: keyword arguments of the function
+
+        Returns:
+            the result of the function
+        """
+        loop = asyncio.get_running_loop()
+        with self._semaphores_lock:
+            semaphore = self._semaphores.get(loop)
+            if semaphore is None:
+                semaphore = asyncio.Semaphore(self.concurrency)
+                self._semaphores[loop] = semaphore
+        async with semaphore:
+            return await loop.run_in_executor(
+                self._executor, functools.partial(func, *args, **kwargs))
+
+    async def get_dataset(self, project: str,
+                          dataset_id: str) -> Optional[bigquery.Dataset]:
+        """Get a BigQuery dataset
+
+        Args:
+            project (str): GCP project ID
+            dataset_id (str): BigQuery dataset ID
+
+        Returns:
+            bigquery.Dataset: A dataset or None if it doesn't exist
+        """
+        return await self._call(
+            get_bigquery_dataset,
+            client=self.client,
+            project=project,
+            dataset_id=dataset_id,
+            cache=self.cache)
+
+    async def list_tables(
+            self, project: str,
+            dataset_id: str) -> List[bigquery.table.TableListItem]:
+        """List BigQuery tables in a dataset
+
+        Args:
+            project (str): GCP project ID
+            dataset_id (str): BigQuery dataset ID
+
+        Returns:
+            list: A list of ``TableListItem``
+        """
+        return await self._call(
+            get_bigquery_table_items,
+            client=self.client,
+            project=project,
+            dataset_id=dataset_id)
+
+    async def get_table(
+            self,
+            project: str,
+            dataset_id: str,
+            table_id: str,
+            validator: Optional[Dict[str, Any]] = None,
+            refresh: bool = False) -> bigquery.Table:
+        """Get a BigQuery table
+
+        Args:
+            project (str): GCP project ID
+            dataset_id (str): BigQuery dataset ID
+            table_id (str): BigQuery table ID
+            validator (dict): values to revalidate a cached table
+            refresh (bool): fetch the table without reading the cache
+
+        Returns:
+            bigquery.Table: A table
+        """
+        return await self._call(
+            get_bigquery_table,
+            client=self.client,
+            project=project,
+            dataset_id=dataset_id,
+            table_id=table_id,
+            cache=self.cache,
+            validator=validator,
+            refresh=refresh)
+
+    async def get_tables(
+            self,
+            project: str,
+            dataset_id: str,
+            table_ids: Iterable[str],
+            validators: Optional[Dict[str, Dict[str, Any]]] = None,
+            refresh: bool = False) -> List[TableFetchResult]:
+        """Get BigQuery tables concurrently
+
+        A failure of a table doesn't abort the others.
+
+        Args:
+            project (str): GCP project ID
+            dataset_id (str): BigQuery dataset ID
+            table_ids (Iterable[str]): BigQuery table IDs
+            validators (dict): validators of cached tables by table ID
+            refresh (bool): fetch tables without reading the cache
+
+        Returns:
+            List[TableFetchResult]: results in the same order as `table_ids`
+        """
+
+        async def fetch(table_id: str) -> TableFetchResult:
+            try:
+                table = await self.get_table(
+                    project=project,
+                    dataset_id=dataset_id,
+                    table_id=table_id,
+                    validator=validators.get(table_id) if validators else None,
+                    refresh=refresh)
+                return TableFetchResult(table_id=table_id, table=table)
+            # pylint: disable=W0703
+            except Exception as e:
+                return TableFetchResult(table_id=table_id, error=e)
+
+        return list(
+            await asyncio.gather(*[fetch(table_id) for table_id in table_ids]))
+
+    async def update_dataset(
+            self, dataset: bigquery.Dataset,
+            fields: List[str]) -> bigquery.Dataset:
+        """Update fields of a BigQuery dataset
+
+        Args:
+            dataset (bigquery.Dataset): A dataset with updated values
+            fields (list): updated fields
+
+        Returns:
+            bigquery.Dataset: The updated dataset
+        """
+        updated = await self._call(
+            self.client.update_dataset, dataset=dataset, fields=fields)
+        if self.cache is not None:
+            self.cache.put_dataset(updated)
+        return updated
+
+    async def update_table(
+            self, table: bigquery.Table, fields: List[str]) -> bigquery.Table:
+        """Update fields of a BigQuery table
+
+        Args:
+            table (bigquery.Table): A table with updated values
+            fields (list): updated fields
+
+        Returns:
+            bigquery.Table: The updated table
+        """
+        updated = await self._call(
+            self.client.update_table, table=table, fields=fields)
+        if self.cache is not None:
+            self.cache.put_table(updated)
+        return updated
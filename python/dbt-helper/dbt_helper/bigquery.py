@@ -19,29 +19,199 @@
 
 from __future__ import absolute_import, division, print_function
 
-import copy
-from typing import List, Dict, Optional
-
+import os
+import re
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass
+from typing import (
+    Any, Callable, Dict, Iterable, Iterator, List, Optional, Tuple)
+
+import google.auth
 from google.api_core.exceptions import NotFound
+from google.auth.credentials import AnonymousCredentials, Credentials
+from google.auth.transport.requests import AuthorizedSession
 from google.cloud import bigquery
 from google.cloud.bigquery.dataset import DatasetReference
+from google.cloud.bigquery.retry import DEFAULT_RETRY
+from requests.adapters import HTTPAdapter
 
+from dbt_helper.cache import (
+    STRONG_VALIDATOR_KEYS, MetadataCache, get_validator, has_strong_validator)
 from dbt_helper.parser.v2.source import DbtSource, DbtSourceTable
+from dbt_helper.parser.bigquery import SchemaMemo, schema_fingerprint
+
+# The default number of threads to call BigQuery API concurrently.
+DEFAULT_CONCURRENCY = 1
+
+# The default max number of HTTP connections kept per host.
+# It is the same as the default of urllib3.
+DEFAULT_POOL_SIZE = 10
+
+# The environment variable to call a BigQuery compatible API endpoint,
+# such as a local fake server. Anonymous credentials are used for it.
+API_ENDPOINT_ENV = "DBT_HELPER_BIGQUERY_API_ENDPOINT"
+
+# Shared BigQuery clients by GCP project and credentials.
+_SHARED_CLIENTS = {
+}  # type: Dict[Tuple[str, Optional[Credentials]], bigquery.Client]
+_SHARED_CLIENTS_LOCK = threading.Lock()
 
 
-def create_bigquery_client(project: Optional[str] = None):
+@dataclass
+class TableFetchResult:
+    """The class is used to hold a result of fetching a BigQuery table."""
+    table_id: str
+    table: Optional[bigquery.Table] = None
+    error: Optional[Exception] = None
+
+
+def create_bigquery_client(
+        project: Optional[str] = None,
+        pool_size: Optional[int] = None,
+        credentials: Optional[Credentials] = None):
     """Create a BigQuery client object
 
     Args:
         project (str): GCP project for BigQuery client
+        pool_size (int): max number of HTTP connections kept per host.
+            The transport of the google-cloud library is used, if it is None.
+        credentials (Credentials): credentials for the client.
+            The application default credentials are used, if it is None.
+            If `DBT_HELPER_BIGQUERY_API_ENDPOINT` is set, the client calls it
+            with anonymous credentials. (e.g. a local fake server)
 
     Returns:
         `bigquery.Client`: A BigQuery client object
     """
-    if project is None or project == "":
-        return bigquery.Client()
-    else:
-        return bigquery.Client(project=project)
+    if project == "":
+        project = None
+    client_options = None
+    api_endpoint = os.environ.get(API_ENDPOINT_ENV)
+    if api_endpoint:
+        client_options = {"api_endpoint": api_endpoint}
+        if credentials is None:
+            credentials = AnonymousCredentials()
+        if project is None:
+            project = os.environ.get("GOOGLE_CLOUD_PROJECT")
+    if pool_size is None:
+        return bigquery.Client(
+            project=project,
+            credentials=credentials,
+            client_options=client_options)
+
+    if credentials is None:
+        credentials, _ = google.auth.default(scopes=bigquery.Client.SCOPE)
+    session = AuthorizedSession(credentials)
+    mount_http_adapter(session, pool_size=pool_size)
+    return bigquery.Client(
+        project=project,
+        credentials=credentials,
+        _http=session,
+        client_options=client_options)
+
+
+def get_shared_bigquery_client(
+        project: Optional[str] = None,
+        pool_size: int = DEFAULT_POOL_SIZE,
+        credentials: Optional[Credentials] = None):
+    """Get a process-wide BigQuery client object of a GCP project
+
+    A client is created at the first call per project and credentials,
+    and it is reused after that. The connection pool is sized only when
+    the client is created, because remounting the HTTP adapter of a client
+    in use would race with requests in flight. So, the first caller should
+    request the largest pool size.
+    Shared clients must not be closed by callers.
+    Call `close_shared_bigquery_clients` instead.
+
+    Args:
+        project (str): GCP project for BigQuery client
+        pool_size (int): max number of HTTP connections kept per host
+            of a new client
+        credentials (Credentials): credentials for the client.
+            The default credentials are used, if it is None.
+
+    Returns:
+        `bigquery.Client`: A BigQuery client object
+    """
+    key = (project or "", credentials)
+    with _SHARED_CLIENTS_LOCK:
+        client = _SHARED_CLIENTS.get(key)
+        if client is None:
+            client = create_bigquery_client(
+                project=project, pool_size=pool_size, credentials=credentials)
+            _SHARED_CLIENTS[key] = client
+        return client
+
+
+def close_shared_bigquery_clients():
+    """Close all process-wide BigQuery clients."""
+    with _SHARED_CLIENTS_LOCK:
+        for client in _SHARED_CLIENTS.values():
+            client.close()
+        _SHARED_CLIENTS.clear()
+
+
+def mount_http_adapter(session, pool_size: int):
+    """Mount a HTTP adapter with a connection pool of the size
+
+    Args:
+        session (requests.Session): HTTP session of a client
+        pool_size (int): max number of HTTP connections kept per host
+    """
+    adapter = HTTPAdapter(pool_connections=pool_size, pool_maxsize=pool_size)
+    session.mount("https://", adapter)
+    session.mount("http://", adapter)
+
+
+def get_pool_size(client: bigquery.Client) -> int:
+    """Get the max number of HTTP connections kept per host of a client
+
+    Args:
+        client (bigquery.Client): BigQuery client
+
+    Returns:
+        int: the pool size of the HTTPS adapter
+    """
+    adapter = client._http.get_adapter("https://")  # pylint: disable=W0212
+    return getattr(adapter, "_pool_maxsize", DEFAULT_POOL_SIZE)
+
+
+def get_pool_stats(client: bigquery.Client) -> Dict[str, int]:
+    """Get statistics of HTTP connection pools of a client
+
+    Args:
+        client (bigquery.Client): BigQuery client
+
+    Returns:
+        dict: the pool size, the number of opened connections,
+            the number of sent requests and the number of idle connections
+    """
+    stats = {
+        "pool_size": get_pool_size(client),
+        "connections": 0,
+        "requests": 0,
+        "idle_connections": 0,
+    }
+    # pylint: disable=W0212
+    adapters = {id(a): a for a in client._http.adapters.values()}
+    for adapter in adapters.values():
+        pools = adapter.poolmanager.pools
+        for key in pools.keys():
+            pool = pools.get(key)
+            if pool is None:
+                continue
+            stats["connections"] += pool.num_connections
+            stats["requests"] += pool.num_requests
+            # Empty slots of a urllib3 pool are filled with None.
+            if pool.pool is not None:
+                stats["idle_connections"] += len(
+                    [
+                        conn for conn in list(pool.pool.queue)
+                        if conn is not None
+                    ])
+    return stats
 
 
 def replace_bq_dataset_metadata(
@@ -63,25 +233,101 @@ def replace_bq_dataset_metadata(
     return dataset
 
 
+def get_strong_validator(client: bigquery.Client, path: str) -> Dict[str, Any]:
+    """Get a strong validator of a table or a dataset
+
+    Only the validator fields are requested as a partial response,
+    which is much cheaper than fetching a table with a large schema.
+
+    Args:
+        client (bigquery.Client): BigQuery client
+        path (str): API path of the resource (e.g. `TableReference.path`)
+
+    Returns:
+        dict: values of the validator keys which the resource has
+    """
+    resource = client._call_api(  # pylint: disable=W0212
+        DEFAULT_RETRY,
+        method="GET",
+        path=path,
+        query_params={"fields": ",".join(STRONG_VALIDATOR_KEYS)})
+    return get_validator(resource)
+
+
+def _get_revalidated_resource(
+        client: bigquery.Client,
+        path: str,
+        get_cached: Callable[[Optional[Dict[str, Any]]], Any],
+        validator: Optional[Dict[str, Any]] = None) -> Any:
+    """Get a cached table or dataset which is proven not to be modified
+
+    A cached entry which is only young enough may be modified after it
+    was cached, and it must not be written into dbt source YAML files.
+    So, it is revalidated with a strong validator of the resource,
+    unless the given validator already has one.
+
+    Args:
+        client (bigquery.Client): BigQuery client
+        path (str): API path of the resource
+        get_cached (Callable): function to get a cached entry by a validator
+        validator (dict): values to revalidate a cached entry
+
+    Returns:
+        A cached table or dataset, or None if it isn't valid
+
+    Raises:
+        NotFound: if the resource doesn't exist
+    """
+    cached = get_cached(validator)
+    if cached is None or has_strong_validator(validator):
+        return cached
+    strong_validator = get_strong_validator(client=client, path=path)
+    if not has_strong_validator(strong_validator):
+        return None
+    return get_cached(strong_validator)
+
+
 def get_bigquery_dataset(
-        client: bigquery.Client, project: str,
-        dataset_id: str) -> bigquery.Table:
+        client: bigquery.Client,
+        project: str,
+        dataset_id: str,
+        cache: Optional[MetadataCache] = None,
+        refresh: bool = False) -> bigquery.Table:
     """Get BigQuery dataset
 
     Args:
         client (bigquery.Client): BigQuery client
         project (str): GCP project _ID
         dataset_id (str): BigQuery dataset ID
+        cache (MetadataCache): A cache of metadata on disk.
+            A cached dataset is revalidated with its strong validator.
+        refresh (bool): fetch the dataset without reading the cache.
+            The fetched dataset is still stored in the cache.
 
     Returns:
         google.cloud.bigquery.Dataset:
             A ``Dataaset`` instance.
     """
     dataset_ref = DatasetReference(project=project, dataset_id=dataset_id)
+    if cache is not None and refresh is False:
+        try:
+            cached_dataset = _get_revalidated_resource(
+                client=client,
+                path=dataset_ref.path,
+                get_cached=lambda v: cache.get_dataset(
+                    "{}.{}".format(project, dataset_id), validator=v))
+        except NotFound:
+            return None
+        if cached_dataset is not None:
+            return cached_dataset
+
     try:
-        return client.get_dataset(dataset_ref=dataset_ref)
+        dataset = client.get_dataset(dataset_ref=dataset_ref)
     except NotFound:
         return None
+    if cache is not None:
+        cache.put_dataset(dataset)
+    return dataset
 
 
 def drop_bigquery_dataset(
@@ -94,11 +340,13 @@ def drop_bigquery_dataset(
         project (str): GCP project _ID
         dataset_id (str): BigQuery dataset ID
     """
-    # Get tables in the dataset.
-    tables = get_bigquery_tables(
-        client=client, project=project, dataset_id=dataset_id)
+    # Get the first table in the dataset with a minimal page.
+    first_table = next(
+        iter_bigquery_tables(
+            client=client, project=project, dataset_id=dataset_id, page_size=1),
+        None)
     # Drop the dataset if it doesn't contain any table.
-    if len(tables) == 0:
+    if first_table is None:
         dataset_ref = DatasetReference(project=project, dataset_id=dataset_id)
         client.delete_dataset(
             dataset=dataset_ref, delete_contents=False, not_found_ok=True)
@@ -116,19 +364,87 @@ def get_bigquery_tables(client: bigquery.Client, project: str,
     Returns:
         list: A list of table IDs
     """
-    dataset_ref = DatasetReference(project=project, dataset_id=dataset_id)
-    dataset = get_bigquery_dataset(
+    table_items = get_bigquery_table_items(
         client=client, project=project, dataset_id=dataset_id)
-    if dataset is None:
-        return []
-    else:
-        tables = client.list_tables(dataset=dataset_ref)
-        return [table.table_id for table in tables]
+    return [table.table_id for table in table_items]
+
+
+def get_bigquery_table_items(
+        client: bigquery.Client, project: str,
+        dataset_id: str) -> List[bigquery.table.TableListItem]:
+    """Get BigQuery table list items
+
+    Args:
+        client (bigquery.Client): BigQuery client
+        project (str): GCP project ID
+        dataset_id (str): BigQuery dataset ID
+
+    Returns:
+        list: A list of ``TableListItem``
+    """
+    return list(
+        iter_bigquery_tables(
+            client=client, project=project, dataset_id=dataset_id))
+
+
+def iter_bigquery_tables(
+        client: bigquery.Client,
+        project: str,
+        dataset_id: str,
+        table_pattern: Optional[str] = None,
+        page_size: Optional[int] = None
+) -> Iterator[bigquery.table.TableListItem]:
+    """Iterate over BigQuery table list items page by page
+
+    Items are yielded as soon as each page arrives, so that callers can
+    start processing them before listing finishes.
+    A missing dataset results in no items without checking it in advance.
+
+    Args:
+        client (bigquery.Client): BigQuery client
+        project (str): GCP project ID
+        dataset_id (str): BigQuery dataset ID
+        table_pattern (str): regular expression to filter table IDs
+        page_size (int): the number of tables per page.
+            The default page size of the API is used, if it is None.
+
+    Returns:
+        iterator: ``TableListItem`` whose table ID matches the pattern
+    """
+    if page_size is not None and page_size < 1:
+        raise ValueError("page_size must be positive: {}".format(page_size))
+    pattern = re.compile(table_pattern) if table_pattern is not None else None
+    dataset_ref = DatasetReference(project=project, dataset_id=dataset_id)
+    page_token = None
+    while True:
+        # NOTE: `list_tables` doesn't take a page size, but `max_results`
+        #       caps an iterator. So, an iterator is created per page.
+        try:
+            table_items = client.list_tables(
+                dataset=dataset_ref,
+                max_results=page_size,
+                page_token=page_token)
+            for table_item in table_items:
+                if pattern is None or pattern.search(table_item.table_id):
+                    yield table_item
+        except NotFound:
+            return
+        # The iterator has already gone through all pages without a size.
+        if page_size is None:
+            return
+        page_token = table_items.next_page_token
+        if page_token is None:
+            return
 
 
 def get_bigquery_table(
-        client: bigquery.Client, project: str, dataset_id: str,
-        table_id: str) -> bigquery.Table:
+        client: bigquery.Client,
+        project: str,
+        dataset_id: str,
+        table_id: str,
+        cache: Optional[MetadataCache] = None,
+        validator: Optional[Dict[str, Any]] = None,
+        refresh: bool = False) -> bigquery.Table:
     """Get BigQuery table
 
     Args:
@@ -136,6 +452,12 @@ def get_bigquery_table(
         project (str): GCP project _ID
         dataset_id (str): BigQuery dataset ID
         table_id (str): BigQuery table ID
+        cache (MetadataCache): A cache of metadata on disk
+        validator (dict): values to revalidate a cached table.
+            (e.g. `get_validator` of a ``TableListItem``)
+            Without a strong validator, a strong one is fetched.
+        refresh (bool): fetch the table without reading the cache.
+            The fetched table is still stored in the cache.
 
     Returns:
         google.cloud.bigquery.table.Table:
@@ -144,10 +466,72 @@ def get_bigquery_table(
     dataset_ref = DatasetReference(project=project, dataset_id=dataset_id)
     table_ref = bigquery.TableReference(
         dataset_ref=dataset_ref, table_id=table_id)
+    if cache is not None and refresh is False:
+        cached_table = _get_revalidated_resource(
+            client=client,
+            path=table_ref.path,
+            get_cached=lambda v: cache.get_table(
+                "{}.{}.{}".format(project, dataset_id, table_id), validator=v),
+            validator=validator)
+        if cached_table is not None:
+            return cached_table
+
     table: bigquery.Table = client.get_table(table=table_ref)
+    if cache is not None:
+        cache.put_table(table)
     return table
 
 
+def get_bigquery_tables_concurrently(
+        client: bigquery.Client,
+        project: str,
+        dataset_id: str,
+        table_ids: Iterable[str],
+        concurrency: int = DEFAULT_CONCURRENCY,
+        cache: Optional[MetadataCache] = None,
+        validators: Optional[Dict[str, Dict[str, Any]]] = None,
+        refresh: bool = False) -> List[TableFetchResult]:
+    """Get BigQuery tables with a bounded thread pool
+
+    A failure of a table doesn't abort the others.
+    It is stored in `TableFetchResult.error` instead.
+
+    Args:
+        client (bigquery.Client): BigQuery client
+        project (str): GCP project _ID
+        dataset_id (str): BigQuery dataset ID
+        table_ids (Iterable[str]): BigQuery table IDs
+        concurrency (int): the maximum number of threads
+        cache (MetadataCache): A cache of metadata on disk
+        validators (dict): validators of cached tables by table ID
+        refresh (bool): fetch tables without reading the cache
+
+    Returns:
+        List[TableFetchResult]: results in the same order as `table_ids`
+    """
+    if concurrency < 1:
+        raise ValueError("concurrency must be positive: {}".format(concurrency))
+
+    def fetch(table_id: str) -> TableFetchResult:
+        try:
+            table = get_bigquery_table(
+                client=client,
+                project=project,
+                dataset_id=dataset_id,
+                table_id=table_id,
+                cache=cache,
+                validator=validators.get(table_id) if validators else None,
+                refresh=refresh)
+            return TableFetchResult(table_id=table_id, table=table)
+        # pylint: disable=W0703
+        except Exception as e:
+            return TableFetchResult(table_id=table_id, error=e)
+
+    with ThreadPoolExecutor(max_workers=concurrency) as executor:
+        # NOTE: `map` keeps the order of the given table IDs.
+        return list(executor.map(fetch, table_ids))
+
+
 def drop_bigquery_table(
         client: bigquery.Client, project: str, dataset_id: str,
         table_id: str) -> bigquery.Table:
@@ -199,47 +583,142 @@ def get_updated_table_fields(table: bigquery.Table):
     return sorted(fields)
 
 
+def get_changed_dataset_fields(
+        original: bigquery.Dataset, replaced: bigquery.Dataset) -> List[str]:
+    """Get fields which are really changed by replacing dataset metadata
+
+    Args:
+        original (bigquery.Dataset): fetched BigQuery dataset
+        replaced (bigquery.Dataset): BigQuery dataset with replaced metadata
+
+    Returns:
+        (list): A sorted list of changed fields
+    """
+    fields = []
+    # An empty description isn't sent not to clear the dataset description.
+    if (replaced.description is not None and len(replaced.description) > 0 and
+            replaced.description != original.description):
+        fields.append("description")
+    if is_labels_changed(base_labels=original.labels,
+                         merged_labels=replaced.labels):
+        fields.append("labels")
+    return sorted(fields)
+
+
+def get_changed_table_fields(
+        original: bigquery.Table, replaced: bigquery.Table) -> List[str]:
+    """Get fields which are really changed by replacing table metadata
+
+    Args:
+        original (bigquery.Table): fetched BigQuery table
+        replaced (bigquery.Table): BigQuery table with replaced metadata
+
+    Returns:
+        (list): A sorted list of changed fields
+    """
+    fields = []
+    if replaced.description != original.description:
+        fields.append("description")
+    if is_labels_changed(base_labels=original.labels,
+                         merged_labels=replaced.labels):
+        fields.append("labels")
+    original_schema = [f.to_api_repr() for f in original.schema]
+    replaced_schema = [f.to_api_repr() for f in replaced.schema]
+    if replaced_schema != original_schema:
+        fields.append("schema")
+    return sorted(fields)
+
+
+def is_labels_changed(
+        base_labels: Optional[Dict[str, str]],
+        merged_labels: Optional[Dict[str, Optional[str]]]) -> bool:
+    """Check if merged labels change the base labels
+
+    Args:
+        base_labels (dict): A dict of old BigQuery labels
+        merged_labels (dict): A dict of labels by `merge_bigquery_labels`.
+            A removed label has None as the value.
+
+    Returns:
+        bool: return true if any label is added, modified or removed.
+    """
+    base_labels = base_labels if base_labels is not None else {}
+    merged_labels = merged_labels if merged_labels is not None else {}
+    for key, value in merged_labels.items():
+        if value is None:
+            if key in base_labels:
+                return True
+        elif base_labels.get(key) != value:
+            return True
+    return False
+
+
 def replace_bq_table_metadata(
         table: bigquery.Table,
-        dbt_source_table: DbtSourceTable) -> bigquery.Table:
+        dbt_source_table: DbtSourceTable,
+        memo: Optional[SchemaMemo] = None) -> bigquery.Table:
     """Replace a BigQuery table metadata with dbt source schema.
 
+    The given table is not modified.
+    It returns a minimal patch object which only has the reference, the etag,
+    the description, the labels and the schema.
+    Unchanged schema fields are shared with the given table.
+
     Args:
         table (bigquery.Table): BigQuery table object
         dbt_source_table (DbtSourceTable): dbt source table
+        memo (SchemaMemo): A memo to update identical schemas once
 
     Returns:
         bigquery.Table: BigQuery table object whose metadata is updated
     """
-    # Deeply copy table object
-    replaced_table = copy.deepcopy(table)
+    # Create a patch object instead of deeply copying the table object.
+    replaced_table = bigquery.Table(table.reference)
+    # NOTE: `update_table` sends the etag as `If-Match`.
+    if table.etag is not None:
+        # pylint: disable=W0212
+        replaced_table._properties["etag"] = table.etag
     # Update table meta
+    replaced_table.description = table.description
     if (dbt_source_table.description is not None and
             len(dbt_source_table.description) >= 0):
         replaced_table.description = dbt_source_table.description
     # Update labels
+    base_labels = table.labels if table.labels is not None else {}
+    replaced_table.labels = dict(base_labels)
     if (dbt_source_table.meta is not None and len(dbt_source_table.meta) >= 0):
         merged_labels = merge_bigquery_labels(
-            base_labels=replaced_table.labels, new_labels=dbt_source_table.meta)
+            base_labels=base_labels, new_labels=dbt_source_table.meta)
         replaced_table.labels = merged_labels
     # Update schema metadata
     replaced_table.schema = update_schema_metadata_with_dbt_source_table(
-        schema=table.schema, dbt_source_table=dbt_source_table)
+        schema=table.schema, dbt_source_table=dbt_source_table, memo=memo)
     return replaced_table
 
 
 def update_schema_metadata_with_dbt_source_table(
         schema: List[bigquery.SchemaField],
-        dbt_source_table: DbtSourceTable) -> List[bigquery.SchemaField]:
+        dbt_source_table: DbtSourceTable,
+        memo: Optional[SchemaMemo] = None) -> List[bigquery.SchemaField]:
     """Update schema
 
     Args:
         schema (List[bigquery.SchemaField]): A list of bigquery.SchemaField
         dbt_source_table (DbtSourceTable): DbtSourceTable object
+        memo (SchemaMemo): A memo to update identical schemas once.
+            Updated fields are shared among tables with an identical schema.
 
     Returns:
         List[bigquery.SchemaField]: A list of updated bigquery.SchemaField
     """
+    if memo is not None:
+        key = (
+            "update_schema_metadata", dbt_source_table.columns_fingerprint,
+            schema_fingerprint(schema, include_metadata=True))
+        return list(
+            memo.get_or_compute(
+                key, lambda: update_schema_metadata_with_dbt_source_table(
+                    schema=schema, dbt_source_table=dbt_source_table)))
     updated_schema_fields = []
     for schema_field in schema:
         updated_schema_field = update_schema_field_with_dbt_source_table(
@@ -254,6 +733,9 @@ def update_schema_field_with_dbt_source_table(
         parent_field_names=None) -> bigquery.SchemaField:
     """Update schema field
 
+    The given schema field is not modified.
+    If nothing is changed, the given schema field itself is returned.
+
     Args:
         schema_field (bigquery.SchemaField): bigquery.SchemaField object
         dbt_source_table (DbtSourceTable): DbtSourceTable object
@@ -266,22 +748,30 @@ def update_schema_field_with_dbt_source_table(
         parent_field_names = []
 
     if schema_field.field_type.upper() in ["STRUCT", "RECORD"]:
+        next_parent_field_names = parent_field_names.copy()
+        next_parent_field_names.append(schema_field.name)
         sub_schema_fields = []
         for child_schema_field in schema_field.fields:
-            next_parent_field_names = parent_field_names.copy()
-            next_parent_field_names.append(schema_field.name)
             sub_schema_field = update_schema_field_with_dbt_source_table(
                 schema_field=child_schema_field,
                 dbt_source_table=dbt_source_table,
                 parent_field_names=next_parent_field_names)
             sub_schema_fields.append(sub_schema_field)
-        schema_field._fields = sub_schema_fields
+        # Reuse the schema field if no child is changed.
+        if all(x is y for x, y in zip(sub_schema_fields, schema_field.fields)):
+            return schema_field
+        return bigquery.SchemaField(
+            name=schema_field.name,
+            field_type=schema_field.field_type,
+            mode=schema_field.mode,
+            description=schema_field.description,
+            fields=tuple(sub_schema_fields),
+            policy_tags=schema_field.policy_tags)
     else:
-        schema_field = update_scalar_schema_field_with_dbt_source_table(
+        return update_scalar_schema_field_with_dbt_source_table(
             schema_field=schema_field,
             dbt_source_table=dbt_source_table,
             parent_field_names=parent_field_names)
-    return schema_field
 
 
 def update_scalar_schema_field_with_dbt_source_table(
@@ -290,6 +780,9 @@ def update_scalar_schema_field_with_dbt_source_table(
         parent_field_names=None) -> bigquery.SchemaField:
     """Update a scalar schema field
 
+    The given schema field is not modified.
+    If nothing is changed, the given schema field itself is returned.
+
     Args:
         schema_field (bigquery.SchemaField): bigquery.SchemaField object
         dbt_source_table (DbtSourceTable):  DbtSourceTable object
@@ -306,13 +799,17 @@ def update_scalar_schema_field_with_dbt_source_table(
     full_field_names.append(schema_field.name)
     full_field_name = ".".join(full_field_names)
     # Update description
-    for c in dbt_source_table.columns:
-        if (c.name == full_field_name and c.description is not None and
-                len(c.description) > 1 and
-                schema_field.description != c.description):
-            # pylint: disable=W0212
-            schema_field._description = c.description
-            break
+    c = dbt_source_table.get_column(full_field_name)
+    if (c is not None and c.description is not None and
+            len(c.description) > 1 and
+            schema_field.description != c.description):
+        return bigquery.SchemaField(
+            name=schema_field.name,
+            field_type=schema_field.field_type,
+            mode=schema_field.mode,
+            description=c.description,
+            fields=schema_field.fields,
+            policy_tags=schema_field.policy_tags)
     return schema_field
 
 
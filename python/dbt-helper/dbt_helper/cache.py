@@ -0,0 +1,274 @@
+# -*- coding: utf-8 -*-
+
+#
+# Licensed to the Apache Software Foundation (ASF) under one or more
+# contributor license agreements.  See the NOTICE file distributed with
+# this work for additional information regarding copyright ownership.
+# The ASF licenses this file to You under the Apache License, Version 2.0
+# (the "License"); you may not use this file except in compliance with
+# the License.  You may obtain a copy of the License at
+#
+#    http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+#
+
+from __future__ import absolute_import, division, print_function
+
+import json
+import os
+import sqlite3
+import threading
+import time
+from typing import Any, Callable, Dict, Optional
+
+from google.cloud import bigquery
+
+# The default directory to store cached metadata.
+DEFAULT_CACHE_DIR = os.path.join(".dbt-helper", "cache")
+# Cached entries without a strong validator expire after a day.
+DEFAULT_MAX_AGE_SECONDS = 24 * 60 * 60
+# The maximum number of cached entries.
+DEFAULT_MAX_ENTRIES = 100000
+
+# Keys of a resource to revalidate a cached entry with `list_tables` results.
+# If `lastModifiedTime` or `etag` matches, the entry is valid regardless of the age.
+STRONG_VALIDATOR_KEYS = ("lastModifiedTime", "etag")
+WEAK_VALIDATOR_KEYS = ("creationTime",)
+
+
+def has_strong_validator(validator: Optional[Dict[str, Any]]) -> bool:
+    """Check if a validator proves a cached entry is not modified
+
+    Args:
+        validator (dict): values by `get_validator`
+
+    Returns:
+        bool: True if it has any of `STRONG_VALIDATOR_KEYS`
+    """
+    return validator is not None and any(
+        validator.get(key) is not None for key in STRONG_VALIDATOR_KEYS)
+
+
+def get_validator(resource: Dict[str, Any]) -> Dict[str, Any]:
+    """Get values to revalidate a cached entry from an API resource
+
+    Args:
+        resource (dict): API resource of a table list item or a table
+
+    Returns:
+        dict: values of the validator keys which the resource has
+    """
+    return {
+        key: resource[key]
+        for key in STRONG_VALIDATOR_KEYS + WEAK_VALIDATOR_KEYS
+        if resource.get(key) is not None
+    }
+
+
+class MetadataCache:
+    """The class is used to cache metadata of BigQuery tables and datasets on disk.
+
+    Entries are stored in a SQLite database under `cache_dir`.
+    An entry is valid if a given validator (e.g. `lastModifiedTime` in
+    `list_tables` results) matches it or it is younger than `max_age_seconds`.
+    Entries which are not accessed for `max_age_seconds` are evicted,
+    and the least recently accessed entries are evicted beyond `max_entries`.
+    """
+
+    def __init__(
+            self,
+            cache_dir: str = DEFAULT_CACHE_DIR,
+            max_age_seconds: float = DEFAULT_MAX_AGE_SECONDS,
+            max_entries: int = DEFAULT_MAX_ENTRIES,
+            clock: Callable[[], float] = time.time):
+        os.makedirs(cache_dir, exist_ok=True)
+        self.path = os.path.join(cache_dir, "metadata.sqlite3")
+        self.max_age_seconds = max_age_seconds
+        self.max_entries = max_entries
+        self.clock = clock
+        self._lock = threading.Lock()
+        self._connection = sqlite3.connect(self.path, check_same_thread=False)
+        with self._lock, self._connection:
+            self._connection.execute(
+                "CREATE TABLE IF NOT EXISTS resources ("
+                "  kind TEXT NOT NULL,"
+                "  ref TEXT NOT NULL,"
+                "  resource TEXT NOT NULL,"
+                "  cached_at REAL NOT NULL,"
+                "  accessed_at REAL NOT NULL,"
+                "  PRIMARY KEY (kind, ref))")
+        self.evict()
+
+    def get_table(
+            self,
+            table_ref: str,
+            validator: Optional[Dict[str,
+                                     Any]] = None) -> Optional[bigquery.Table]:
+        """Get a cached table
+
+        Args:
+            table_ref (str): table reference (e.g. 'project.dataset.table')
+            validator (dict): values by `get_validator` of a table list item
+
+        Returns:
+            bigquery.Table: A cached table if it is valid
+        """
+        resource = self._get("table", table_ref, validator)
+        if resource is None:
+            return None
+        return bigquery.Table.from_api_repr(resource)
+
+    def put_table(self, table: bigquery.Table) -> None:
+        """Store a table
+
+        Args:
+            table (bigquery.Table): A BigQuery table fetched with the API
+        """
+        table_ref = "{}.{}.{}".format(
+            table.project, table.dataset_id, table.table_id)
+        self._put("table", table_ref, table.to_api_repr())
+
+    def get_dataset(
+        self,
+        dataset_ref: str,
+        validator: Optional[Dict[str,
+                                 Any]] = None) -> Optional[bigquery.Dataset]:
+        """Get a cached dataset
+
+        Args:
+            dataset_ref (str): dataset reference (e.g. 'project.dataset')
+            validator (dict): values by `get_validator`
+
+        Returns:
+            bigquery.Dataset: A cached dataset if it is valid
+        """
+        resource = self._get("dataset", dataset_ref, validator)
+        if resource is None:
+            return None
+        return bigquery.Dataset.from_api_repr(resource)
+
+    def put_dataset(self, dataset: bigquery.Dataset) -> None:
+        """Store a dataset
+
+        Args:
+            dataset (bigquery.Dataset): A BigQuery dataset fetched with the API
+        """
+        dataset_ref = "{}.{}".format(dataset.project, dataset.dataset_id)
+        self._put("dataset", dataset_ref, dataset.to_api_repr())
+
+    def delete_table(self, table_ref: str) -> None:
+        """Delete a cached table
+
+        Args:
+            table_ref (str): table reference (e.g. 'project.dataset.table')
+        """
+        self._delete("table", table_ref)
+
+    def delete_dataset(self, dataset_ref: str) -> None:
+        """Delete a cached dataset
+
+        Args:
+            dataset_ref (str): dataset reference (e.g. 'project.dataset')
+        """
+        self._delete("dataset", dataset_ref)
+
+    def evict(self) -> None:
+        """Evict old entries and the least recently accessed entries"""
+        now = self.clock()
+        with self._lock, self._connection:
+            self._connection.execute(
+                "DELETE FROM resources WHERE accessed_at < ?",
+                (now - self.max_age_seconds,))
+            self._connection.execute(
+                "DELETE FROM resources WHERE rowid NOT IN ("
+                "  SELECT rowid FROM resources"
+                "  ORDER BY accessed_at DESC LIMIT ?)", (self.max_entries,))
+
+    def close(self) -> None:
+        """Close the database"""
+        with self._lock:
+            self._connection.close()
+
+    def _get(self, kind: str, ref: str,
+             validator: Optional[Dict[str, Any]]) -> Optional[Dict[str, Any]]:
+        """Get a cached API resource if it is valid
+
+        Args:
+            kind (str): kind of the resource ('table' or 'dataset')
+            ref (str): reference of the resource
+            validator (dict): values by `get_validator`
+
+        Returns:
+            dict: A cached API resource or None
+        """
+        now = self.clock()
+        with self._lock, self._connection:
+            row = self._connection.execute(
+                "SELECT resource, cached_at FROM resources"
+                " WHERE kind = ? AND ref = ?", (kind, ref)).fetchone()
+            if row is None:
+                return None
+            resource = json.loads(row[0])
+            if not self._is_valid(resource, row[1], validator, now):
+                return None
+            self._connection.execute(
+                "UPDATE resources SET accessed_at = ?"
+                " WHERE kind = ? AND ref = ?", (now, kind, ref))
+        return resource
+
+    def _put(self, kind: str, ref: str, resource: Dict[str, Any]) -> None:
+        """Store an API resource
+
+        Args:
+            kind (str): kind of the resource ('table' or 'dataset')
+            ref (str): reference of the resource
+            resource (dict): API resource
+        """
+        now = self.clock()
+        with self._lock, self._connection:
+            self._connection.execute(
+                "INSERT OR REPLACE INTO resources"
+                " (kind, ref, resource, cached_at, accessed_at)"
+                " VALUES (?, ?, ?, ?, ?)",
+                (kind, ref, json.dumps(resource), now, now))
+
+    def _delete(self, kind: str, ref: str) -> None:
+        """Delete an API resource
+
+        Args:
+            kind (str): kind of the resource ('table' or 'dataset')
+            ref (str): reference of the resource
+        """
+        with self._lock, self._connection:
+            self._connection.execute(
+                "DELETE FROM resources WHERE kind = ? AND ref = ?", (kind, ref))
+
+    def _is_valid(
+            self, resource: Dict[str, Any], cached_at: float,
+            validator: Optional[Dict[str, Any]], now: float) -> bool:
+        """Check if a cached API resource is still valid
+
+        Args:
+            resource (dict): cached API resource
+            cached_at (float): when the resource was stored
+            validator (dict): values by `get_validator`
+            now (float): the current time
+
+        Returns:
+            bool: True if a strong validator matches or it is young enough
+        """
+        validator = validator if validator is not None else {}
+        cached_validator = get_validator(resource)
+        common_keys = [k for k in validator.keys() if k in cached_validator]
+        # The entry is stale if any validator doesn't match.
+        if any(validator[k] != cached_validator[k] for k in common_keys):
+            return False
+        # A strong validator proves the entry is not modified.
+        if any(k in STRONG_VALIDATOR_KEYS for k in common_keys):
+            return True
+        return now - cached_at <= self.max_age_seconds
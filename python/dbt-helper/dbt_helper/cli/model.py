@@ -26,7 +26,8 @@ from dbt_helper.cli.utils import validate_owner_callback
 from dbt_helper.renderer.v2.model import generate_model
 from dbt_helper.parser.artifacts.manifest.manifest_v1 import ManifestV1
 from dbt_helper.bigquery import (
-    create_bigquery_client,
+    close_shared_bigquery_clients,
+    get_shared_bigquery_client,
     drop_bigquery_dataset,
     drop_bigquery_table,
 )
@@ -38,6 +39,8 @@ from dbt_helper.utils import DEFAULT_DBT_CONFIG_VERSION, parse_labels, load_json
 @click.pass_context
 def model(context):
     """sub commands for dbt model"""
+    # Close BigQuery clients shared by the sub commands at exit.
+    context.call_on_close(close_shared_bigquery_clients)
 
 
 # pylint: disable=W0613
@@ -170,7 +173,7 @@ def drop_disabled_models(
     if schema_version == "v1":
         manifest = ManifestV1.parse(json_block=manifest_json)
         # Drop tables
-        client = create_bigquery_client(project=client_project)
+        client = get_shared_bigquery_client(project=client_project)
         for disabled in manifest.disabled:
             project = disabled.database
             dataset_id = disabled.schema
@@ -17,27 +17,49 @@
 # limitations under the License.
 #
 
-from __future__ import absolute_import, division, print_function
+from __future__ import absolute_import, division, print_function, annotations
 
+import asyncio
+import copy
+import functools
+import json
 import os
-import re
-from typing import Tuple, Optional
+import sys
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass
+from typing import Tuple, Optional, List, Dict, Any, Callable
 
 import click
+from google.api_core.exceptions import (
+    GoogleAPICallError, NotFound, PreconditionFailed)
+from google.cloud import bigquery
 
 from dbt_helper.parser.v2.source import DbtSources
 from dbt_helper.utils import (
     DEFAULT_DBT_CONFIG_VERSION, denormalize_gcp_project, load_yaml,
-    parse_labels, is_sharded_identifier)
+    parse_labels, is_sharded_identifier, imap_unordered, get_newest_shards)
 from dbt_helper.renderer.v2.source import (
+    DEFAULT_RENDER_WORKERS, DEFAULT_WRITE_WORKERS, RenderedSource,
     generate_source_for_bq_dataset, generate_source_for_bq_table,
-    find_source_schema_paths)
+    render_source_for_bq_table, write_rendered_source, find_source_schema_paths)
 from dbt_helper.bigquery import (
-    create_bigquery_client, get_bigquery_dataset, replace_bq_dataset_metadata,
-    get_updated_dataset_fields, get_bigquery_tables, get_bigquery_table,
-    replace_bq_table_metadata, get_updated_table_fields)
-from dbt_helper.parser.bigquery import extract_schema_info
+    close_shared_bigquery_clients, get_shared_bigquery_client,
+    get_bigquery_dataset, replace_bq_dataset_metadata,
+    get_changed_dataset_fields, iter_bigquery_tables, get_bigquery_table,
+    replace_bq_table_metadata, get_changed_table_fields, TableFetchResult,
+    get_pool_stats, DEFAULT_CONCURRENCY, DEFAULT_POOL_SIZE)
+from dbt_helper.parser.bigquery import SchemaMemo, TableMetadata
+from dbt_helper.information_schema import (
+    create_bigquery_query_runner, get_tables_metadata)
+from dbt_helper.pipeline import (
+    DEFAULT_QUEUE_SIZE, Pipeline, PipelineStage, StageStats)
+from dbt_helper.async_bigquery import AsyncBigQueryClient
+from dbt_helper.scheduler import WriteScheduler
+from dbt_helper.source_index import SOURCE_INDEX_FILE_NAME
+from dbt_helper.source_loader import (
+    SOURCES_CACHE_DIR_NAME, DbtSourcesLoader, get_default_dbt_sources_loader)
 from dbt_helper.tools.v2.source_updater import SourceTableUpdaterV2
+from dbt_helper.cache import DEFAULT_CACHE_DIR, MetadataCache, get_validator
 
 
 # pylint: disable=W0613
@@ -45,6 +67,8 @@ from dbt_helper.tools.v2.source_updater import SourceTableUpdaterV2
 @click.pass_context
 def source(context):
     """sub commands for dbt source"""
+    # Close BigQuery clients shared by the sub commands at exit.
+    context.call_on_close(close_shared_bigquery_clients)
 
 
 # pylint: disable=W0613
@@ -123,11 +147,57 @@ def scaffold(
     default=DEFAULT_DBT_CONFIG_VERSION)
 @click.option("--overwrite", is_flag=True, help="flag to overwrite")
 @click.option("--dry_run", is_flag=True, help="dry run mode")
-@click.option("--is_shard", is_flag=True, help="import a shard table")
+@click.option(
+    "--is_shard",
+    is_flag=True,
+    help="import only the newest shard of each sharded table")
+@click.option(
+    "--concurrency",
+    type=click.IntRange(min=1),
+    default=DEFAULT_CONCURRENCY,
+    help="The number of threads to fetch BigQuery tables")
+@click.option(
+    "--page_size",
+    type=click.IntRange(min=1),
+    default=None,
+    help="The number of tables per page to list BigQuery tables")
+@click.option(
+    "--render_workers",
+    type=click.IntRange(min=1),
+    default=DEFAULT_RENDER_WORKERS,
+    help="The number of threads to render dbt sources")
+@click.option(
+    "--write_workers",
+    type=click.IntRange(min=1),
+    default=DEFAULT_WRITE_WORKERS,
+    help="The number of threads to write dbt sources")
+@click.option(
+    "--queue_size",
+    type=click.IntRange(min=1),
+    default=DEFAULT_QUEUE_SIZE,
+    help="The maximum number of tables waiting between two stages")
+@click.option(
+    "--use_information_schema",
+    is_flag=True,
+    help="Get metadata of tables with a single INFORMATION_SCHEMA query")
+@click.option(
+    "--cache_dir",
+    type=click.Path(file_okay=False),
+    required=False,
+    default=None,
+    help="Directory to cache BigQuery metadata (e.g. '{}'). "
+    "Cached metadata is revalidated before it is used".format(
+        DEFAULT_CACHE_DIR))
+@click.option(
+    "--show_pool_stats",
+    is_flag=True,
+    help="Show statistics of HTTP connections to BigQuery on stderr")
 @click.pass_context
 def importing(
         context, models_dir, project, project_alias, dataset, table, tags,
-        client_project, version, overwrite, dry_run, is_shard):
+        client_project, version, overwrite, dry_run, is_shard, concurrency,
+        page_size, render_workers, write_workers, queue_size,
+        use_information_schema, cache_dir, show_pool_stats):
     """Generate dbt sources by importing metadata of existing BigQuery dataset or tables.
 
     If 'table' is not set, an only BigQuery dataset is imported.
@@ -144,14 +214,24 @@ def importing(
         overwrite (bool): if overwrite or not
         dry_run (bool): if dry run or not
         is_shard (bool): if sharded or not
+        concurrency (int): The number of threads to fetch BigQuery tables
+        page_size (int): The number of tables per page to list BigQuery tables
+        render_workers (int): The number of threads to render dbt sources
+        write_workers (int): The number of threads to write dbt sources
+        queue_size (int): The maximum number of tables between two stages
+        use_information_schema (bool): if using INFORMATION_SCHEMA or not
+        cache_dir (str): directory to cache BigQuery metadata
+        show_pool_stats (bool): if showing HTTP connection statistics or not
     """
     # Get tables under the dataset of the project
-    client = create_bigquery_client(project=client_project)
+    client = get_shared_bigquery_client(
+        project=client_project, pool_size=_get_pool_size(concurrency))
+    cache = _open_metadata_cache(cache_dir)
 
     # Import BigQuery dataset
     if table is None:
         bq_dataset = get_bigquery_dataset(
-            client=client, project=project, dataset_id=dataset)
+            client=client, project=project, dataset_id=dataset, cache=cache)
         generate_source_for_bq_dataset(
             models_dir=models_dir,
             project=project,
@@ -161,37 +241,104 @@ def importing(
             dataset_labels=bq_dataset.labels,
             overwrite=overwrite)
 
-    # Import BigQuery tables
-    tables = get_bigquery_tables(
-        client=client, project=project, dataset_id=dataset)
-    for t in tables:
-        # If a table name doesn't match the given pattern, then skip it.
-        if table is None or not re.search(table, t):
-            continue
+    if table is None:
+        if cache is not None:
+            cache.close()
+        if show_pool_stats is True:
+            _echo_pool_stats(client)
+        return
 
-        # Get table metadata
-        bq_table = get_bigquery_table(
-            client=client, project=project, dataset_id=dataset, table_id=t)
-        table_description = bq_table.description
-        columns = extract_schema_info(bq_table.schema)
-        labels = bq_table.labels if bq_table.labels is not None else {}
+    # Import BigQuery tables with a pipeline of
+    # list -> fetch -> render -> write stages, so that API calls,
+    # rendering and writing files of different tables overlap.
+    # Flatten identical schemas (e.g. shards) once.
+    memo = SchemaMemo()
 
-        # Generate dbt source
-        path = generate_source_for_bq_table(
+    def fetch(table_item: bigquery.table.TableListItem) -> bigquery.Table:
+        # Revalidate a cached table with the listed table. Listed tables
+        # have no strong validator, so it is fetched as a partial response.
+        # pylint: disable=W0212
+        return get_bigquery_table(
+            client=client,
+            project=project,
+            dataset_id=dataset,
+            table_id=table_item.table_id,
+            cache=cache,
+            validator=get_validator(table_item._properties))
+
+    def render(table_metadata: TableMetadata) -> RenderedSource:
+        return render_source_for_bq_table(
             models_dir=models_dir,
             project=project,
             project_alias=project_alias,
             dataset=dataset,
-            table=t,
-            table_description=table_description,
-            columns=columns,
-            labels=labels,
+            table=table_metadata.table_id,
+            table_description=table_metadata.description,
+            columns=table_metadata.columns,
+            labels=table_metadata.labels,
             tags=tags,
             version=version,
-            overwrite=overwrite,
-            dry_run=dry_run,
             is_shard=is_shard)
 
+    def write(rendered_source: RenderedSource) -> str:
+        return write_rendered_source(
+            rendered_source=rendered_source,
+            overwrite=overwrite,
+            dry_run=dry_run)
+
+    if use_information_schema is True:
+        # Get metadata of all the tables with a single query.
+        # Only the query is run before the pipeline.
+        tables_metadata = get_tables_metadata(
+            query_runner=create_bigquery_query_runner(client),
+            project=project,
+            dataset_id=dataset,
+            table_pattern=table)
+        # Import only the newest shard of each sharded table.
+        if is_shard is True:
+            newest_shards = set(
+                get_newest_shards(t.table_id for t in tables_metadata).values())
+            tables_metadata = [
+                t for t in tables_metadata if t.table_id in newest_shards
+            ]
+        source_items = tables_metadata
+        stages = [
+            PipelineStage(name="render", func=render, workers=render_workers),
+        ]
+    else:
+        # Tables whose names don't match the given pattern are skipped
+        # while listing them.
+        source_items = iter_bigquery_tables(
+            client=client,
+            project=project,
+            dataset_id=dataset,
+            table_pattern=table,
+            page_size=page_size)
+        # Fetch only the newest shard of each sharded table,
+        # because a dbt source is generated per sharded table.
+        # All the tables have to be listed before finding them.
+        if is_shard is True:
+            table_items = list(source_items)
+            newest_shards = set(
+                get_newest_shards(t.table_id for t in table_items).values())
+            source_items = [
+                t for t in table_items if t.table_id in newest_shards
+            ]
+        stages = [
+            PipelineStage(name="fetch", func=fetch, workers=concurrency),
+            PipelineStage(
+                name="render",
+                func=lambda bq_table: render(
+                    TableMetadata.from_bq_table(bq_table, memo=memo)),
+                workers=render_workers),
+        ]
+    stages.append(
+        PipelineStage(name="write", func=write, workers=write_workers))
+    pipeline = Pipeline(
+        stages=stages, queue_size=queue_size, source_name="list")
+    num_tables = 0
+    for t, path in pipeline.run(source_items, key_func=lambda x: x.table_id):
+        num_tables += 1
         if dry_run is True:
             click.echo(
                 "[dry_run] Files are supposed to be generated under {} for {}.{}.{}"
@@ -200,6 +347,37 @@ def importing(
             click.echo(
                 "Files are generated under {} for {}.{}.{}".format(
                     path, project, dataset, t))
+    # An error of listing tables has no table ID, and it isn't a table.
+    list_errors = [f.error for f in pipeline.failures if f.key is None]
+    failures = [
+        (f.key, f.error) for f in pipeline.failures if f.key is not None
+    ]
+    num_tables += len(failures)
+    _echo_stage_stats(pipeline.stats)
+
+    if cache is not None:
+        cache.close()
+    if show_pool_stats is True:
+        _echo_pool_stats(client)
+
+    # Report failed tables at the end.
+    for error in list_errors:
+        click.echo(
+            "Failed to list tables in {}.{}: {}".format(
+                project, dataset, error),
+            err=True)
+    if len(failures) > 0:
+        for t, error in failures:
+            click.echo(
+                "Failed to import {}.{}.{}: {}".format(
+                    project, dataset, t, error),
+                err=True)
+        click.echo(
+            "Failed to import {} of {} tables".format(
+                len(failures), num_tables),
+            err=True)
+    if len(list_errors) > 0 or len(failures) > 0:
+        sys.exit(1)
 
 
 # pylint: disable=W0613,C0116
@@ -225,17 +403,34 @@ def importing(
     required=False,
     default=None,
     help="GCP project for BigQuery client")
+@click.option(
+    "--cache_dir",
+    type=click.Path(file_okay=False),
+    required=False,
+    default=None,
+    help="Directory to warm the cache of BigQuery metadata for 'importing' "
+    "(e.g. '{}'). Fetched metadata is only written there, "
+    "because the latest metadata is required".format(DEFAULT_CACHE_DIR))
+@click.option(
+    "--concurrency",
+    type=click.IntRange(min=1),
+    default=DEFAULT_CONCURRENCY,
+    help="The number of threads to fetch BigQuery tables")
 @click.pass_context
 def update_dbt_source(
-        context, vars_path, models_dir, client_project, source_path):
-    """Update a dbt source YAML with a BigQuery table"""
+        context, vars_path, models_dir, client_project, source_path, cache_dir,
+        concurrency):
+    """Update a dbt source YAML with BigQuery tables
+
+    The YAML file may contain any number of sources and tables.
+    All the tables are fetched at once, and the file is written once.
+    """
     # Load vars YAML file.
     vars_yaml = load_yaml(vars_path)
 
     # Check if the given YAML file has tables or not.
     try:
-        schema_yaml = load_yaml(source_path)
-        dbt_sources = DbtSources.parse(schema_yaml)
+        dbt_sources = get_default_dbt_sources_loader().load(source_path)
         if not dbt_sources.has_tables():
             click.echo("{} doesn't have tables".format(source_path))
             return
@@ -243,32 +438,78 @@ def update_dbt_source(
         click.echo("{} is not a dbt source schema".format(source_path))
         return
 
-    # Skip if the identifier is sharded.
-    if (dbt_sources.has_tables() and
-            is_sharded_identifier(dbt_sources.sources[0].tables[0].identifier)):
-        click.echo("{} has a sharded identifier".format(source_path))
+    # Collect table IDs by dataset except sharded tables.
+    table_ids_by_dataset = {}  # type: Dict[str, List[str]]
+    for dbt_source in dbt_sources.sources:
+        for dbt_source_table in dbt_source.tables:
+            identifier = (
+                dbt_source_table.identifier
+                if dbt_source_table.identifier else dbt_source_table.name)
+            # Skip if the identifier is sharded.
+            if is_sharded_identifier(identifier):
+                click.echo(
+                    "{} has a sharded identifier {}".format(
+                        source_path, identifier))
+                continue
+            table_ids_by_dataset.setdefault(dbt_source.name,
+                                            []).append(identifier)
+    if len(table_ids_by_dataset) == 0:
         return
 
-    # Extract table reference.
-    gcp_project_alias, dataset, table = _extract_table_reference(
-        models_dir=models_dir, source_schema_path=source_path)
     # Get the GCP project ID based on the alias.
-    gcp_project = vars_yaml['projects'][denormalize_gcp_project(
-        gcp_project_alias)]
-    # Get a BigQuery table.
-    client = create_bigquery_client(project=client_project)
-    bq_table = get_bigquery_table(
-        client=client, project=gcp_project, dataset_id=dataset, table_id=table)
+    gcp_project = _get_gcp_project(
+        vars_yaml_block=vars_yaml,
+        models_dir=models_dir,
+        source_path=source_path)
+    # Get BigQuery tables of all the datasets at once on an event loop.
+    client = get_shared_bigquery_client(
+        project=client_project, pool_size=_get_pool_size(concurrency))
+    cache = _open_metadata_cache(cache_dir)
 
-    # Update dbt source schema YAML file.
-    source_updater = SourceTableUpdaterV2.load(source_path)
-    source_updater.update_with_bq_table(bq_table)
+    async def fetch_tables() -> List[List[TableFetchResult]]:
+        async with AsyncBigQueryClient(client=client, concurrency=concurrency,
+                                       cache=cache) as async_client:
+            return await asyncio.gather(
+                *[
+                    async_client.get_tables(
+                        project=gcp_project,
+                        dataset_id=dataset_id,
+                        table_ids=table_ids,
+                        # Don't write outdated metadata to the YAML file.
+                        refresh=True)
+                    for dataset_id, table_ids in table_ids_by_dataset.items()
+                ])
 
-    # Dump the YAML
-    source_updater.dump(source_path)
+    bq_tables = {}  # type: Dict[Tuple[str, str], bigquery.Table]
+    failures = []
+    for dataset_id, results in zip(table_ids_by_dataset.keys(),
+                                   asyncio.run(fetch_tables())):
+        for result in results:
+            if result.error is not None:
+                failures.append((dataset_id, result.table_id, result.error))
+            else:
+                bq_tables[(dataset_id, result.table_id)] = result.table
+    if cache is not None:
+        cache.close()
 
-    # Show information on stdout
-    click.echo("Updated {}".format(source_path))
+    # Update dbt source schema YAML file with the fetched tables.
+    if len(bq_tables) > 0:
+        source_updater = SourceTableUpdaterV2.load(source_path)
+        source_updater.update_with_bq_tables(bq_tables)
+
+        # Dump the YAML
+        source_updater.dump(source_path)
+
+        # Show information on stdout
+        click.echo("Updated {}".format(source_path))
+
+    if len(failures) > 0:
+        for dataset_id, table_id, error in failures:
+            click.echo(
+                "Failed to get {}.{}.{}: {}".format(
+                    gcp_project, dataset_id, table_id, error),
+                err=True)
+        sys.exit(1)
 
 
 # pylint: disable=W0613,C0116
@@ -302,25 +543,48 @@ def update_dbt_source(
     help="BigQuery table ID or regular expression",
     default=None)
 @click.option("--dry_run", is_flag=True, help="dry run mode")
+@click.option(
+    "--cache_dir",
+    type=click.Path(file_okay=False),
+    required=False,
+    default=None,
+    help="Directory to cache the source index and parsed dbt sources "
+    "(e.g. '{}'). It also warms the cache of BigQuery metadata for "
+    "'importing'. Fetched metadata is only written there, "
+    "because the latest metadata is required".format(DEFAULT_CACHE_DIR))
 @click.pass_context
 def update(
-        context, models_dir, vars_path, project_alias, dataset, table, dry_run):
+        context, models_dir, vars_path, project_alias, dataset, table, dry_run,
+        cache_dir):
     # Load vars YAML file.
     vars_yaml_block = load_yaml(vars_path)
     # Get source schema files
     models_dir = os.path.abspath(models_dir)
+    index_path = None
+    loader = get_default_dbt_sources_loader()
+    if cache_dir is not None:
+        index_path = os.path.join(cache_dir, SOURCE_INDEX_FILE_NAME)
+        loader = DbtSourcesLoader(
+            cache_dir=os.path.join(cache_dir, SOURCES_CACHE_DIR_NAME))
     source_schema_paths = find_source_schema_paths(
         models_dir=models_dir,
         project_alias=project_alias,
         dataset=dataset,
-        table=table)
+        table=table,
+        index_path=index_path,
+        loader=loader)
+
+    cache = _open_metadata_cache(cache_dir)
+    # Share rate limits among all the files.
+    scheduler = WriteScheduler()
+    # Share memoized results of identical schemas among all the files.
+    memo = SchemaMemo()
 
     # Loop over dbt source schema files.
+    stats = MetadataUpdateStats()
     for source_schema_path in source_schema_paths:
-        # Load a dbt source schema.
-        yaml_block = load_yaml(source_schema_path)
-        # Parse the loaded schema.
-        dbt_sources = DbtSources.parse(yaml_block)
+        # Load a dbt source schema parsed while finding it.
+        dbt_sources = loader.load(source_schema_path)
         # Extract table reference
         gcp_project_alias, _, _ = _extract_table_reference(
             models_dir=models_dir, source_schema_path=source_schema_path)
@@ -328,8 +592,18 @@ def update(
         gcp_project = vars_yaml_block['projects'][denormalize_gcp_project(
             gcp_project_alias)]
         # Update metadata
-        update_bigquery_metadata(
-            gcp_project=gcp_project, dbt_sources=dbt_sources, dry_run=dry_run)
+        stats.merge(
+            update_bigquery_metadata(
+                gcp_project=gcp_project,
+                dbt_sources=dbt_sources,
+                dry_run=dry_run,
+                cache=cache,
+                scheduler=scheduler,
+                memo=memo))
+    scheduler.shutdown()
+    if cache is not None:
+        cache.close()
+    _report_metadata_update_stats(stats=stats, dry_run=dry_run)
 
 
 # pylint: disable=W0613,C0116
@@ -365,72 +639,642 @@ def update_from_source(
     # Load a dbt source YAML file.
     yaml_block = load_yaml(source_path)
     dbt_sources = DbtSources.parse(yaml_block)
-    # Extract table reference.
-    gcp_project_alias, _, _ = _extract_table_reference(
-        models_dir=models_dir, source_schema_path=source_path)
     # Get the GCP project ID based on the alias.
-    # NOTE:
-    # It is impossible to render something like "{{ var("projects")["project-1"] }}" here.
-    # So, we have no choise to use the config file.
-    gcp_project = vars_yaml_block['projects'][denormalize_gcp_project(
-        gcp_project_alias)]
+    gcp_project = _get_gcp_project(
+        vars_yaml_block=vars_yaml_block,
+        models_dir=models_dir,
+        source_path=source_path)
     # Update metadata
-    update_bigquery_metadata(
+    stats = update_bigquery_metadata(
         gcp_project=gcp_project,
         dbt_sources=dbt_sources,
         client_project=client_project,
         dry_run=dry_run)
+    _report_metadata_update_stats(stats=stats, dry_run=dry_run)
+
+
+# pylint: disable=W0613,C0116
+@source.command()
+@click.option(
+    "--models_dir",
+    type=click.Path(exists=True),
+    required=True,
+    help="Path to the dbt model dir")
+@click.option(
+    "--vars_path",
+    type=click.Path(exists=True),
+    required=True,
+    help="Path to a YAML file of `vars`")
+@click.option(
+    "--source_path",
+    "source_paths",
+    type=click.Path(exists=True),
+    multiple=True,
+    default=[],
+    help="Path to a YAML file of dbt source")
+@click.option(
+    "--source_paths_from_stdin",
+    is_flag=True,
+    help="Read paths to YAML files of dbt source from stdin line by line")
+@click.option(
+    "--client_project",
+    type=str,
+    required=False,
+    default=None,
+    help="GCP project")
+@click.option(
+    "--concurrency",
+    type=click.IntRange(min=1),
+    default=DEFAULT_CONCURRENCY,
+    help="The number of threads to update BigQuery metadata")
+@click.option("--dry_run", is_flag=True, help="dry run mode")
+@click.option(
+    "--show_pool_stats",
+    is_flag=True,
+    help="Show statistics of HTTP connections to BigQuery on stderr")
+@click.pass_context
+def update_from_sources(
+        context, models_dir, vars_path, source_paths, source_paths_from_stdin,
+        client_project, concurrency, dry_run, show_pool_stats):
+    """Update metadata of BigQuery tables/views with dbt sources in a process"""
+    # Collect paths to dbt source YAML files.
+    source_paths = list(source_paths)
+    if source_paths_from_stdin is True:
+        stdin = click.get_text_stream("stdin")
+        for line in stdin:
+            source_path = line.strip()
+            if len(source_path) == 0:
+                continue
+            # Validate the file.
+            if not os.path.isfile(source_path):
+                click.echo("WARN: {} is not a file.".format(source_path))
+                continue
+            source_paths.append(source_path)
+    # Load vars YAML file only once.
+    vars_yaml_block = load_yaml(vars_path)
+    # Share a BigQuery client among all the files.
+    client = get_shared_bigquery_client(
+        project=client_project, pool_size=_get_pool_size(concurrency))
+
+    def update_from_source_path(
+        source_path: str
+    ) -> Tuple[Optional[MetadataUpdateStats], Optional[Exception]]:
+        try:
+            yaml_block = load_yaml(source_path)
+            dbt_sources = DbtSources.parse(yaml_block)
+            gcp_project = _get_gcp_project(
+                vars_yaml_block=vars_yaml_block,
+                models_dir=models_dir,
+                source_path=source_path)
+            file_stats = update_bigquery_metadata(
+                gcp_project=gcp_project,
+                dbt_sources=dbt_sources,
+                dry_run=dry_run,
+                client=client,
+                scheduler=scheduler,
+                memo=memo)
+        # pylint: disable=W0703
+        except Exception as e:
+            return None, e
+        return file_stats, None
+
+    stats = MetadataUpdateStats()
+    failures = []
+    scheduler = WriteScheduler(concurrency=concurrency)
+    memo = SchemaMemo()
+    with ThreadPoolExecutor(max_workers=concurrency) as executor:
+        results = executor.map(update_from_source_path, source_paths)
+        for source_path, (file_stats, error) in zip(source_paths, results):
+            if error is None:
+                stats.merge(file_stats)
+                click.echo("Updated {}".format(source_path))
+            else:
+                failures.append((source_path, error))
+    scheduler.shutdown()
+    if show_pool_stats is True:
+        _echo_pool_stats(client)
+    click.echo(stats.summary(dry_run=dry_run))
+
+    # Report failed files at the end.
+    if len(failures) > 0:
+        for source_path, error in failures:
+            click.echo(
+                "Failed to update {}: {}".format(source_path, error), err=True)
+        click.echo(
+            "Failed to update {} of {} files".format(
+                len(failures), len(source_paths)),
+            err=True)
+    if len(failures) > 0 or stats.failed > 0:
+        sys.exit(1)
+
+
+# pylint: disable=W0613,C0116
+@source.command()
+@click.option(
+    "--models_dir",
+    type=click.Path(exists=True),
+    required=True,
+    help="Path to the dbt model dir")
+@click.option(
+    "--vars_path",
+    type=click.Path(exists=True),
+    required=True,
+    help="Path to a YAML file of `vars`")
+@click.option(
+    "--project_alias",
+    type=str,
+    required=False,
+    help="GCP project alias",
+    default=None)
+@click.option(
+    "--dataset",
+    type=str,
+    required=False,
+    help="BigQuery dataset ID",
+    default=None)
+@click.option(
+    "--table",
+    type=str,
+    required=False,
+    help="BigQuery table ID or regular expression",
+    default=None)
+@click.option(
+    "--client_project",
+    type=str,
+    required=False,
+    default=None,
+    help="GCP project")
+@click.option(
+    "--concurrency",
+    type=click.IntRange(min=1),
+    default=DEFAULT_CONCURRENCY,
+    help="The number of threads to fetch BigQuery tables")
+@click.option(
+    "--output",
+    type=click.File("w"),
+    default="-",
+    help="Path to a JSON lines file of the report (default: stdout)")
+@click.option(
+    "--show_pool_stats",
+    is_flag=True,
+    help="Show statistics of HTTP connections to BigQuery on stderr")
+@click.pass_context
+def drift(
+        context, models_dir, vars_path, project_alias, dataset, table,
+        client_project, concurrency, output, show_pool_stats):
+    """Report differences between dbt sources and BigQuery tables as JSON lines
+
+    Each line has 'source_path', 'project', 'dataset', 'table', 'status'
+    ('ok', 'drift' or 'error') and 'differences' or 'error'.
+    A file which can't be loaded is reported as a line of 'source_path',
+    'status' ('error') and 'error'.
+    Lines are written as soon as BigQuery tables are fetched.
+    """
+    # Load vars YAML file.
+    vars_yaml_block = load_yaml(vars_path)
+    # Get source schema files
+    models_dir = os.path.abspath(models_dir)
+    loader = get_default_dbt_sources_loader()
+    source_schema_paths = find_source_schema_paths(
+        models_dir=models_dir,
+        project_alias=project_alias,
+        dataset=dataset,
+        table=table,
+        loader=loader)
+    client = get_shared_bigquery_client(
+        project=client_project, pool_size=_get_pool_size(concurrency))
+    # Compare identical schemas once.
+    memo = SchemaMemo()
+
+    def iter_drift_targets():
+        for source_schema_path in source_schema_paths:
+            # A broken file or an unknown project alias is reported as
+            # an error of the file, not to abort the others.
+            try:
+                dbt_sources = loader.load(source_schema_path)
+                gcp_project = _get_gcp_project(
+                    vars_yaml_block=vars_yaml_block,
+                    models_dir=models_dir,
+                    source_path=source_schema_path)
+            # pylint: disable=W0703
+            except Exception as e:
+                yield {
+                    "source_path": source_schema_path,
+                    "status": "error",
+                    "error": "{}: {}".format(type(e).__name__, e),
+                }
+                continue
+            for dbt_source in dbt_sources.sources:
+                for dbt_source_table in dbt_source.tables:
+                    yield (
+                        source_schema_path, gcp_project, dbt_source.name,
+                        dbt_source_table)
+
+    def compare_table(target) -> Dict[str, Any]:
+        # An error of a file is already a record.
+        if isinstance(target, dict):
+            return target
+        source_schema_path, gcp_project, dataset_id, dbt_source_table = target
+        identifier = (
+            dbt_source_table.identifier
+            if dbt_source_table.identifier else dbt_source_table.name)
+        record = {
+            "source_path": source_schema_path,
+            "project": gcp_project,
+            "dataset": dataset_id,
+            "table": identifier,
+        }
+        # Skip a sharded table
+        if is_sharded_identifier(identifier=identifier):
+            record["status"] = "skipped"
+            return record
+        # Not only API errors but also transport and auth errors are
+        # reported per table, not to abort the streaming report.
+        try:
+            bq_table = get_bigquery_table(
+                client=client,
+                project=gcp_project,
+                dataset_id=dataset_id,
+                table_id=identifier)
+            differences = dbt_source_table.compare_details(bq_table, memo=memo)
+        # pylint: disable=W0703
+        except Exception as e:
+            record["status"] = "error"
+            record["error"] = "{}: {}".format(type(e).__name__, e)
+            return record
+        record["status"] = "drift" if len(differences) > 0 else "ok"
+        record["differences"] = differences
+        return record
+
+    # Write records as soon as they are compared.
+    counts = {}
+    for record in imap_unordered(compare_table, iter_drift_targets(),
+                                 concurrency=concurrency):
+        output.write(json.dumps(record) + "\n")
+        output.flush()
+        counts[record["status"]] = counts.get(record["status"], 0) + 1
+    if show_pool_stats is True:
+        _echo_pool_stats(client)
+
+    # Show a summary on stderr not to break the report on stdout.
+    click.echo(
+        ", ".join(
+            "{}: {}".format(status, counts.get(status, 0))
+            for status in ["ok", "drift", "skipped", "error"]),
+        err=True)
+    if counts.get("error", 0) > 0:
+        sys.exit(1)
+
+
+@dataclass
+class MetadataUpdateStats:
+    """The class is used to count results of updating BigQuery metadata."""
+    patched: int = 0
+    skipped: int = 0
+    failed: int = 0
+
+    def merge(self, other: MetadataUpdateStats) -> MetadataUpdateStats:
+        """Add counts of another stats to the stats
+
+        Args:
+            other (MetadataUpdateStats): another stats
+
+        Returns:
+            self
+        """
+        self.patched += other.patched
+        self.skipped += other.skipped
+        self.failed += other.failed
+        return self
+
+    def summary(self, dry_run=False) -> str:
+        """Get a summary of the stats"""
+        prefix = "[dry_run] " if dry_run is True else ""
+        return "{}patched: {}, skipped: {}, failed: {}".format(
+            prefix, self.patched, self.skipped, self.failed)
 
 
 def update_bigquery_metadata(
         gcp_project: str,
         dbt_sources: DbtSources,
         client_project: Optional[str] = None,
-        dry_run=False) -> None:
+        dry_run=False,
+        client: Optional[bigquery.Client] = None,
+        cache: Optional[MetadataCache] = None,
+        scheduler: Optional[WriteScheduler] = None,
+        memo: Optional[SchemaMemo] = None) -> MetadataUpdateStats:
     """Update metadata of a BigQuery table
 
+    Only fields which are really changed are sent to BigQuery.
+    If nothing is changed, the API call is skipped.
+    Changes are written through a scheduler to respect the rate limits.
+
     Args:
         gcp_project (str): A GCP project ID to call BigQuery API
         dbt_sources (DbtSources): An object of DbtSources
         client_project (str): A GCP project for BigQuery client
         dry_run (bool): dry run flag
+        client (bigquery.Client): A BigQuery client.
+            The process-wide client of `client_project` is used, if it is None.
+        cache (MetadataCache): A cache of metadata on disk to warm.
+            Fetched and updated resources are only written to it,
+            because the latest ones are required to update them.
+        scheduler (WriteScheduler): A scheduler of metadata writes.
+            A scheduler only for the call is used, if it is None.
+        memo (SchemaMemo): A memo to update identical schemas once
+
+    Returns:
+        MetadataUpdateStats: counts of patched, skipped and failed resources
     """
-    client = create_bigquery_client(project=client_project)
+    if scheduler is None:
+        with WriteScheduler() as own_scheduler:
+            return update_bigquery_metadata(
+                gcp_project=gcp_project,
+                dbt_sources=dbt_sources,
+                client_project=client_project,
+                dry_run=dry_run,
+                client=client,
+                cache=cache,
+                scheduler=own_scheduler,
+                memo=memo)
+
+    stats = MetadataUpdateStats()
+    # Scheduled writes as tuples of a reference, a future and cache methods.
+    writes = []
+    if client is None:
+        client = get_shared_bigquery_client(project=client_project)
     for dbt_source in dbt_sources.sources:
         # Get dataset ID from `sources[].name` of dbt source schema.
         dataset_id = dbt_source.name
 
         # Update metadata of BigQuery dataset
-        bq_dataset = get_bigquery_dataset(
-            client=client, project=gcp_project, dataset_id=dbt_source.name)
-        replaced_dataset = replace_bq_dataset_metadata(
-            dataset=bq_dataset, dbt_source=dbt_source)
-        dataset_fields = get_updated_dataset_fields(replaced_dataset)
-        if len(dataset_fields) > 0:
-            client.update_dataset(
-                dataset=replaced_dataset, fields=dataset_fields)
+        dataset_ref = "{}.{}".format(gcp_project, dataset_id)
+        try:
+            # Read-modify-write needs the latest etag and metadata.
+            bq_dataset = get_bigquery_dataset(
+                client=client,
+                project=gcp_project,
+                dataset_id=dataset_id,
+                cache=cache,
+                refresh=True)
+            if bq_dataset is None:
+                raise NotFound("dataset {} is not found".format(dataset_ref))
+            replaced_dataset = replace_bq_dataset_metadata(
+                dataset=copy.deepcopy(bq_dataset), dbt_source=dbt_source)
+            dataset_fields = get_changed_dataset_fields(
+                original=bq_dataset, replaced=replaced_dataset)
+            if len(dataset_fields) == 0:
+                stats.skipped += 1
+            else:
+                _echo_patch(dataset_ref, dataset_fields, dry_run)
+                if dry_run is False:
+                    # Retries are handled by the scheduler.
+                    future = scheduler.submit(
+                        dataset_ref,
+                        _make_conditional_write(
+                            patch=functools.partial(
+                                client.update_dataset,
+                                dataset=replaced_dataset,
+                                fields=dataset_fields,
+                                retry=None),
+                            get_latest=functools.partial(
+                                client.get_dataset, bq_dataset.reference),
+                            get_changed_fields=get_changed_dataset_fields,
+                            resource=replaced_dataset,
+                            fields=dataset_fields))
+                    writes.append(
+                        (
+                            dataset_ref, future,
+                            None if cache is None else cache.put_dataset,
+                            None if cache is None else cache.delete_dataset))
+                else:
+                    stats.patched += 1
+        except GoogleAPICallError as e:
+            click.echo(
+                "Failed to update {}: {}".format(dataset_ref, e), err=True)
+            stats.failed += 1
 
         # Update metadata of BigQuery tables
         for dbt_source_table in dbt_source.tables:
             # Get a table identifier.
-            identifier = dbt_source_table.identifier
+            identifier = (
+                dbt_source_table.identifier
+                if dbt_source_table.identifier else dbt_source_table.name)
             # Skip a sharded table
             if is_sharded_identifier(identifier=identifier):
                 continue
-            # Get a BigQuery table with the API.
-            bq_table = get_bigquery_table(
-                client=client,
-                project=gcp_project,
-                dataset_id=dataset_id,
-                table_id=identifier)
-            # Update metadata of the table using the dbt source schema.
-            bq_table = replace_bq_table_metadata(
-                table=bq_table, dbt_source_table=dbt_source_table)
-            # Save updated table metadata in BigQuery.
-            if dry_run is False:
-                table_fiields = get_updated_table_fields(bq_table)
-                client.update_table(table=bq_table, fields=table_fiields)
-    client.close()
+            table_ref = "{}.{}.{}".format(gcp_project, dataset_id, identifier)
+            try:
+                # Get a BigQuery table with the API.
+                bq_table = get_bigquery_table(
+                    client=client,
+                    project=gcp_project,
+                    dataset_id=dataset_id,
+                    table_id=identifier,
+                    cache=cache,
+                    refresh=True)
+                # Update metadata of the table using the dbt source schema.
+                replaced_table = replace_bq_table_metadata(
+                    table=bq_table,
+                    dbt_source_table=dbt_source_table,
+                    memo=memo)
+                # Send only changed fields to BigQuery.
+                table_fields = get_changed_table_fields(
+                    original=bq_table, replaced=replaced_table)
+                if len(table_fields) == 0:
+                    stats.skipped += 1
+                    continue
+                _echo_patch(table_ref, table_fields, dry_run)
+                if dry_run is False:
+                    future = scheduler.submit(
+                        table_ref,
+                        _make_conditional_write(
+                            patch=functools.partial(
+                                client.update_table,
+                                table=replaced_table,
+                                fields=table_fields,
+                                retry=None),
+                            get_latest=functools.partial(
+                                client.get_table, bq_table.reference),
+                            get_changed_fields=get_changed_table_fields,
+                            resource=replaced_table,
+                            fields=table_fields))
+                    writes.append(
+                        (
+                            table_ref, future,
+                            None if cache is None else cache.put_table,
+                            None if cache is None else cache.delete_table))
+                else:
+                    stats.patched += 1
+            except GoogleAPICallError as e:
+                click.echo(
+                    "Failed to update {}: {}".format(table_ref, e), err=True)
+                stats.failed += 1
+
+    # Wait for the scheduled writes.
+    for ref, future, put_to_cache, delete_from_cache in writes:
+        try:
+            updated = future.result()
+        except GoogleAPICallError as e:
+            # The resource was modified by others after it was fetched.
+            if isinstance(e, PreconditionFailed) \
+                    and delete_from_cache is not None:
+                delete_from_cache(ref)
+            click.echo("Failed to update {}: {}".format(ref, e), err=True)
+            stats.failed += 1
+            continue
+        if put_to_cache is not None:
+            put_to_cache(updated)
+        stats.patched += 1
+    return stats
+
+
+def _make_conditional_write(
+        patch: Callable[[], Any], get_latest: Callable[[], Any],
+        get_changed_fields: Callable[[Any, Any], List[str]], resource: Any,
+        fields: List[str]) -> Callable[[], Any]:
+    """Make a write with the etag of a resource which can be retried
+
+    An attempt which failed with a server error may have been applied.
+    Then, a retry of it fails with 412 as the etag has been changed by
+    the attempt itself. So, the latest resource is fetched on such a 412,
+    and the write succeeded if it already has the written fields.
+
+    Args:
+        patch (Callable): function to update the resource
+        get_latest (Callable): function to fetch the latest resource
+        get_changed_fields (Callable): function to compare an original
+            resource with a replaced one like `get_changed_table_fields`
+        resource (Any): a BigQuery table or dataset to write with the etag
+        fields (list): fields to write
+
+    Returns:
+        Callable: function to call in a `WriteScheduler`
+    """
+    num_attempts = [0]
+
+    def write():
+        num_attempts[0] += 1
+        try:
+            return patch()
+        except PreconditionFailed:
+            # The resource was modified by others before the first attempt.
+            if num_attempts[0] == 1:
+                raise
+            latest = get_latest()
+            changed_fields = get_changed_fields(latest, resource)
+            if any(f in changed_fields for f in fields):
+                raise
+            return latest
+
+    return write
+
+
+def _get_pool_size(concurrency: int) -> int:
+    """Get the size of a HTTP connection pool for the number of threads
+
+    Args:
+        concurrency (int): The number of threads to call BigQuery API
+
+    Returns:
+        int: the pool size, which is not less than the default
+    """
+    return max(concurrency, DEFAULT_POOL_SIZE)
+
+
+def _echo_pool_stats(client: bigquery.Client):
+    """Show statistics of HTTP connections of a BigQuery client on stderr
+
+    Args:
+        client (bigquery.Client): BigQuery client
+    """
+    stats = get_pool_stats(client)
+    click.echo(
+        "pool size: {}, connections: {}, requests: {}, idle connections: {}"
+        .format(
+            stats["pool_size"], stats["connections"], stats["requests"],
+            stats["idle_connections"]),
+        err=True)
+
+
+def _echo_stage_stats(stats: List[StageStats]):
+    """Show throughput of each stage of a pipeline on stderr
+
+    Args:
+        stats (List[StageStats]): statistics of the stages
+    """
+    for stage_stats in stats:
+        click.echo(
+            "{}: {} tables, {} failed, {} workers, {:.3f} sec, {:.1f} tables/sec"
+            .format(
+                stage_stats.name, stage_stats.processed, stage_stats.failed,
+                stage_stats.workers, stage_stats.elapsed_seconds,
+                stage_stats.throughput),
+            err=True)
+
+
+def _open_metadata_cache(cache_dir: Optional[str]) -> Optional[MetadataCache]:
+    """Open a cache of BigQuery metadata if a directory is given
+
+    Args:
+        cache_dir (str): directory to cache BigQuery metadata
+
+    Returns:
+        MetadataCache: A cache of metadata or None
+    """
+    if cache_dir is None:
+        return None
+    return MetadataCache(cache_dir=cache_dir)
+
+
+def _report_metadata_update_stats(
+        stats: MetadataUpdateStats, dry_run: bool) -> None:
+    """Show the stats on stdout and exit with 1 if anything failed
+
+    Args:
+        stats (MetadataUpdateStats): stats of updated resources
+        dry_run (bool): dry run flag
+    """
+    click.echo(stats.summary(dry_run=dry_run))
+    if stats.failed > 0:
+        sys.exit(1)
+
+
+def _echo_patch(resource_ref: str, fields: List[str], dry_run: bool) -> None:
+    """Show a patched resource on stdout
+
+    Args:
+        resource_ref (str): reference of a BigQuery dataset or table
+        fields (list): patched fields
+        dry_run (bool): dry run flag
+    """
+    prefix = "[dry_run] " if dry_run is True else ""
+    click.echo(
+        "{}Patch {} ({})".format(prefix, resource_ref, ", ".join(fields)))
+
+
+def _get_gcp_project(
+        vars_yaml_block: Dict[str, Any], models_dir: str,
+        source_path: str) -> str:
+    """Get the GCP project ID of a dbt source YAML file
+
+    Args:
+        vars_yaml_block (dict): YAML block of `vars`
+        models_dir (str): path to dbt models dir
+        source_path (str): path to a dbt source YAML file
+
+    Returns:
+        str: GCP project ID
+    """
+    # Extract table reference.
+    gcp_project_alias, _, _ = _extract_table_reference(
+        models_dir=models_dir, source_schema_path=source_path)
+    # Get the GCP project ID based on the alias.
+    # NOTE:
+    # It is impossible to render something like "{{ var("projects")["project-1"] }}" here.
+    # So, we have no choise to use the config file.
+    return vars_yaml_block['projects'][denormalize_gcp_project(
+        gcp_project_alias)]
 
 
 def _extract_table_reference(models_dir: str,
@@ -0,0 +1,285 @@
+# -*- coding: utf-8 -*-
+
+#
+# Licensed to the Apache Software Foundation (ASF) under one or more
+# contributor license agreements.  See the NOTICE file distributed with
+# this work for additional information regarding copyright ownership.
+# The ASF licenses this file to You under the Apache License, Version 2.0
+# (the "License"); you may not use this file except in compliance with
+# the License.  You may obtain a copy of the License at
+#
+#    http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+#
+
+from __future__ import absolute_import, division, print_function
+
+import ast
+import re
+from typing import (
+    Any, Callable, Dict, Iterable, List, Mapping, Optional, Tuple)
+
+from google.cloud import bigquery
+
+from dbt_helper.parser.bigquery import SchemaInfo, TableMetadata
+
+# A function to run a query and return rows as mappings.
+# It enables us to test the bulk import without BigQuery.
+QueryRunner = Callable[[str], Iterable[Mapping[str, Any]]]
+
+# A query to get metadata of all tables in a dataset at once.
+TABLES_METADATA_QUERY = """
+WITH table_options AS (
+  SELECT
+    table_name,
+    MAX(IF(option_name = 'description', option_value, NULL)) AS table_description,
+    MAX(IF(option_name = 'labels', option_value, NULL)) AS table_labels,
+  FROM `{project}`.{dataset}.INFORMATION_SCHEMA.TABLE_OPTIONS
+  GROUP BY table_name
+)
+SELECT
+  t.table_name,
+  o.table_description,
+  o.table_labels,
+  c.ordinal_position,
+  f.field_path,
+  f.data_type,
+  f.description,
+FROM `{project}`.{dataset}.INFORMATION_SCHEMA.TABLES AS t
+LEFT JOIN table_options AS o
+  ON t.table_name = o.table_name
+LEFT JOIN `{project}`.{dataset}.INFORMATION_SCHEMA.COLUMN_FIELD_PATHS AS f
+  ON t.table_name = f.table_name
+LEFT JOIN `{project}`.{dataset}.INFORMATION_SCHEMA.COLUMNS AS c
+  ON f.table_name = c.table_name AND f.column_name = c.column_name
+ORDER BY t.table_name, c.ordinal_position, f.field_path
+"""
+
+
+def build_tables_metadata_query(project: str, dataset_id: str) -> str:
+    """Build a query to get metadata of all tables in a dataset
+
+    Args:
+        project (str): GCP project ID
+        dataset_id (str): BigQuery dataset ID
+
+    Returns:
+        str: a query against INFORMATION_SCHEMA
+    """
+    return TABLES_METADATA_QUERY.format(project=project, dataset=dataset_id)
+
+
+def create_bigquery_query_runner(client: bigquery.Client) -> QueryRunner:
+    """Create a query runner with a BigQuery client
+
+    Args:
+        client (bigquery.Client): BigQuery client
+
+    Returns:
+        QueryRunner: a function to run a query
+    """
+
+    def run(query: str) -> Iterable[Mapping[str, Any]]:
+        for row in client.query(query).result():
+            yield dict(row.items())
+
+    return run
+
+
+def get_tables_metadata(
+        query_runner: QueryRunner,
+        project: str,
+        dataset_id: str,
+        table_pattern: Optional[str] = None) -> List[TableMetadata]:
+    """Get metadata of tables in a dataset with a single query
+
+    Args:
+        query_runner (QueryRunner): A function to run a query
+        project (str): GCP project ID
+        dataset_id (str): BigQuery dataset ID
+        table_pattern (str): regular expression for BigQuery tables
+
+    Returns:
+        List[TableMetadata]: A list of table metadata sorted by table ID
+    """
+    query = build_tables_metadata_query(project=project, dataset_id=dataset_id)
+    rows = query_runner(query)
+    tables_metadata = parse_tables_metadata_rows(rows)
+    if table_pattern is None:
+        return tables_metadata
+    return [t for t in tables_metadata if re.search(table_pattern, t.table_id)]
+
+
+def parse_tables_metadata_rows(
+        rows: Iterable[Mapping[str, Any]]) -> List[TableMetadata]:
+    """Parse rows of the INFORMATION_SCHEMA query
+
+    The nested fields are flattened as `extract_schema_info` does.
+    For instance, 'a.b.c' is a column, when 'a' and 'b' are STRUCT.
+
+    Args:
+        rows (Iterable[Mapping[str, Any]]): rows of the query
+
+    Returns:
+        List[TableMetadata]: A list of table metadata sorted by table ID
+    """
+    # NOTE: BigQuery doesn't guarantee the order of nested fields in a column.
+    # They are sorted by their positions in the STRUCT types of the parents.
+    rows = list(rows)
+    field_path_ordinals = get_field_path_ordinals(rows)
+    sorted_rows = sorted(
+        rows,
+        key=lambda r: (
+            r["table_name"], r.get("ordinal_position") or 0,
+            field_path_ordinals.get((r["table_name"], r.get("field_path")),
+                                    ())))
+
+    tables_metadata: Dict[str, TableMetadata] = {}
+    for row in sorted_rows:
+        table_name = row["table_name"]
+        if table_name not in tables_metadata:
+            tables_metadata[table_name] = TableMetadata(
+                table_id=table_name,
+                description=parse_string_option(row.get("table_description")),
+                labels=parse_labels_option(row.get("table_labels")),
+                columns=[],
+            )
+        # Skip a table without columns and STRUCT fields.
+        field_path = row.get("field_path")
+        if field_path is None or not is_scalar_data_type(row["data_type"]):
+            continue
+        description = row.get("description")
+        tables_metadata[table_name].columns.append(
+            SchemaInfo(
+                name=field_path,
+                description=description if description else None))
+    return list(tables_metadata.values())
+
+
+def get_field_path_ordinals(
+        rows: Iterable[Mapping[str, Any]]) -> Dict[Tuple[str, str], Tuple]:
+    """Get positions of field paths in their columns
+
+    A position of a nested field is a tuple of the indexes of the field and
+    its parents in the STRUCT types of their parents.
+    For instance, it is `(1, 0)` for 'a.c.d', when 'a' is
+    `STRUCT<b INT64, c STRUCT<d STRING>>`. Sorting by them results in the
+    same depth-first order as `extract_schema_info`.
+
+    Args:
+        rows (Iterable[Mapping[str, Any]]): rows of the query
+
+    Returns:
+        dict: positions keyed by a table name and a field path
+    """
+    data_types = {
+        (row["table_name"], row["field_path"]): row["data_type"]
+        for row in rows
+        if row.get("field_path") is not None
+    }
+    ordinals = {}
+    for table_name, field_path in data_types:
+        names = field_path.split(".")
+        ordinal = []
+        for i in range(1, len(names)):
+            parent_type = data_types.get((table_name, ".".join(names[:i])))
+            field_names = parse_struct_field_names(parent_type or "")
+            # An unknown field is placed after the known ones.
+            ordinal.append(
+                field_names.index(names[i]) if names[i] in
+                field_names else len(field_names))
+        ordinals[(table_name, field_path)] = tuple(ordinal)
+    return ordinals
+
+
+def parse_struct_field_names(data_type: str) -> List[str]:
+    """Parse names of fields of a STRUCT type of INFORMATION_SCHEMA
+
+    Args:
+        data_type (str): data type (e.g. 'ARRAY<STRUCT<a STRING, b INT64>>')
+
+    Returns:
+        list: names of the direct fields in order
+    """
+    match = re.match(
+        r"^\s*(?:ARRAY\s*<\s*)?STRUCT\s*<", data_type, re.IGNORECASE)
+    if match is None:
+        return []
+    names = []
+    depth = 0
+    start = match.end()
+    # Split the fields by commas which aren't nested in `<>` or `()`,
+    # until the end of the STRUCT type.
+    for i in range(match.end(), len(data_type)):
+        char = data_type[i]
+        if char in "<(":
+            depth += 1
+        elif char in ">)" and depth > 0:
+            depth -= 1
+        elif char in ",>" and depth == 0:
+            field_definition = data_type[start:i].strip()
+            if field_definition:
+                names.append(field_definition.split()[0].strip("`"))
+            if char == ">":
+                break
+            start = i + 1
+    return names
+
+
+def is_scalar_data_type(data_type: str) -> bool:
+    """Check if a data type of INFORMATION_SCHEMA is not STRUCT
+
+    Args:
+        data_type (str): data type (e.g. 'STRUCT<a STRING>')
+
+    Returns:
+        bool: return true if it is not STRUCT or ARRAY of STRUCT
+    """
+    normalized_data_type = re.sub(r"\s+", "", data_type.upper())
+    return not (
+        normalized_data_type.startswith("STRUCT<") or
+        normalized_data_type.startswith("ARRAY<STRUCT<"))
+
+
+def parse_string_option(option_value: Optional[str]) -> Optional[str]:
+    """Parse a string literal of `TABLE_OPTIONS.option_value`
+
+    Args:
+        option_value (str): string literal (e.g. '"description"')
+
+    Returns:
+        str: parsed string
+    """
+    if option_value is None:
+        return None
+    try:
+        value = ast.literal_eval(option_value)
+    except (ValueError, SyntaxError):
+        return option_value
+    return value if isinstance(value, str) else option_value
+
+
+def parse_labels_option(option_value: Optional[str]) -> Dict[str, str]:
+    """Parse labels of `TABLE_OPTIONS.option_value`
+
+    Args:
+        option_value (str): labels (e.g. '[STRUCT("key", "value")]')
+
+    Returns:
+        dict: labels
+    """
+    if option_value is None:
+        return {}
+    string_literal = r'"(?:[^"\\]|\\.)*"'
+    pattern = re.compile(
+        r"STRUCT\(\s*({literal})\s*,\s*({literal})\s*\)".format(
+            literal=string_literal))
+    return {
+        parse_string_option(key): parse_string_option(value)
+        for key, value in pattern.findall(option_value)
+    }
@@ -17,35 +17,226 @@
 # limitations under the License.
 #
 
-from __future__ import absolute_import, division, print_function
+from __future__ import absolute_import, division, print_function, annotations
 
+import hashlib
+import json
+import threading
+from collections import OrderedDict
 from dataclasses import dataclass
-from typing import List, Optional
+from typing import (
+    Any, Callable, List, Dict, Hashable, Iterable, Iterator, Optional)
 
 from google.cloud import bigquery
 
+# The default number of memoized results computed from schemas.
+DEFAULT_MAX_MEMO_ENTRIES = 256
+
 
-@dataclass
 class SchemaInfo:
-    """The class is used to manage information of a column."""
-    name: str
-    description: str = None
+    """The class is used to manage information of a column.
+
+    It is a plain class with `__slots__` rather than a dataclass,
+    because a large schema makes tens of thousands of the objects.
+    The objects are immutable, so that memoized ones are shared safely.
+    """
+    __slots__ = ("name", "description")
+
+    def __init__(self, name: str, description: str = None):
+        object.__setattr__(self, "name", name)
+        object.__setattr__(self, "description", description)
+
+    def __setattr__(self, name, value):
+        raise AttributeError("SchemaInfo is immutable")
+
+    def __delattr__(self, name):
+        raise AttributeError("SchemaInfo is immutable")
+
+    def __reduce__(self):
+        # The default one restores attributes with `__setattr__`.
+        return self.__class__, (self.name, self.description)
+
+    def __eq__(self, other):
+        if other.__class__ is not self.__class__:
+            return NotImplemented
+        return (self.name, self.description) == (other.name, other.description)
+
+    def __hash__(self):
+        return hash((self.name, self.description))
+
+    def __repr__(self):
+        return "SchemaInfo(name={!r}, description={!r})".format(
+            self.name, self.description)
+
+
+@dataclass
+class TableMetadata:
+    """The class is used to manage metadata of a BigQuery table to import."""
+    table_id: str
+    description: Optional[str] = None
+    labels: Dict[str, str] = None
+    columns: List[SchemaInfo] = None
+
+    @classmethod
+    def from_bq_table(
+            cls,
+            table: bigquery.Table,
+            memo: Optional[SchemaMemo] = None) -> TableMetadata:
+        """Extract metadata from a BigQuery table
+
+        Args:
+            table (bigquery.Table): A BigQuery table
+            memo (SchemaMemo): A memo to flatten identical schemas once
+
+        Returns:
+            :class:`TableMetadata`:
+        """
+        return TableMetadata(
+            table_id=table.table_id,
+            description=table.description,
+            labels=table.labels if table.labels is not None else {},
+            columns=extract_schema_info(table.schema, memo=memo),
+        )
+
+
+class SchemaMemo:
+    """The class is used to memoize results computed from BigQuery schemas.
+
+    Results are keyed by schema fingerprints, so that tables with an
+    identical schema (e.g. shards of a sharded table) are processed once.
+    The least recently used results are evicted beyond `max_entries`.
+
+    Args:
+        max_entries (int): the maximum number of results
+    """
+
+    def __init__(self, max_entries: int = DEFAULT_MAX_MEMO_ENTRIES):
+        self.max_entries = max_entries
+        self._results = OrderedDict()  # type: OrderedDict[Hashable, Any]
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def get_or_compute(self, key: Hashable, compute: Callable[[], Any]) -> Any:
+        """Get a memoized result or compute it
 
+        Args:
+            key: a hashable key which contains a schema fingerprint
+            compute: a function to compute the result
 
-def extract_schema_info(schema: List[bigquery.SchemaField]) -> List[SchemaInfo]:
+        Returns:
+            a memoized or computed result
+        """
+        with self._lock:
+            if key in self._results:
+                self._results.move_to_end(key)
+                self.hits += 1
+                return self._results[key]
+        result = compute()
+        with self._lock:
+            self.misses += 1
+            self._results[key] = result
+            while len(self._results) > self.max_entries:
+                self._results.popitem(last=False)
+        return result
+
+
+def schema_fingerprint(
+        schema: Iterable[bigquery.SchemaField],
+        include_metadata: bool = False) -> str:
+    """Compute a stable fingerprint of a BigQuery schema
+
+    The fingerprint is a SHA-256 hash of names, types, modes and nesting of
+    fields. Descriptions and policy tags are also hashed if `include_metadata`
+    is True, which is required to memoize results depending on them.
+
+    Args:
+        schema: Squence of :class:`~google.cloud.bigquery.schema.SchemaField`
+        include_metadata (bool): hash descriptions and policy tags as well
+
+    Returns:
+        str: a hex digest
+    """
+    hasher = hashlib.sha256()
+    # A stack of tuples of a depth and an iterator of remaining fields.
+    stack = [(0, iter(schema))]
+    while stack:
+        depth, schema_fields = stack[-1]
+        for schema_field in schema_fields:
+            token = [
+                depth, schema_field.name,
+                schema_field.field_type.upper(), schema_field.mode
+            ]
+            if include_metadata:
+                policy_tags = schema_field.policy_tags
+                token.extend(
+                    [
+                        schema_field.description, None
+                        if policy_tags is None else list(policy_tags.names)
+                    ])
+            hasher.update(json.dumps(token).encode("utf-8"))
+            if schema_field.field_type.upper() in ("STRUCT", "RECORD"):
+                stack.append((depth + 1, iter(schema_field.fields)))
+                break
+        else:
+            stack.pop()
+    return hasher.hexdigest()
+
+
+def extract_schema_info(
+        schema: List[bigquery.SchemaField],
+        memo: Optional[SchemaMemo] = None) -> List[SchemaInfo]:
     """Extract table information
 
     Args:
         schema: Squence of :class:`~google.cloud.bigquery.schema.SchemaField`
+        memo (SchemaMemo): A memo to flatten identical schemas once
 
     Returns:
         List[SchemaInfo]: A flattened list of schema field information
     """
-    table_info = []
-    for schema_field in schema:
-        schema_field_info = parse_schema_field(schema_field=schema_field)
-        table_info.extend(schema_field_info)
-    return table_info
+    if memo is None:
+        return list(iter_schema_info(schema))
+    key = (
+        "extract_schema_info",
+        schema_fingerprint(schema, include_metadata=True))
+    # A new list is returned not to share the list among callers.
+    # The immutable SchemaInfo objects in it are shared.
+    return list(
+        memo.get_or_compute(key, lambda: tuple(iter_schema_info(schema))))
+
+
+def iter_schema_info(schema: Iterable[bigquery.SchemaField],
+                     prefix: str = "") -> Iterator[SchemaInfo]:
+    """Flatten schema fields lazily in depth-first order
+
+    Nested fields are traversed with an explicit stack instead of recursion.
+    A prefix of parent field names is built once per STRUCT field.
+
+    Args:
+        schema: Squence of :class:`~google.cloud.bigquery.schema.SchemaField`
+        prefix (str): A prefix of parent field names (e.g. 'parent.')
+
+    Returns:
+        iterator: schema field information of leaf fields
+    """
+    # A stack of tuples of a prefix and an iterator of remaining fields.
+    stack = [(prefix, iter(schema))]
+    while stack:
+        prefix, schema_fields = stack[-1]
+        for schema_field in schema_fields:
+            if schema_field.field_type.upper() in ("STRUCT", "RECORD"):
+                # Descend into the nested fields before the remaining ones.
+                stack.append(
+                    (
+                        prefix + schema_field.name + ".",
+                        iter(schema_field.fields)))
+                break
+            yield SchemaInfo(
+                name=prefix + schema_field.name,
+                description=schema_field.description)
+        else:
+            stack.pop()
 
 
 def parse_schema_field(
@@ -60,23 +251,8 @@ def parse_schema_field(
     Returns:
         list: A flattened list of schema field information
     """
-    if parent_field_names is None:
-        parent_field_names = []
-
-    schema_info = []
-
-    if schema_field.field_type.upper() in ["STRUCT", "RECORD"]:
-        for child_schema_field in schema_field.fields:
-            next_parent_field_names = parent_field_names.copy()
-            next_parent_field_names.append(schema_field.name)
-            sub_schema_info = parse_schema_field(
-                child_schema_field, parent_field_names=next_parent_field_names)
-            schema_info.extend(sub_schema_info)
-    else:
-        scalar_schema_info = parse_scalar_schema_field(
-            schema_field=schema_field, parent_field_names=parent_field_names)
-        schema_info.append(scalar_schema_info)
-    return schema_info
+    prefix = "".join("{}.".format(name) for name in parent_field_names or [])
+    return list(iter_schema_info([schema_field], prefix=prefix))
 
 
 def parse_scalar_schema_field(
@@ -19,14 +19,17 @@
 
 from __future__ import absolute_import, division, print_function
 
+import hashlib
+import json
 from dataclasses import dataclass
-from typing import List, Dict, Any, Union
+from typing import List, Dict, Any, Union, Optional, Tuple
 
 import dictdiffer
 
 from google.cloud import bigquery
 
-from dbt_helper.parser.bigquery import SchemaInfo, extract_schema_info
+from dbt_helper.parser.bigquery import (
+    SchemaInfo, SchemaMemo, iter_schema_info, schema_fingerprint)
 from dbt_helper.utils import DEFAULT_DBT_CONFIG_VERSION, extract_diff
 
 
@@ -75,7 +78,12 @@ class DbtSourceTableColumn:
 
 @dataclass
 class DbtSourceTable:
-    """The class is used for `sources[].tables`."""
+    """The class is used for `sources[].tables`.
+
+    `columns` is frozen in a tuple, because parsed objects are shared and
+    an index and a fingerprint of columns are derived from it. They are
+    rebuilt whenever `columns` is replaced.
+    """
     name: str
     description: str = None
     meta: Dict[str, Any] = None
@@ -83,7 +91,24 @@ class DbtSourceTable:
     loaded_at_field: str = None
     tests: List[Union[str, Any]] = None
     tags: List[str] = None
-    columns: List[DbtSourceTableColumn] = None
+    columns: Tuple[DbtSourceTableColumn, ...] = None
+
+    def __setattr__(self, name: str, value: Any):
+        if name != "columns":
+            super().__setattr__(name, value)
+            return
+        columns = tuple(value) if value is not None else None
+        super().__setattr__("columns", columns)
+        # An index of columns by name and a hash of them, which aren't
+        # dataclass fields not to be compared or printed.
+        column_index = {}
+        hasher = hashlib.sha256()
+        for column in (columns if columns is not None else ()):
+            column_index.setdefault(column.name, column)
+            hasher.update(
+                json.dumps([column.name, column.description]).encode("utf-8"))
+        super().__setattr__("_column_index", column_index)
+        super().__setattr__("_columns_fingerprint", hasher.hexdigest())
 
     @classmethod
     def parse(cls, yaml_block):
@@ -103,44 +128,141 @@ class DbtSourceTable:
             meta=yaml_block.get("meta", {}),
             tags=yaml_block.get("tags", []),
             tests=yaml_block.get("tests", []),
-            columns=[
+            columns=tuple(
                 DbtSourceTableColumn.parse(sub_yaml_block)
-                for sub_yaml_block in yaml_block.get("columns", [])
-            ],
+                for sub_yaml_block in yaml_block.get("columns", [])),
         )
         return dbt_source_table
 
-    def compare(self, bq_table: bigquery.Table):
+    @property
+    def column_index(self) -> Dict[str, DbtSourceTableColumn]:
+        """Get an index of columns by name.
+
+        If there are columns with the same name, the first one is indexed.
+        """
+        return self._column_index
+
+    @property
+    def columns_fingerprint(self) -> str:
+        """Get a hash of names and descriptions of columns in order.
+
+        Results computed from columns can be memoized with it.
+        """
+        return self._columns_fingerprint
+
+    def get_column(self, name: str) -> Optional[DbtSourceTableColumn]:
+        """Get a column by name.
+
+        Args:
+            name (str): column name (e.g. 'a.b.c')
+
+        Returns:
+            DbtSourceTableColumn: a column if exists
+        """
+        return self.column_index.get(name)
+
+    def compare(
+            self, bq_table: bigquery.Table, memo: Optional[SchemaMemo] = None):
         """Compare to a BigQuery table.
 
         Args:
             bq_table (bigquery.Table): A BigQuery table
+            memo (SchemaMemo): A memo to compare identical schemas once
 
         Returns:
             dict: a dictionary contains different reasons
         """
+        differences = self.compare_details(bq_table, memo=memo)
         reasons = {}
         # description
+        if "description" in differences:
+            reasons["table description"] = differences["description"]
+        # labels
+        if "labels" in differences:
+            reasons["table labels"] = str(differences["labels"])
+        # columns
+        for name in differences.get("missing_columns", []):
+            reasons["not found column {}".format(name)] = (
+                "not found column {}".format(name))
+        for name, diff in differences.get("column_descriptions", {}).items():
+            key = "description of column {} is different".format(name)
+            reasons[key] = diff
+        return reasons
+
+    def compare_details(
+            self,
+            bq_table: bigquery.Table,
+            memo: Optional[SchemaMemo] = None) -> Dict[str, Any]:
+        """Compare to a BigQuery table in a machine-readable format.
+
+        Args:
+            bq_table (bigquery.Table): A BigQuery table
+            memo (SchemaMemo): A memo to compare identical schemas once
+
+        Returns:
+            dict: differences which only has the keys below, if different.
+                - description (str): diff of the table description
+                - labels (list): diff of the labels by dictdiffer
+                - missing_columns (list): columns not found in BigQuery
+                - column_descriptions (dict): diffs of column descriptions
+        """
+        differences = {}
+        # description
         if self.description != bq_table.description:
             diff = extract_diff(self.description, bq_table.description)
-            reasons["table description"] = "\n".join(diff)
+            differences["description"] = "\n".join(diff)
         # labels
-        diff = list(dictdiffer.diff(self.meta, bq_table.labels))
-        num_diff_tags = len(diff)
-        if num_diff_tags > 0:
-            reasons["table labels"] = str(diff)
-        bq_schema_info = extract_schema_info(bq_table.schema)
+        if self.meta != bq_table.labels:
+            diff = list(dictdiffer.diff(self.meta, bq_table.labels))
+            if len(diff) > 0:
+                differences["labels"] = diff
+        # columns
+        if memo is None:
+            column_differences = self._compare_columns(bq_table.schema)
+        else:
+            key = (
+                "compare_columns", self.columns_fingerprint,
+                schema_fingerprint(bq_table.schema, include_metadata=True))
+            column_differences = memo.get_or_compute(
+                key, lambda: self._compare_columns(bq_table.schema))
+        # Copies are returned not to share memoized results among callers.
+        differences.update(
+            {
+                key: value.copy() for key, value in column_differences.items()
+            })
+        return differences
+
+    def _compare_columns(self,
+                         schema: List[bigquery.SchemaField]) -> Dict[str, Any]:
+        """Compare columns with a BigQuery schema
+
+        Args:
+            schema: Sequence of :class:`~google.cloud.bigquery.schema.SchemaField`
+
+        Returns:
+            Dict[str, Any]: missing columns and different column descriptions
+        """
+        # Index the flattened BigQuery schema by column name.
+        bq_schema_index = {}
+        for schema_info in iter_schema_info(schema):
+            bq_schema_index.setdefault(schema_info.name, schema_info)
 
         # Loop over columns of dbt source schema
+        differences = {}
+        missing_columns = []
+        column_descriptions = {}
         for c in self.columns:
-            target_schema_info = [s for s in bq_schema_info if c.name == s.name]
-            if len(target_schema_info) == 0:
-                reasons["not found column {}".format(
-                    c.name)] = "not found column {}".format(c.name)
-            else:
-                sub_reasons = c.compare(target_schema_info[0])
-                reasons.update(sub_reasons)
-        return reasons
+            target_schema_info = bq_schema_index.get(c.name)
+            if target_schema_info is None:
+                missing_columns.append(c.name)
+            elif c.description != target_schema_info.description:
+                column_descriptions[c.name] = extract_diff(
+                    c.description, target_schema_info.description, as_str=True)
+        if len(missing_columns) > 0:
+            differences["missing_columns"] = missing_columns
+        if len(column_descriptions) > 0:
+            differences["column_descriptions"] = column_descriptions
+        return differences
 
 
 @dataclass
@@ -188,18 +310,6 @@ class DbtSource:
         """Check if tables exist or not"""
         return isinstance(self.tables, list) and len(self.tables) > 0
 
-    # def compare(self, bq_table: bigquery.Table):
-    #     reasons = {}
-    #     gcp_project_id = self.database
-    #     dataset_id = self.schema
-    #     for t in self.tables:
-    #         table_id = t.name
-    #         bq_table = get_bigquery_table(
-    #             project=gcp_project_id, dataset_id=dataset_id, table_id=table_id)
-    #         _reasons = t.compare(bq_table=bq_table)
-    #         reasons.update(reasons)
-    #     return reasons
-
 
 @dataclass
 class DbtSources:
@@ -0,0 +1,321 @@
+# -*- coding: utf-8 -*-
+
+#
+# Licensed to the Apache Software Foundation (ASF) under one or more
+# contributor license agreements.  See the NOTICE file distributed with
+# this work for additional information regarding copyright ownership.
+# The ASF licenses this file to You under the Apache License, Version 2.0
+# (the "License"); you may not use this file except in compliance with
+# the License.  You may obtain a copy of the License at
+#
+#    http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+#
+
+from __future__ import absolute_import, division, print_function
+
+import queue
+import threading
+import time
+from dataclasses import dataclass, field
+from typing import (
+    Any, Callable, Hashable, Iterable, Iterator, List, Optional, Tuple)
+
+# The maximum number of items waiting between two stages.
+DEFAULT_QUEUE_SIZE = 64
+
+# Seconds to wait for a queue before checking cancellation.
+POLL_INTERVAL_SECONDS = 0.1
+
+# A marker of the end of items in a queue.
+_DONE = object()
+
+
+class _Cancelled(Exception):
+    """The exception is raised in a worker when the pipeline is cancelled."""
+
+
+@dataclass
+class PipelineStage:
+    """The class is used to hold a stage of a pipeline.
+
+    `func` takes an output of the previous stage and returns an input of the
+    next stage. It is called by `workers` threads at the same time.
+    """
+    name: str
+    func: Callable[[Any], Any]
+    workers: int = 1
+
+
+@dataclass
+class PipelineFailure:
+    """The class is used to hold an item which failed in a stage."""
+    key: Optional[Hashable]
+    stage: str
+    error: Exception
+
+
+@dataclass
+class StageStats:
+    """The class is used to hold statistics of a stage."""
+    name: str
+    workers: int
+    processed: int = 0
+    failed: int = 0
+    busy_seconds: float = 0.0
+    started_at: Optional[float] = None
+    finished_at: Optional[float] = None
+    _lock: threading.Lock = field(
+        default_factory=threading.Lock, repr=False, compare=False)
+
+    @property
+    def elapsed_seconds(self) -> float:
+        """float: seconds from the first started item to the last finished one"""
+        if self.started_at is None or self.finished_at is None:
+            return 0.0
+        return self.finished_at - self.started_at
+
+    @property
+    def throughput(self) -> float:
+        """float: processed items per second"""
+        if self.elapsed_seconds <= 0.0:
+            return 0.0
+        return self.processed / self.elapsed_seconds
+
+    def record(self, started_at: float, finished_at: float, is_failed: bool):
+        """Record an item processed by a worker
+
+        Args:
+            started_at (float): when the worker started the item
+            finished_at (float): when the worker finished the item
+            is_failed (bool): if the item failed or not
+        """
+        with self._lock:
+            if is_failed is True:
+                self.failed += 1
+            else:
+                self.processed += 1
+            self.busy_seconds += finished_at - started_at
+            if self.started_at is None or started_at < self.started_at:
+                self.started_at = started_at
+            if self.finished_at is None or finished_at > self.finished_at:
+                self.finished_at = finished_at
+
+
+class Pipeline:
+    """A pipeline of stages connected with bounded queues
+
+    Items of a source are passed through the stages in order.
+    Each stage has its own worker threads, so that network I/O, CPU-bound
+    work and disk I/O of different items overlap. Bounded queues keep a
+    fast stage from running ahead of a slow one.
+
+    An item which fails in a stage is dropped and stored in `failures`.
+    The others aren't affected. Outputs aren't ordered.
+
+    Args:
+        stages (list): stages after the source
+        queue_size (int): the maximum number of items between two stages
+        source_name (str): name of the stage iterating the source
+    """
+
+    def __init__(
+            self,
+            stages: List[PipelineStage],
+            queue_size: int = DEFAULT_QUEUE_SIZE,
+            source_name: str = "source"):
+        if len(stages) == 0:
+            raise ValueError("stages must not be empty")
+        for stage in stages:
+            if stage.workers < 1:
+                raise ValueError(
+                    "workers of {} must be positive: {}".format(
+                        stage.name, stage.workers))
+        if queue_size < 1:
+            raise ValueError(
+                "queue_size must be positive: {}".format(queue_size))
+        self.stages = stages
+        self.queue_size = queue_size
+        self.source_name = source_name
+        self.failures = []  # type: List[PipelineFailure]
+        self.stats = []  # type: List[StageStats]
+        self._failures_lock = threading.Lock()
+        self._cancelled = threading.Event()
+
+    def run(
+        self,
+        source: Iterable[Any],
+        key_func: Callable[[Any], Hashable] = lambda item: item
+    ) -> Iterator[Tuple[Hashable, Any]]:
+        """Run the pipeline
+
+        The source is iterated in a thread as well. Stop iterating the
+        outputs to cancel the pipeline.
+
+        Args:
+            source (Iterable): items to pass to the first stage
+            key_func (Callable): function to get a key of an item of the source.
+                The key is attached to the outputs and the failures.
+
+        Returns:
+            Iterator: tuples of a key and an output of the last stage
+        """
+        self.failures = []
+        self.stats = [StageStats(name=self.source_name, workers=1)] + [
+            StageStats(name=stage.name, workers=stage.workers)
+            for stage in self.stages
+        ]
+        self._cancelled.clear()
+        queues = [
+            queue.Queue(maxsize=self.queue_size)
+            for _ in range(len(self.stages) + 1)
+        ]
+        # The number of running workers of each stage.
+        # The last one of a stage passes the end to the next stage.
+        running = [stage.workers for stage in self.stages]
+        running_lock = threading.Lock()
+
+        threads = [
+            threading.Thread(
+                target=self._feed,
+                args=(source, key_func, queues[0], self.stages[0].workers),
+                daemon=True)
+        ]
+        for i, stage in enumerate(self.stages):
+            num_next_workers = self.stages[i + 1].workers if i + 1 < len(
+                self.stages) else 1
+            for _ in range(stage.workers):
+                threads.append(
+                    threading.Thread(
+                        target=self._work,
+                        args=(
+                            stage, self.stats[i + 1], queues[i], queues[i + 1],
+                            num_next_workers, running, running_lock, i),
+                        daemon=True))
+        for thread in threads:
+            thread.start()
+
+        try:
+            while True:
+                message = self._get(queues[-1])
+                if message is _DONE:
+                    break
+                yield message
+        finally:
+            # Stop workers if outputs aren't consumed to the end.
+            self._cancelled.set()
+            for thread in threads:
+                thread.join()
+
+    def _feed(
+            self, source: Iterable[Any], key_func: Callable[[Any], Hashable],
+            output_queue: queue.Queue, num_next_workers: int):
+        """Put items of a source into the queue of the first stage
+
+        An error of iterating the source is stored with no key, and the items
+        before it are still processed.
+
+        Args:
+            source (Iterable): items to pass to the first stage
+            key_func (Callable): function to get a key of an item
+            output_queue (queue.Queue): queue of the first stage
+            num_next_workers (int): the number of workers of the first stage
+        """
+        stats = self.stats[0]
+        try:
+            iterator = iter(source)
+            while True:
+                started_at = time.perf_counter()
+                try:
+                    item = next(iterator)
+                    key = key_func(item)
+                except StopIteration:
+                    break
+                # pylint: disable=W0703
+                except Exception as e:
+                    self._add_failure(key=None, stage=self.source_name, error=e)
+                    stats.record(
+                        started_at, time.perf_counter(), is_failed=True)
+                    break
+                stats.record(started_at, time.perf_counter(), is_failed=False)
+                self._put(output_queue, (key, item))
+            for _ in range(num_next_workers):
+                self._put(output_queue, _DONE)
+        except _Cancelled:
+            # Nothing is left to do, because nobody reads the outputs.
+            pass
+
+    # pylint: disable=R0913
+    def _work(
+            self, stage: PipelineStage, stats: StageStats,
+            input_queue: queue.Queue, output_queue: queue.Queue,
+            num_next_workers: int, running: List[int],
+            running_lock: threading.Lock, index: int):
+        """Process items of a stage until the end of the previous stage
+
+        Args:
+            stage (PipelineStage): stage to process items
+            stats (StageStats): statistics of the stage
+            input_queue (queue.Queue): queue from the previous stage
+            output_queue (queue.Queue): queue to the next stage
+            num_next_workers (int): the number of workers of the next stage
+            running (list): the number of running workers of each stage
+            running_lock (threading.Lock): lock of `running`
+            index (int): index of the stage
+        """
+        try:
+            while True:
+                message = self._get(input_queue)
+                if message is _DONE:
+                    break
+                key, value = message
+                started_at = time.perf_counter()
+                try:
+                    output = stage.func(value)
+                # pylint: disable=W0703
+                except Exception as e:
+                    stats.record(
+                        started_at, time.perf_counter(), is_failed=True)
+                    self._add_failure(key=key, stage=stage.name, error=e)
+                    continue
+                stats.record(started_at, time.perf_counter(), is_failed=False)
+                self._put(output_queue, (key, output))
+            with running_lock:
+                running[index] -= 1
+                is_last = running[index] == 0
+            if is_last is True:
+                for _ in range(num_next_workers):
+                    self._put(output_queue, _DONE)
+        except _Cancelled:
+            # Nothing is left to do, because nobody reads the outputs.
+            pass
+
+    def _add_failure(
+            self, key: Optional[Hashable], stage: str, error: Exception):
+        with self._failures_lock:
+            self.failures.append(
+                PipelineFailure(key=key, stage=stage, error=error))
+
+    def _get(self, q: queue.Queue) -> Any:
+        while True:
+            if self._cancelled.is_set():
+                raise _Cancelled()
+            try:
+                return q.get(timeout=POLL_INTERVAL_SECONDS)
+            except queue.Empty:
+                continue
+
+    def _put(self, q: queue.Queue, message: Any):
+        while True:
+            if self._cancelled.is_set():
+                raise _Cancelled()
+            try:
+                q.put(message, timeout=POLL_INTERVAL_SECONDS)
+                return
+            except queue.Full:
+                continue
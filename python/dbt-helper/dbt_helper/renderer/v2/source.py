@@ -19,14 +19,18 @@
 
 from __future__ import absolute_import, division, print_function
 
+import functools
 import os
 import re
-from typing import Iterable, Optional, List, Dict, Any
+from dataclasses import dataclass
+from typing import Iterable, Optional, List, Dict, Any, Pattern
 
-from jinja2 import Environment, FileSystemLoader
+from jinja2 import Environment, FileSystemLoader, Template
 
 import dbt_helper
-from dbt_helper.parser.v2.source import DbtSources
+from dbt_helper.source_index import SourceIndex, SourceIndexEntry
+from dbt_helper.source_loader import (
+    DbtSourcesLoader, get_default_dbt_sources_loader)
 from dbt_helper.utils import (
     DEFAULT_DBT_CONFIG_VERSION,
     get_dataset_dir,
@@ -34,11 +38,16 @@ from dbt_helper.utils import (
     generate_reference_id,
     get_templates_path,
     normalize_gcp_project,
-    find_yaml_files,
-    load_yaml,
+    scan_yaml_files,
     strip_date_suffix,
 )
 
+# Rendering holds the GIL, so that more threads rarely speed it up.
+DEFAULT_RENDER_WORKERS = 1
+
+# Writing files releases the GIL.
+DEFAULT_WRITE_WORKERS = 4
+
 
 def generate_source_for_bq_dataset(
         models_dir: str,
@@ -100,6 +109,19 @@ def generate_source_for_bq_dataset(
     return path
 
 
+@dataclass
+class RenderedSource:
+    """The class is used to hold a rendered dbt source YAML to write."""
+    path: str
+    file_name: str
+    content: str
+
+    @property
+    def file_path(self) -> str:
+        """str: path to the YAML file"""
+        return os.path.join(self.path, self.file_name)
+
+
 def generate_source_for_bq_table(
         models_dir: str,
         project: str,
@@ -134,6 +156,52 @@ def generate_source_for_bq_table(
     Returns:
         str: path to the created directory
     """
+    rendered_source = render_source_for_bq_table(
+        models_dir=models_dir,
+        project=project,
+        project_alias=project_alias,
+        dataset=dataset,
+        table=table,
+        table_description=table_description,
+        columns=columns,
+        labels=labels,
+        tags=tags,
+        version=version,
+        is_shard=is_shard)
+    return write_rendered_source(
+        rendered_source=rendered_source, overwrite=overwrite, dry_run=dry_run)
+
+
+def render_source_for_bq_table(
+        models_dir: str,
+        project: str,
+        project_alias: str,
+        dataset: str,
+        table: str,
+        table_description=None,
+        columns=None,
+        labels=None,
+        tags=None,
+        version=DEFAULT_DBT_CONFIG_VERSION,
+        is_shard=False) -> RenderedSource:
+    """Render dbt source of a BigQuery table without writing it
+
+    Args:
+        models_dir (str): dbt models dir
+        project (str): GCP project ID
+        project_alias (str): GCP project ID alias
+        dataset (str): BigQuery dataset ID
+        table (str): BigQuery table ID
+        table_description (str): table description
+        columns (list): A list of columns. Each column is a dict.
+        labels (dict): dict of labels
+        tags (list): list of tags
+        version (str): dbt config version
+        is_shard (bool): shard table mode
+
+    Returns:
+        RenderedSource: A rendered source YAML and where to write it
+    """
     if tags is None:
         tags = []
     if labels is None:
@@ -150,7 +218,7 @@ def generate_source_for_bq_table(
         identifier = "{}*".format(table)
 
     # Render contents
-    rendered_source = _render_source_yaml_for_bq_table(
+    content = _render_source_yaml_for_bq_table(
         project=project,
         project_alias=project_alias,
         dataset=dataset,
@@ -162,7 +230,6 @@ def generate_source_for_bq_table(
         labels=labels,
         version=version)
 
-    # Create a directory to store
     source_filename = get_source_yaml_file_name(
         project_alias=project_alias, dataset=dataset, table=table)
     path = get_table_dir(
@@ -170,20 +237,33 @@ def generate_source_for_bq_table(
         project=project_alias,
         dataset=dataset,
         table=table)
+    return RenderedSource(path=path, file_name=source_filename, content=content)
+
+
+def write_rendered_source(
+        rendered_source: RenderedSource, overwrite=False, dry_run=False) -> str:
+    """Write a rendered dbt source YAML
+
+    Args:
+        rendered_source (RenderedSource): A rendered source YAML
+        overwrite (bool): flag to overwrite
+        dry_run (bool): dry run mode
 
+    Returns:
+        str: path to the created directory
+    """
+    path = rendered_source.path
     if dry_run is True:
         # TODO replace it with logging
-        print(
-            "[WARN] {} already exists".format(
-                os.path.join(path, source_filename)))
+        print("[WARN] {} already exists".format(rendered_source.file_path))
     else:
         if os.path.isdir(path) and overwrite is False:
             raise ValueError("{} already exists".format(path))
         os.makedirs(path, exist_ok=True)
 
         # Write rendered contents to files
-        with open(os.path.join(path, source_filename), "w") as f:
-            f.write(rendered_source)
+        with open(rendered_source.file_path, "w") as f:
+            f.write(rendered_source.content)
     return path
 
 
@@ -231,10 +311,9 @@ def _render_source_yaml_for_bq_dataset(
     if dataset_labels is None:
         dataset_labels = {}
 
-    path = os.path.join(templates_base_dir)
-    env = Environment(loader=FileSystemLoader(path))
-    template = env.get_template(
-        os.path.join('v2', 'source', 'dataset.source.yml.tmpl'))
+    template = _get_template(
+        templates_base_dir=templates_base_dir,
+        name=os.path.join('v2', 'source', 'dataset.source.yml.tmpl'))
     return template.render(
         project=project,
         project_alias=project_alias,
@@ -285,10 +364,9 @@ def _render_source_yaml_for_bq_table(
     if tags is None:
         tags = []
 
-    path = os.path.join(templates_base_dir)
-    env = Environment(loader=FileSystemLoader(path))
-    template = env.get_template(
-        os.path.join('v2', 'source', 'table.source.yml.tmpl'))
+    template = _get_template(
+        templates_base_dir=templates_base_dir,
+        name=os.path.join('v2', 'source', 'table.source.yml.tmpl'))
     return template.render(
         project=project,
         project_alias=project_alias,
@@ -304,18 +382,46 @@ def _render_source_yaml_for_bq_table(
     )
 
 
+@functools.lru_cache(maxsize=None)
+def _get_template(templates_base_dir: str, name: str) -> Template:
+    """Get a compiled Jinja template
+
+    Templates are compiled once per process, because compiling them costs
+    more than rendering them. A compiled template can be rendered by
+    multiple threads.
+
+    Args:
+        templates_base_dir (str): Path to the templates directory
+        name (str): relative path to the template
+
+    Returns:
+        Template: A compiled template
+    """
+    env = Environment(loader=FileSystemLoader(templates_base_dir))
+    return env.get_template(name)
+
+
 def find_source_schema_paths(
         models_dir: str,
         project_alias: str = None,
         dataset: str = None,
-        table: str = None) -> Iterable[str]:
+        table: str = None,
+        index_path: Optional[str] = None,
+        loader: Optional[DbtSourcesLoader] = None) -> Iterable[str]:
     """Find paths to dbt source schema files.
 
+    Files are filtered by their paths before being opened.
+    Only files under `{project_alias}/{dataset}/{table}/` can be matched.
+
     Args:
         models_dir (str): path to dbt models.
         project_alias (str): GCP project ID alias
         dataset (str): BigQuery dataset
         table (str): BigQuery table
+        index_path (str): path to a persistent index of parsed files.
+            Unchanged files aren't parsed again, if it is given.
+        loader (DbtSourcesLoader): loader of dbt sources.
+            The loader shared in a process is used, if it is None.
 
     Returns:
         iter: paths of dbt source schema files
@@ -333,17 +439,88 @@ def find_source_schema_paths(
 
     # Get YAML files
     models_dir = os.path.abspath(models_dir)
-    yaml_files = find_yaml_files(path=models_dir)
-    for f in yaml_files:
-        yaml_block = load_yaml(f)
-        dbt_sources = DbtSources.parse(yaml_block=yaml_block)
-        if dbt_sources.has_tables() is True:
-            path = f.replace(models_dir, '')
-            path_elements = [e for e in path.split('/') if len(e) > 0]
-            tmp_project_alias = path_elements[0]
-            tmp_dataset = path_elements[1]
-            tmp_table = path_elements[2]
-            if (pattern_project_alias.search(tmp_project_alias) and
-                    pattern_dataset.search(tmp_dataset) and
-                    pattern_table.search(tmp_table)):
+    index = None
+    if index_path is not None:
+        index = SourceIndex.load(path=index_path, models_dir=models_dir)
+    # Directories which don't match the patterns are pruned without
+    # being scanned, because source files are located at
+    # `{project_alias}/{dataset}/{table}/`.
+    dir_patterns = [pattern_project_alias, pattern_dataset, pattern_table]
+    yaml_entries = scan_yaml_files(path=models_dir, dir_patterns=dir_patterns)
+    seen_paths = set()
+    is_scanned = False
+    try:
+        for entry, dir_names in yaml_entries:
+            f = entry.path
+            relative_path = os.path.join(*dir_names, entry.name)
+            tmp_project_alias, tmp_dataset, tmp_table = dir_names[:3]
+            if index is None:
+                has_tables = has_source_tables(f, loader=loader)
+            else:
+                seen_paths.add(relative_path)
+                stat = entry.stat()
+                index_entry = index.get(
+                    relative_path=relative_path,
+                    mtime_ns=stat.st_mtime_ns,
+                    size=stat.st_size)
+                if index_entry is None:
+                    index_entry = SourceIndexEntry(
+                        mtime_ns=stat.st_mtime_ns,
+                        size=stat.st_size,
+                        has_tables=has_source_tables(f, loader=loader),
+                        project_alias=tmp_project_alias,
+                        dataset=tmp_dataset,
+                        table=tmp_table)
+                    index.put(relative_path=relative_path, entry=index_entry)
+                has_tables = index_entry.has_tables
+            if has_tables is True:
                 yield f
+        is_scanned = True
+    finally:
+        # Keep entries parsed so far, even if the caller stops early.
+        if index is not None:
+            if is_scanned is True:
+                # Entries of files which don't exist in the scanned
+                # directories any more are of deleted or renamed files.
+                index.prune(
+                    lambda relative_path: relative_path not in seen_paths and
+                    _is_in_scanned_dirs(relative_path, dir_patterns))
+            index.save()
+
+
+def _is_in_scanned_dirs(
+        relative_path: str, dir_patterns: List[Pattern]) -> bool:
+    """Check if a file is under directories matching the patterns
+
+    Args:
+        relative_path (str): relative path to the models directory
+        dir_patterns (list): compiled patterns of directory names per depth
+
+    Returns:
+        bool: True if the file is in the scanned directories
+    """
+    dir_names = relative_path.split(os.sep)[:-1]
+    if len(dir_names) < len(dir_patterns):
+        return False
+    return all(
+        pattern.search(name) for pattern, name in zip(dir_patterns, dir_names))
+
+
+def has_source_tables(
+        path: str, loader: Optional[DbtSourcesLoader] = None) -> bool:
+    """Check if a YAML file is a dbt source schema with tables
+
+    Args:
+        path (str): path to a YAML file
+        loader (DbtSourcesLoader): loader of dbt sources.
+            The loader shared in a process is used, if it is None.
+
+    Returns:
+        bool: False if it isn't a dbt source schema or it doesn't have tables
+    """
+    loader = get_default_dbt_sources_loader() if loader is None else loader
+    try:
+        dbt_sources = loader.load(path)
+    except ValueError:
+        return False
+    return dbt_sources.has_tables()
@@ -0,0 +1,289 @@
+# -*- coding: utf-8 -*-
+
+#
+# Licensed to the Apache Software Foundation (ASF) under one or more
+# contributor license agreements.  See the NOTICE file distributed with
+# this work for additional information regarding copyright ownership.
+# The ASF licenses this file to You under the Apache License, Version 2.0
+# (the "License"); you may not use this file except in compliance with
+# the License.  You may obtain a copy of the License at
+#
+#    http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+#
+
+from __future__ import absolute_import, division, print_function
+
+import heapq
+import itertools
+import random
+import threading
+import time
+from concurrent.futures import Future, ThreadPoolExecutor
+from dataclasses import dataclass, field
+from typing import Callable, Dict, Optional
+
+from google.api_core.exceptions import (
+    GoogleAPICallError, ServerError, TooManyRequests)
+
+# BigQuery allows 5 metadata update operations every 10 seconds
+# per table and per dataset.
+DEFAULT_RESOURCE_CAPACITY = 5
+DEFAULT_RESOURCE_PERIOD_SECONDS = 10.0
+
+# BigQuery allows 100 API requests per second per user.
+DEFAULT_GLOBAL_CAPACITY = 100
+DEFAULT_GLOBAL_PERIOD_SECONDS = 1.0
+
+DEFAULT_MAX_RETRIES = 5
+DEFAULT_INITIAL_BACKOFF_SECONDS = 1.0
+DEFAULT_MAX_BACKOFF_SECONDS = 32.0
+
+# Reasons of BigQuery errors which can be retried.
+RETRIABLE_REASONS = frozenset(
+    ["rateLimitExceeded", "backendError", "internalError", "badGateway"])
+
+
+def is_retriable_error(error: Exception) -> bool:
+    """Check if a failed BigQuery API call can be retried
+
+    403 `rateLimitExceeded`, 429 and 5xx responses are retriable.
+
+    Args:
+        error (Exception): an error raised by a BigQuery API call
+
+    Returns:
+        bool: True if it is retriable
+    """
+    if isinstance(error, (TooManyRequests, ServerError)):
+        return True
+    if isinstance(error, GoogleAPICallError):
+        for e in error.errors or []:
+            if isinstance(e, dict) and e.get("reason") in RETRIABLE_REASONS:
+                return True
+    return False
+
+
+class TokenBucket:
+    """A token bucket which allows `capacity` operations per `period` seconds
+
+    The class isn't thread-safe. Callers have to lock it.
+    """
+
+    def __init__(
+            self,
+            capacity: int,
+            period: float,
+            clock: Callable[[], float] = time.monotonic):
+        self.capacity = capacity
+        self.period = period
+        self._clock = clock
+        self._tokens = float(capacity)
+        self._updated_at = clock()
+
+    def _refill(self):
+        now = self._clock()
+        elapsed = max(now - self._updated_at, 0.0)
+        self._tokens = min(
+            float(self.capacity),
+            self._tokens + elapsed * self.capacity / self.period)
+        self._updated_at = now
+
+    def get_wait_time(self) -> float:
+        """Get seconds to wait until a token is available
+
+        Returns:
+            float: 0 if a token is available now
+        """
+        self._refill()
+        if self._tokens >= 1.0:
+            return 0.0
+        return (1.0 - self._tokens) * self.period / self.capacity
+
+    def acquire(self):
+        """Take a token. `get_wait_time` should be checked in advance."""
+        self._refill()
+        self._tokens -= 1.0
+
+
+@dataclass(order=True)
+class _ScheduledTask:
+    """The class is used to hold a write operation in the queue."""
+    ready_at: float
+    sequence: int
+    resource_key: str = field(compare=False)
+    func: Callable = field(compare=False)
+    future: Future = field(compare=False)
+    attempts: int = field(default=0, compare=False)
+
+
+class WriteScheduler:
+    """A scheduler of BigQuery metadata writes
+
+    Writes are rate-limited by a token bucket per resource and a global one.
+    A write which has to wait or is retried is put back to the queue,
+    so that writes to other resources keep moving in the meantime.
+    Retriable errors are retried with exponential backoff and full jitter.
+    """
+
+    def __init__(
+            self,
+            concurrency: int = 1,
+            resource_capacity: int = DEFAULT_RESOURCE_CAPACITY,
+            resource_period: float = DEFAULT_RESOURCE_PERIOD_SECONDS,
+            global_capacity: int = DEFAULT_GLOBAL_CAPACITY,
+            global_period: float = DEFAULT_GLOBAL_PERIOD_SECONDS,
+            max_retries: int = DEFAULT_MAX_RETRIES,
+            initial_backoff: float = DEFAULT_INITIAL_BACKOFF_SECONDS,
+            max_backoff: float = DEFAULT_MAX_BACKOFF_SECONDS,
+            clock: Callable[[], float] = time.monotonic,
+            random_func: Callable[[], float] = random.random):
+        self.resource_capacity = resource_capacity
+        self.resource_period = resource_period
+        self.max_retries = max_retries
+        self.initial_backoff = initial_backoff
+        self.max_backoff = max_backoff
+        self._clock = clock
+        self._random_func = random_func
+        self._global_bucket = TokenBucket(
+            capacity=global_capacity, period=global_period, clock=clock)
+        self._resource_buckets = {}  # type: Dict[str, TokenBucket]
+        self._queue = []
+        self._sequence = itertools.count()
+        self._num_running = 0
+        self._closed = False
+        self._condition = threading.Condition()
+        self._executor = ThreadPoolExecutor(max_workers=concurrency)
+        self._dispatcher = threading.Thread(target=self._dispatch, daemon=True)
+        self._dispatcher.start()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.shutdown()
+
+    def submit(
+            self, resource_key: str, func: Callable, *args, **kwargs) -> Future:
+        """Schedule a write operation
+
+        Args:
+            resource_key (str): an identifier of a written resource,
+                such as 'project.dataset.table'
+            func (Callable): a function to write
+
+        Returns:
+            Future: a future of the result of the function
+        """
+        future = Future()
+        task = _ScheduledTask(
+            ready_at=self._clock(),
+            sequence=next(self._sequence),
+            resource_key=resource_key,
+            func=lambda: func(*args, **kwargs),
+            future=future)
+        with self._condition:
+            if self._closed:
+                raise RuntimeError("The scheduler is already shut down.")
+            heapq.heappush(self._queue, task)
+            self._condition.notify_all()
+        return future
+
+    def shutdown(self):
+        """Stop the scheduler after all the scheduled writes are done"""
+        with self._condition:
+            self._closed = True
+            self._condition.notify_all()
+        self._dispatcher.join()
+        self._executor.shutdown(wait=True)
+
+    def get_backoff(self, attempts: int) -> float:
+        """Get seconds to wait before a retry
+
+        Args:
+            attempts (int): the number of failed attempts
+
+        Returns:
+            float: randomized seconds in [0, min(max_backoff, initial * 2^n))
+        """
+        backoff = min(self.max_backoff, self.initial_backoff * (2**attempts))
+        return backoff * self._random_func()
+
+    def _get_resource_bucket(self, resource_key: str) -> TokenBucket:
+        bucket = self._resource_buckets.get(resource_key)
+        if bucket is None:
+            bucket = TokenBucket(
+                capacity=self.resource_capacity,
+                period=self.resource_period,
+                clock=self._clock)
+            self._resource_buckets[resource_key] = bucket
+        return bucket
+
+    def _dispatch(self):
+        """Submit queued writes whose rate limits allow them
+
+        It runs in a dispatcher thread until the scheduler is shut down
+        and all the writes are done.
+        """
+        with self._condition:
+            while True:
+                if len(self._queue) == 0:
+                    if self._closed and self._num_running == 0:
+                        return
+                    self._condition.wait()
+                    continue
+                now = self._clock()
+                task = self._queue[0]
+                if task.ready_at > now:
+                    self._condition.wait(task.ready_at - now)
+                    continue
+                heapq.heappop(self._queue)
+                # Put the task back if any bucket is empty.
+                resource_bucket = self._get_resource_bucket(task.resource_key)
+                wait_time = max(
+                    resource_bucket.get_wait_time(),
+                    self._global_bucket.get_wait_time())
+                if wait_time > 0:
+                    task.ready_at = now + wait_time
+                    heapq.heappush(self._queue, task)
+                    continue
+                resource_bucket.acquire()
+                self._global_bucket.acquire()
+                self._num_running += 1
+                self._executor.submit(self._run, task)
+
+    def _run(self, task: _ScheduledTask):
+        """Run a write and retry it later if it failed with a retriable error
+
+        Args:
+            task (_ScheduledTask): A scheduled write
+        """
+        result = None
+        error = None  # type: Optional[Exception]
+        try:
+            result = task.func()
+        # pylint: disable=W0703
+        except Exception as e:
+            error = e
+        with self._condition:
+            self._num_running -= 1
+            is_retried = (
+                error is not None and is_retriable_error(error) and
+                task.attempts < self.max_retries)
+            if is_retried:
+                task.ready_at = self._clock() + self.get_backoff(task.attempts)
+                task.sequence = next(self._sequence)
+                task.attempts += 1
+                heapq.heappush(self._queue, task)
+            self._condition.notify_all()
+        if is_retried:
+            return
+        if error is not None:
+            task.future.set_exception(error)
+        else:
+            task.future.set_result(result)
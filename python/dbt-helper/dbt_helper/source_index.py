@@ -0,0 +1,158 @@
+# -*- coding: utf-8 -*-
+
+#
+# Licensed to the Apache Software Foundation (ASF) under one or more
+# contributor license agreements.  See the NOTICE file distributed with
+# this work for additional information regarding copyright ownership.
+# The ASF licenses this file to You under the Apache License, Version 2.0
+# (the "License"); you may not use this file except in compliance with
+# the License.  You may obtain a copy of the License at
+#
+#    http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+#
+
+from __future__ import absolute_import, division, print_function
+
+import json
+import os
+from dataclasses import asdict, dataclass
+from typing import Callable, Dict, Optional
+
+# The file name of an index of dbt source YAML files in a cache directory.
+SOURCE_INDEX_FILE_NAME = "source_index.json"
+
+# The version of the index format. An index of another version is discarded.
+SOURCE_INDEX_VERSION = 1
+
+
+@dataclass
+class SourceIndexEntry:
+    """The class is used to hold a parsed result of a YAML file."""
+    mtime_ns: int
+    size: int
+    has_tables: bool
+    project_alias: Optional[str] = None
+    dataset: Optional[str] = None
+    table: Optional[str] = None
+
+
+class SourceIndex:
+    """A persistent index of YAML files under a dbt models directory
+
+    An entry is keyed by a relative path to the models directory.
+    It is valid as long as the modified time and the size of the file are
+    the same as indexed ones.
+
+    Args:
+        path (str): path to a JSON file of the index
+        models_dir (str): path to the dbt models directory
+    """
+
+    def __init__(self, path: str, models_dir: str):
+        self.path = path
+        self.models_dir = os.path.abspath(models_dir)
+        self.entries = {}  # type: Dict[str, SourceIndexEntry]
+        self._is_changed = False
+
+    @classmethod
+    def load(cls, path: str, models_dir: str) -> "SourceIndex":
+        """Load an index from a JSON file
+
+        A missing or broken file results in an empty index.
+
+        Args:
+            path (str): path to a JSON file of the index
+            models_dir (str): path to the dbt models directory
+
+        Returns:
+            SourceIndex: A loaded index
+        """
+        index = SourceIndex(path=path, models_dir=models_dir)
+        try:
+            with open(path, "r") as f:
+                json_block = json.load(f)
+        except (OSError, ValueError):
+            return index
+        if not isinstance(json_block, dict) \
+                or json_block.get("version") != SOURCE_INDEX_VERSION \
+                or json_block.get("models_dir") != index.models_dir:
+            return index
+        try:
+            index.entries = {
+                relative_path: SourceIndexEntry(**entry)
+                for relative_path, entry in json_block["entries"].items()
+            }
+        except (KeyError, TypeError):
+            index.entries = {}
+        return index
+
+    def get(self, relative_path: str, mtime_ns: int,
+            size: int) -> Optional[SourceIndexEntry]:
+        """Get an entry if the file isn't changed
+
+        Args:
+            relative_path (str): relative path to the models directory
+            mtime_ns (int): the current modified time of the file
+            size (int): the current size of the file
+
+        Returns:
+            SourceIndexEntry: An entry or None if it is stale or missing
+        """
+        entry = self.entries.get(relative_path)
+        if entry is None or entry.mtime_ns != mtime_ns or entry.size != size:
+            return None
+        return entry
+
+    def put(self, relative_path: str, entry: SourceIndexEntry):
+        """Put an entry
+
+        Args:
+            relative_path (str): relative path to the models directory
+            entry (SourceIndexEntry): An entry
+        """
+        self.entries[relative_path] = entry
+        self._is_changed = True
+
+    def prune(self, is_removed: Callable[[str], bool]):
+        """Remove entries, such as ones of deleted or renamed files
+
+        Args:
+            is_removed (Callable): function to check if an entry of
+                a relative path is removed
+        """
+        removed_paths = [
+            relative_path for relative_path in self.entries
+            if is_removed(relative_path)
+        ]
+        for relative_path in removed_paths:
+            del self.entries[relative_path]
+        if len(removed_paths) > 0:
+            self._is_changed = True
+
+    def save(self):
+        """Write the index to the JSON file if it is changed"""
+        if self._is_changed is False:
+            return
+        dir_path = os.path.dirname(os.path.abspath(self.path))
+        os.makedirs(dir_path, exist_ok=True)
+        json_block = {
+            "version": SOURCE_INDEX_VERSION,
+            "models_dir": self.models_dir,
+            "entries":
+                {
+                    relative_path: asdict(entry)
+                    for relative_path, entry in self.entries.items()
+                },
+        }
+        # Replace the file atomically not to leave a broken index.
+        temp_path = "{}.{}.tmp".format(self.path, os.getpid())
+        with open(temp_path, "w") as f:
+            json.dump(json_block, f)
+        os.replace(temp_path, self.path)
+        self._is_changed = False
@@ -0,0 +1,291 @@
+# -*- coding: utf-8 -*-
+
+#
+# Licensed to the Apache Software Foundation (ASF) under one or more
+# contributor license agreements.  See the NOTICE file distributed with
+# this work for additional information regarding copyright ownership.
+# The ASF licenses this file to You under the Apache License, Version 2.0
+# (the "License"); you may not use this file except in compliance with
+# the License.  You may obtain a copy of the License at
+#
+#    http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+#
+
+from __future__ import absolute_import, division, print_function
+
+import hashlib
+import os
+import pickle
+import re
+import shutil
+import threading
+from collections import OrderedDict
+from typing import List, Optional, Tuple
+
+from dbt_helper.parser.v2.source import DbtSources
+from dbt_helper.utils import may_have_top_level_key, parse_yaml
+
+# The name of a directory of pickled dbt sources in a cache directory.
+SOURCES_CACHE_DIR_NAME = "sources"
+
+# The default number of parsed dbt sources in memory.
+DEFAULT_MAX_ENTRIES = 4096
+
+# The default number of pickled dbt sources in a cache directory.
+DEFAULT_MAX_PICKLES = 16384
+
+# The version of pickled files. It must be bumped whenever attributes of
+# the parser classes are added, removed, renamed or change their types,
+# because pickles of the old classes are loaded without errors.
+# Pickles of other versions are removed from a cache directory.
+PICKLE_FORMAT_VERSION = 3
+
+
+class DbtSourcesLoader:
+    """The class is used to load dbt source YAML files with memoization.
+
+    Parsed results are keyed by the SHA-256 hash of file contents, so the
+    same contents are parsed only once even if they are read repeatedly.
+    They are kept in an in-process LRU cache of `max_entries`.
+    If `cache_dir` is given, they are also pickled there and carried
+    across processes. The directory must be trusted as pickles are loaded.
+    The least recently used pickles are removed beyond `max_pickles`.
+
+    Loaded `DbtSources` objects are shared and must not be modified.
+
+    Args:
+        max_entries (int): the maximum number of entries in memory
+        cache_dir (str): directory to pickle parsed results
+        max_pickles (int): the maximum number of pickles in `cache_dir`
+    """
+
+    def __init__(
+            self,
+            max_entries: int = DEFAULT_MAX_ENTRIES,
+            cache_dir: Optional[str] = None,
+            max_pickles: int = DEFAULT_MAX_PICKLES):
+        self.max_entries = max_entries
+        self.cache_dir = cache_dir
+        self.max_pickles = max_pickles
+        # The number of pickles is counted at the first dump.
+        self._num_pickles = None  # type: Optional[int]
+        self._pickles_lock = threading.Lock()
+        # None is stored for contents which aren't dbt source schemas.
+        self._entries = OrderedDict(
+        )  # type: OrderedDict[str, Optional[DbtSources]]
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def load(self, path: str) -> DbtSources:
+        """Load a dbt source YAML file
+
+        Args:
+            path (str): path to a YAML file
+
+        Returns:
+            DbtSources: parsed dbt sources
+
+        Raises:
+            ValueError: if the file isn't a dbt source schema
+        """
+        with open(path, "rb") as f:
+            content = f.read()
+        return self.loads(content)
+
+    def loads(self, content: bytes) -> DbtSources:
+        """Load contents of a dbt source YAML file
+
+        Args:
+            content (bytes): contents of a YAML file
+
+        Returns:
+            DbtSources: parsed dbt sources
+
+        Raises:
+            ValueError: if the contents aren't a dbt source schema
+        """
+        key = hashlib.sha256(content).hexdigest()
+        with self._lock:
+            is_hit = key in self._entries
+            if is_hit:
+                self._entries.move_to_end(key)
+                dbt_sources = self._entries[key]
+                self.hits += 1
+        if not is_hit:
+            dbt_sources = self._load_pickle(key)
+            if dbt_sources is None:
+                dbt_sources = parse_dbt_sources(content.decode("utf-8"))
+                self._dump_pickle(key, dbt_sources)
+            self._put(key, dbt_sources)
+        if dbt_sources is None:
+            raise ValueError("it isn't a dbt source schema.")
+        return dbt_sources
+
+    def clear(self):
+        """Clear entries in memory"""
+        with self._lock:
+            self._entries.clear()
+
+    def _put(self, key: str, dbt_sources: Optional[DbtSources]):
+        with self._lock:
+            self.misses += 1
+            self._entries[key] = dbt_sources
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def _get_pickles_dir(self) -> str:
+        """Get the directory of pickles of the current format version"""
+        return os.path.join(self.cache_dir, "v{}".format(PICKLE_FORMAT_VERSION))
+
+    def _get_pickle_path(self, key: str) -> str:
+        """Get the path of a pickle
+
+        Pickles are spread over sub-directories by the first two characters
+        of keys not to put too many files in a directory.
+
+        Args:
+            key (str): SHA-256 hash of file contents
+
+        Returns:
+            str: path to the pickle
+        """
+        return os.path.join(
+            self._get_pickles_dir(), key[:2], "{}.pickle".format(key))
+
+    def _load_pickle(self, key: str) -> Optional[DbtSources]:
+        """Load pickled dbt sources from the cache directory
+
+        Args:
+            key (str): SHA-256 hash of file contents
+
+        Returns:
+            DbtSources: parsed dbt sources or None if they aren't pickled
+        """
+        if self.cache_dir is None:
+            return None
+        path = self._get_pickle_path(key)
+        try:
+            with open(path, "rb") as f:
+                dbt_sources = pickle.load(f)
+            # Touch the file so that recently used ones are kept in eviction.
+            os.utime(path)
+        except FileNotFoundError:
+            return None
+        # A broken file is ignored, and then it is overwritten.
+        # pylint: disable=W0703
+        except Exception:
+            return None
+        if not isinstance(dbt_sources, DbtSources):
+            return None
+        return dbt_sources
+
+    def _dump_pickle(self, key: str, dbt_sources: Optional[DbtSources]):
+        """Pickle parsed dbt sources in the cache directory
+
+        Only dbt source schemas are pickled. Others are cheap to recognize.
+
+        Args:
+            key (str): SHA-256 hash of file contents
+            dbt_sources (DbtSources): parsed dbt sources or None
+        """
+        if self.cache_dir is None or dbt_sources is None:
+            return
+        path = self._get_pickle_path(key)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        # Replace the file atomically not to leave a broken pickle.
+        temp_path = "{}.{}.{}.tmp".format(
+            path, os.getpid(), threading.get_ident())
+        with open(temp_path, "wb") as f:
+            pickle.dump(dbt_sources, f, protocol=pickle.HIGHEST_PROTOCOL)
+        os.replace(temp_path, path)
+        with self._pickles_lock:
+            if self._num_pickles is None:
+                self._remove_old_pickles()
+                self._num_pickles = len(self._list_pickles())
+            else:
+                self._num_pickles += 1
+            if self._num_pickles > self.max_pickles:
+                self._num_pickles = self._evict_pickles()
+
+    def _list_pickles(self) -> List[Tuple[float, str]]:
+        """List pickles of the current format version
+
+        Returns:
+            list: tuples of the modification time and the path of pickles
+        """
+        pickles = []
+        for root, _, files in os.walk(self._get_pickles_dir()):
+            for name in files:
+                if not name.endswith(".pickle"):
+                    continue
+                path = os.path.join(root, name)
+                try:
+                    pickles.append((os.path.getmtime(path), path))
+                except FileNotFoundError:
+                    # It was removed by another process.
+                    continue
+        return pickles
+
+    def _evict_pickles(self) -> int:
+        """Remove the least recently used pickles beyond `max_pickles`
+
+        A tenth of `max_pickles` is removed in addition, so that the
+        directory isn't listed at every dump.
+
+        Returns:
+            int: the number of remaining pickles
+        """
+        pickles = sorted(self._list_pickles())
+        num_kept = self.max_pickles - self.max_pickles // 10
+        num_removed = max(len(pickles) - num_kept, 0)
+        for _, path in pickles[:num_removed]:
+            try:
+                os.remove(path)
+            except FileNotFoundError:
+                continue
+        return len(pickles) - num_removed
+
+    def _remove_old_pickles(self):
+        """Remove pickles of other format versions"""
+        current_dir_name = os.path.basename(self._get_pickles_dir())
+        for name in os.listdir(self.cache_dir):
+            path = os.path.join(self.cache_dir, name)
+            if name != current_dir_name and re.fullmatch(
+                    r"v\d+", name) and os.path.isdir(path):
+                shutil.rmtree(path, ignore_errors=True)
+
+
+def parse_dbt_sources(text: str) -> Optional[DbtSources]:
+    """Parse a dbt source YAML string
+
+    Args:
+        text (str): YAML string
+
+    Returns:
+        DbtSources: parsed dbt sources or None if it isn't a dbt source schema
+    """
+    # Avoid parsing the whole YAML which surely isn't a dbt source schema.
+    if not may_have_top_level_key(text=text, key="sources"):
+        return None
+    try:
+        return DbtSources.parse(yaml_block=parse_yaml(text))
+    except ValueError:
+        # e.g. a schema YAML of dbt models
+        return None
+
+
+# A loader shared in a process.
+_DEFAULT_LOADER = DbtSourcesLoader()
+
+
+def get_default_dbt_sources_loader() -> DbtSourcesLoader:
+    """Get the loader shared in a process"""
+    return _DEFAULT_LOADER
@@ -0,0 +1,602 @@
+# -*- coding: utf-8 -*-
+
+#
+# Licensed to the Apache Software Foundation (ASF) under one or more
+# contributor license agreements.  See the NOTICE file distributed with
+# this work for additional information regarding copyright ownership.
+# The ASF licenses this file to You under the Apache License, Version 2.0
+# (the "License"); you may not use this file except in compliance with
+# the License.  You may obtain a copy of the License at
+#
+#    http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+#
+"""A local fake server of BigQuery metadata REST API
+
+It implements get, list, patch and delete of datasets and tables,
+so that dbt-helper can be tested and benchmarked with no network.
+"""
+from __future__ import absolute_import, division, print_function
+
+import copy
+import json
+import re
+import threading
+import time
+from collections import Counter, OrderedDict
+from dataclasses import dataclass
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Any, Dict, List, Optional, Tuple
+from urllib.parse import parse_qs, unquote, urlparse
+
+from google.auth.credentials import AnonymousCredentials
+from google.cloud import bigquery
+
+# The default number of tables in a page of `tables.list`.
+DEFAULT_PAGE_SIZE = 50
+
+_API_PREFIX = "/bigquery/v2"
+_DATASET_PATH = re.compile(r"^/projects/([^/]+)/datasets/([^/]+)$")
+_TABLES_PATH = re.compile(r"^/projects/([^/]+)/datasets/([^/]+)/tables$")
+_TABLE_PATH = re.compile(r"^/projects/([^/]+)/datasets/([^/]+)/tables/([^/]+)$")
+
+_STATUSES = {
+    400: "INVALID_ARGUMENT",
+    403: "PERMISSION_DENIED",
+    404: "NOT_FOUND",
+    412: "FAILED_PRECONDITION",
+    429: "RESOURCE_EXHAUSTED",
+    500: "INTERNAL",
+    503: "UNAVAILABLE",
+}
+
+
+def _select_fields(resource: Dict[str, Any],
+                   query: Dict[str, List[str]]) -> Dict[str, Any]:
+    """Copy a resource as a partial response if `fields` is given
+
+    Only top-level fields separated by commas are supported.
+
+    Args:
+        resource (dict): API resource
+        query (dict): query parameters
+
+    Returns:
+        dict: a copy of the resource with the selected fields
+    """
+    if "fields" not in query:
+        return copy.deepcopy(resource)
+    fields = query["fields"][0].split(",")
+    return {
+        key: copy.deepcopy(value)
+        for key, value in resource.items()
+        if key in fields
+    }
+
+
+class FakeApiError(Exception):
+    """The class is used to return an error response."""
+
+    def __init__(self, code: int, reason: str, message: str):
+        super().__init__(message)
+        self.code = code
+        self.reason = reason
+        self.message = message
+
+    def to_api_repr(self) -> Dict[str, Any]:
+        """Convert the error to a JSON body of BigQuery API"""
+        return {
+            "error":
+                {
+                    "code": self.code,
+                    "message": self.message,
+                    "errors":
+                        [
+                            {
+                                "message": self.message,
+                                "domain": "global",
+                                "reason": self.reason,
+                            }
+                        ],
+                    "status": _STATUSES.get(self.code, "UNKNOWN"),
+                }
+        }
+
+
+@dataclass
+class InjectedError:
+    """The class is used to hold an error injected to matched requests."""
+    code: int
+    reason: str
+    method: Optional[str] = None
+    path_pattern: Optional[str] = None
+    count: int = 1
+
+    def match(self, method: str, path: str) -> bool:
+        """Check if a request matches the error"""
+        if self.count <= 0:
+            return False
+        if self.method is not None and self.method != method:
+            return False
+        if self.path_pattern is not None and not re.search(self.path_pattern,
+                                                           path):
+            return False
+        return True
+
+
+class FakeBigQueryServer:
+    """A local fake server of BigQuery metadata REST API
+
+    Args:
+        host (str): host to listen
+        port (int): port to listen. A free port is used if it is 0.
+        latency (float): seconds to sleep before handling each request
+        page_size (int): the default number of tables in a page of list
+
+    Examples:
+        with FakeBigQueryServer(latency=0.01) as server:
+            server.add_table("project", "dataset", "table", schema=[...])
+            client = server.create_client()
+    """
+
+    def __init__(
+            self,
+            host: str = "127.0.0.1",
+            port: int = 0,
+            latency: float = 0.0,
+            page_size: int = DEFAULT_PAGE_SIZE):
+        self.host = host
+        self.port = port
+        self.latency = latency
+        self.page_size = page_size
+        self.request_counts = Counter()
+        self._datasets = {}  # type: Dict[Tuple[str, str], Dict[str, Any]]
+        self._tables = {}  # type: Dict[Tuple[str, str], OrderedDict]
+        self._injected_errors = []  # type: List[InjectedError]
+        self._num_updates = 0
+        self._lock = threading.Lock()
+        self._httpd = None  # type: Optional[ThreadingHTTPServer]
+        self._thread = None  # type: Optional[threading.Thread]
+
+    def __enter__(self):
+        self.start()
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.stop()
+
+    @property
+    def url(self) -> str:
+        """The API endpoint of the server"""
+        return "http://{}:{}".format(self.host, self.port)
+
+    def start(self):
+        """Start the server on a background thread"""
+        handler_class = type(
+            "BoundFakeBigQueryHandler", (_FakeBigQueryHandler,),
+            {"fake_server": self})
+        self._httpd = ThreadingHTTPServer((self.host, self.port), handler_class)
+        self._httpd.daemon_threads = True
+        self.port = self._httpd.server_address[1]
+        self._thread = threading.Thread(
+            target=self._httpd.serve_forever,
+            kwargs={"poll_interval": 0.05},
+            daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        """Stop the server"""
+        if self._httpd is not None:
+            self._httpd.shutdown()
+            self._httpd.server_close()
+            self._thread.join()
+            self._httpd = None
+
+    def create_client(self, project: str = "fake-project") -> bigquery.Client:
+        """Create a BigQuery client which calls the server
+
+        Args:
+            project (str): GCP project for the client
+
+        Returns:
+            bigquery.Client: A BigQuery client
+        """
+        return bigquery.Client(
+            project=project,
+            credentials=AnonymousCredentials(),
+            client_options={"api_endpoint": self.url})
+
+    def inject_error(
+            self,
+            code: int = 403,
+            reason: str = "rateLimitExceeded",
+            method: Optional[str] = None,
+            path_pattern: Optional[str] = None,
+            count: int = 1):
+        """Return an error to the next `count` matched requests
+
+        Args:
+            code (int): HTTP status code
+            reason (str): reason of the error (e.g. 'rateLimitExceeded')
+            method (str): HTTP method to match. Any method if it is None.
+            path_pattern (str): regular expression of paths under
+                '/bigquery/v2' to match. Any path if it is None.
+            count (int): the number of requests to fail
+        """
+        with self._lock:
+            self._injected_errors.append(
+                InjectedError(
+                    code=code,
+                    reason=reason,
+                    method=method,
+                    path_pattern=path_pattern,
+                    count=count))
+
+    def add_dataset(
+            self,
+            project: str,
+            dataset_id: str,
+            description: Optional[str] = None,
+            labels: Optional[Dict[str, str]] = None) -> Dict[str, Any]:
+        """Add a dataset
+
+        Args:
+            project (str): GCP project ID
+            dataset_id (str): BigQuery dataset ID
+            description (str): description of the dataset
+            labels (dict): labels of the dataset
+
+        Returns:
+            dict: the dataset resource
+        """
+        now = _now_millis()
+        resource = {
+            "kind": "bigquery#dataset",
+            "id": "{}:{}".format(project, dataset_id),
+            "datasetReference": {
+                "projectId": project,
+                "datasetId": dataset_id,
+            },
+            "labels": dict(labels) if labels else {},
+            "creationTime": now,
+            "lastModifiedTime": now,
+            "location": "US",
+        }
+        if description is not None:
+            resource["description"] = description
+        with self._lock:
+            resource["etag"] = self._next_etag()
+            self._datasets[(project, dataset_id)] = resource
+            self._tables.setdefault((project, dataset_id), OrderedDict())
+        return copy.deepcopy(resource)
+
+    def add_table(
+            self,
+            project: str,
+            dataset_id: str,
+            table_id: str,
+            schema: Optional[List[Dict[str, Any]]] = None,
+            description: Optional[str] = None,
+            labels: Optional[Dict[str, str]] = None,
+            table_type: str = "TABLE") -> Dict[str, Any]:
+        """Add a table. The dataset is added if it doesn't exist.
+
+        Args:
+            project (str): GCP project ID
+            dataset_id (str): BigQuery dataset ID
+            table_id (str): BigQuery table ID
+            schema (list): fields in the API representation
+            description (str): description of the table
+            labels (dict): labels of the table
+            table_type (str): 'TABLE' or 'VIEW'
+
+        Returns:
+            dict: the table resource
+        """
+        if (project, dataset_id) not in self._datasets:
+            self.add_dataset(project=project, dataset_id=dataset_id)
+        now = _now_millis()
+        resource = {
+            "kind": "bigquery#table",
+            "id": "{}:{}.{}".format(project, dataset_id, table_id),
+            "tableReference":
+                {
+                    "projectId": project,
+                    "datasetId": dataset_id,
+                    "tableId": table_id,
+                },
+            "schema": {
+                "fields": copy.deepcopy(schema) if schema else []
+            },
+            "labels": dict(labels) if labels else {},
+            "type": table_type,
+            "creationTime": now,
+            "lastModifiedTime": now,
+            "location": "US",
+        }
+        if description is not None:
+            resource["description"] = description
+        with self._lock:
+            resource["etag"] = self._next_etag()
+            self._tables[(project, dataset_id)][table_id] = resource
+        return copy.deepcopy(resource)
+
+    def get_dataset_resource(self, project: str,
+                             dataset_id: str) -> Optional[Dict[str, Any]]:
+        """Get a copy of a stored dataset resource"""
+        with self._lock:
+            resource = self._datasets.get((project, dataset_id))
+            return copy.deepcopy(resource)
+
+    def get_table_resource(self, project: str, dataset_id: str,
+                           table_id: str) -> Optional[Dict[str, Any]]:
+        """Get a copy of a stored table resource"""
+        with self._lock:
+            tables = self._tables.get((project, dataset_id), {})
+            return copy.deepcopy(tables.get(table_id))
+
+    def handle(
+            self, method: str, path: str, query: Dict[str, List[str]],
+            headers: Dict[str, str],
+            body: Optional[Dict[str, Any]]) -> Tuple[int, Any]:
+        """Handle a request
+
+        Args:
+            method (str): HTTP method
+            path (str): path under '/bigquery/v2'
+            query (dict): query parameters
+            headers (dict): HTTP headers
+            body (dict): JSON body
+
+        Returns:
+            tuple: a HTTP status code and a JSON body
+        """
+        if self.latency > 0:
+            time.sleep(self.latency)
+        with self._lock:
+            self.request_counts[method] += 1
+            try:
+                self._raise_injected_error(method=method, path=path)
+                return self._route(
+                    method=method,
+                    path=path,
+                    query=query,
+                    headers=headers,
+                    body=body)
+            except FakeApiError as e:
+                return e.code, e.to_api_repr()
+
+    def _raise_injected_error(self, method: str, path: str):
+        for injected_error in self._injected_errors:
+            if injected_error.match(method=method, path=path):
+                injected_error.count -= 1
+                raise FakeApiError(
+                    code=injected_error.code,
+                    reason=injected_error.reason,
+                    message="Injected error: {}".format(injected_error.reason))
+
+    def _route(
+            self, method: str, path: str, query: Dict[str, List[str]],
+            headers: Dict[str, str],
+            body: Optional[Dict[str, Any]]) -> Tuple[int, Any]:
+        """Dispatch a request to a resource by its path
+
+        Args:
+            method (str): HTTP method
+            path (str): path of the request
+            query (dict): query parameters
+            headers (dict): HTTP headers with lower-cased names
+            body (dict): JSON body of the request
+
+        Returns:
+            tuple: a HTTP status code and a JSON body of the response
+        """
+        match = _TABLE_PATH.match(path)
+        if match:
+            key = (unquote(match.group(1)), unquote(match.group(2)))
+            table_id = unquote(match.group(3))
+            if method == "GET":
+                return 200, _select_fields(
+                    self._get_table(key, table_id), query=query)
+            if method == "PATCH":
+                resource = self._get_table(key, table_id)
+                self._patch(resource, headers=headers, body=body)
+                return 200, copy.deepcopy(resource)
+            if method == "DELETE":
+                self._get_table(key, table_id)
+                del self._tables[key][table_id]
+                return 204, None
+        match = _TABLES_PATH.match(path)
+        if match and method == "GET":
+            key = (unquote(match.group(1)), unquote(match.group(2)))
+            return 200, self._list_tables(key, query=query)
+        match = _DATASET_PATH.match(path)
+        if match:
+            key = (unquote(match.group(1)), unquote(match.group(2)))
+            if method == "GET":
+                return 200, _select_fields(self._get_dataset(key), query=query)
+            if method == "PATCH":
+                resource = self._get_dataset(key)
+                self._patch(resource, headers=headers, body=body)
+                return 200, copy.deepcopy(resource)
+            if method == "DELETE":
+                self._get_dataset(key)
+                delete_contents = query.get("deleteContents", ["false"])[0]
+                if len(self._tables[key]) > 0 and delete_contents != "true":
+                    raise FakeApiError(
+                        code=400,
+                        reason="resourceInUse",
+                        message="Dataset {}:{} is still in use".format(*key))
+                del self._datasets[key]
+                del self._tables[key]
+                return 204, None
+        raise FakeApiError(
+            code=400,
+            reason="badRequest",
+            message="Unsupported request: {} {}".format(method, path))
+
+    def _get_dataset(self, key: Tuple[str, str]) -> Dict[str, Any]:
+        resource = self._datasets.get(key)
+        if resource is None:
+            raise FakeApiError(
+                code=404,
+                reason="notFound",
+                message="Not found: Dataset {}:{}".format(*key))
+        return resource
+
+    def _get_table(self, key: Tuple[str, str], table_id: str) -> Dict[str, Any]:
+        self._get_dataset(key)
+        resource = self._tables[key].get(table_id)
+        if resource is None:
+            raise FakeApiError(
+                code=404,
+                reason="notFound",
+                message="Not found: Table {}:{}.{}".format(
+                    key[0], key[1], table_id))
+        return resource
+
+    def _list_tables(self, key: Tuple[str, str],
+                     query: Dict[str, List[str]]) -> Dict[str, Any]:
+        """List a page of tables in a dataset
+
+        Args:
+            key (tuple): a GCP project ID and a dataset ID
+            query (dict): query parameters (e.g. `maxResults`, `pageToken`)
+
+        Returns:
+            dict: a response of `tables.list`
+        """
+        self._get_dataset(key)
+        tables = list(self._tables[key].values())
+        page_size = int(query.get("maxResults", [self.page_size])[0])
+        offset = int(query.get("pageToken", ["0"])[0])
+        page = tables[offset:offset + page_size]
+        response = {
+            "kind":
+                "bigquery#tableList",
+            "totalItems":
+                len(tables),
+            "tables":
+                [
+                    {
+                        "kind":
+                            "bigquery#table",
+                        "id":
+                            resource["id"],
+                        "tableReference":
+                            copy.deepcopy(resource["tableReference"]),
+                        "labels":
+                            copy.deepcopy(resource["labels"]),
+                        "type":
+                            resource["type"],
+                        "creationTime":
+                            resource["creationTime"],
+                    } for resource in page
+                ],
+        }
+        if offset + page_size < len(tables):
+            response["nextPageToken"] = str(offset + page_size)
+        return response
+
+    def _patch(
+            self, resource: Dict[str, Any], headers: Dict[str, str],
+            body: Optional[Dict[str, Any]]):
+        """Patch a resource in place like `tables.patch` and `datasets.patch`
+
+        Args:
+            resource (dict): a stored resource
+            headers (dict): HTTP headers with lower-cased names
+            body (dict): JSON body of the request
+
+        Raises:
+            FakeApiError: if `If-Match` doesn't match the etag
+        """
+        etag = headers.get("if-match")
+        if etag is not None and etag != resource["etag"]:
+            raise FakeApiError(
+                code=412,
+                reason="conditionNotMet",
+                message="Precondition check failed.")
+        for key, value in (body or {}).items():
+            if key in ["tableReference", "datasetReference", "etag", "id"]:
+                continue
+            if key == "labels":
+                # A label whose value is null is removed.
+                labels = resource.setdefault("labels", {})
+                for label_key, label_value in (value or {}).items():
+                    if label_value is None:
+                        labels.pop(label_key, None)
+                    else:
+                        labels[label_key] = label_value
+            elif value is None:
+                resource.pop(key, None)
+            else:
+                resource[key] = copy.deepcopy(value)
+        resource["lastModifiedTime"] = _now_millis()
+        resource["etag"] = self._next_etag()
+
+    def _next_etag(self) -> str:
+        self._num_updates += 1
+        return "etag-{}".format(self._num_updates)
+
+
+class _FakeBigQueryHandler(BaseHTTPRequestHandler):
+    """A HTTP handler to pass requests to a `FakeBigQueryServer`"""
+    # Keep connections alive to test connection pools.
+    protocol_version = "HTTP/1.1"
+    # Avoid delays of responses split into headers and a body.
+    disable_nagle_algorithm = True
+    fake_server = None  # type: FakeBigQueryServer
+
+    def do_GET(self):  # pylint: disable=C0103
+        self._handle("GET")
+
+    def do_PATCH(self):  # pylint: disable=C0103
+        self._handle("PATCH")
+
+    def do_DELETE(self):  # pylint: disable=C0103
+        self._handle("DELETE")
+
+    def log_message(self, format, *args):  # pylint: disable=W0622
+        pass
+
+    def _handle(self, method: str):
+        """Handle a request and write a JSON response
+
+        Args:
+            method (str): HTTP method
+        """
+        parsed_url = urlparse(self.path)
+        path = parsed_url.path
+        length = int(self.headers.get("Content-Length", 0))
+        raw_body = self.rfile.read(length) if length > 0 else b""
+        if not path.startswith(_API_PREFIX):
+            status, body = 404, FakeApiError(
+                code=404,
+                reason="notFound",
+                message="Not found: {}".format(path)).to_api_repr()
+        else:
+            status, body = self.fake_server.handle(
+                method=method,
+                path=path[len(_API_PREFIX):],
+                query=parse_qs(parsed_url.query),
+                headers={
+                    k.lower(): v for k, v in self.headers.items()
+                },
+                body=json.loads(raw_body) if raw_body else None)
+        data = json.dumps(body).encode("utf-8") if body is not None else b""
+        self.send_response(status)
+        if body is not None:
+            self.send_header("Content-Type", "application/json; charset=UTF-8")
+        self.send_header("Content-Length", str(len(data)))
+        self.end_headers()
+        self.wfile.write(data)
+
+
+def _now_millis() -> str:
+    return str(int(time.time() * 1000))
@@ -20,7 +20,7 @@
 from __future__ import absolute_import, division, print_function, annotations
 
 from dataclasses import dataclass
-from typing import Any, Dict
+from typing import Any, Dict, Iterator, List, Optional, Tuple
 
 import ruamel
 import ruamel.yaml
@@ -29,7 +29,7 @@ from ruamel.yaml.comments import CommentedSeq, CommentedMap
 from google.cloud import bigquery
 
 from dbt_helper.utils import get_ruamel_yaml
-from dbt_helper.parser.bigquery import extract_schema_info
+from dbt_helper.parser.bigquery import SchemaInfo, extract_schema_info
 
 
 @dataclass
@@ -69,17 +69,28 @@ class SourceTableUpdaterV2:
 
     @classmethod
     def validate_sources(cls, data: Any):
-        """Validate a loaded YAML data."""
+        """Validate a loaded YAML data.
+
+        It may contain any number of sources and tables.
+        """
         if "sources" not in data:
             raise ValueError("not a dbt source YAML")
-        if len(data["sources"]) > 1:
-            raise ValueError("contains multiple datasets")
-        if "tables" not in data["sources"][0]:
+        if not any(len(s.get("tables") or []) > 0 for s in data["sources"]):
             raise ValueError("no tables")
-        if len(data["sources"][0]["tables"]) > 1:
-            raise ValueError("contains multiple tables")
         return True
 
+    def iter_tables(self) -> Iterator[Tuple[str, str, CommentedMap]]:
+        """Iterate over 'sources[].tables[]'
+
+        Returns:
+            iterator: tuples of a dataset ID, a table ID and a table block.
+                The table ID is `identifier` if it exists, otherwise `name`.
+        """
+        for source_block in self.data["sources"]:
+            for table_block in source_block.get("tables") or []:
+                table_id = table_block.get("identifier") or table_block["name"]
+                yield source_block["name"], table_id, table_block
+
     def dump(self, path: str) -> None:
         """Dump YAML data to a YAML file.
 
@@ -107,6 +118,25 @@ class SourceTableUpdaterV2:
         self.update_columns(table.schema)
         return self
 
+    def update_with_bq_tables(
+            self, tables: Dict[Tuple[str, str],
+                               bigquery.Table]) -> SourceTableUpdaterV2:
+        """Update metadata of tables with BigQuery tables.
+
+        Tables which aren't in `tables` are left as they are.
+
+        Args:
+            tables (dict): BigQuery tables by a dataset ID and a table ID
+
+        Returns:
+            self
+        """
+        for dataset_id, table_id, table_block in self.iter_tables():
+            table = tables.get((dataset_id, table_id))
+            if table is not None:
+                update_table_block(table_block=table_block, table=table)
+        return self
+
     def update_columns(
             self, schema: bigquery.SchemaField) -> SourceTableUpdaterV2:
         """Update 'sources[].tables[].columns'
@@ -120,30 +150,8 @@ class SourceTableUpdaterV2:
         # Convert BigQuery schema to dbt format.
         new_schema_info_list = extract_schema_info(schema)
         # Update columns with new schema.
-        cursor_index = 0
-        for schema_info in new_schema_info_list:
-            has_column = False  # flag to check if a target column exists in old schema.
-            # Add an existing column.
-            for index, existing_column in enumerate(self.columns):
-                # Update description with new one
-                if existing_column["name"] == schema_info.name:
-                    if isinstance(schema_info.description, str):
-                        existing_column["description"] = schema_info.description
-                    has_column = True
-                    cursor_index = index
-            # Add a new column.
-            if has_column is False:
-                new_column = CommentedMap()
-                new_column["name"] = schema_info.name
-                if isinstance(schema_info.description, str):
-                    new_column["description"] = schema_info.description
-                self.columns.insert(cursor_index + 1, new_column)
-        # Remove columns which don't exist in new schema.
-        for existing_column in self.columns:
-            if existing_column["name"] not in [
-                    c.name for c in new_schema_info_list
-            ]:
-                self.columns.remove(existing_column)
+        merge_columns(
+            columns=self.columns, schema_info_list=new_schema_info_list)
         return self
 
     @property
@@ -180,3 +188,75 @@ class SourceTableUpdaterV2:
     def columns(self) -> CommentedSeq:
         """Get a table description."""
         return self.data["sources"][0]["tables"][0]["columns"]
+
+
+def update_table_block(table_block: CommentedMap, table: bigquery.Table):
+    """Update 'sources[].tables[]' with a BigQuery table in place
+
+    Args:
+        table_block (CommentedMap): a table of a dbt source
+        table (bigquery.Table): BigQuery table or view
+    """
+    if isinstance(table.description, str):
+        table_block["description"] = table.description
+    if isinstance(table.labels, dict) and len(table.labels) > 0:
+        table_block["meta"] = table.labels
+    if "columns" not in table_block:
+        table_block["columns"] = CommentedSeq()
+    merge_columns(
+        columns=table_block["columns"],
+        schema_info_list=extract_schema_info(table.schema))
+
+
+def merge_columns(columns: CommentedSeq, schema_info_list: List[SchemaInfo]):
+    """Merge BigQuery schema into 'sources[].tables[].columns' in place
+
+    Existing columns keep their order and comments, and their descriptions
+    are updated. A new column is placed after the column of the preceding
+    field in the schema. Columns which don't exist in the schema are removed.
+
+    Args:
+        columns (CommentedSeq): columns of a dbt source table
+        schema_info_list (List[SchemaInfo]): flattened BigQuery schema
+    """
+    # Index existing columns by name.
+    existing_columns = {}  # type: Dict[str, CommentedMap]
+    for column in columns:
+        existing_columns.setdefault(column["name"], column)
+    # Plan new columns to insert after an existing column.
+    # The key None is used for new columns at the beginning.
+    insertions = {}  # type: Dict[Optional[int], List[CommentedMap]]
+    new_names = set()
+    anchor = None
+    for schema_info in schema_info_list:
+        new_names.add(schema_info.name)
+        existing_column = existing_columns.get(schema_info.name)
+        if existing_column is not None:
+            # Update description with new one
+            if isinstance(schema_info.description, str):
+                existing_column["description"] = schema_info.description
+            anchor = id(existing_column)
+            continue
+        # Add a new column.
+        new_column = CommentedMap()
+        new_column["name"] = schema_info.name
+        if isinstance(schema_info.description, str):
+            new_column["description"] = schema_info.description
+        insertions.setdefault(anchor, []).append(new_column)
+    # Apply the plan in one pass.
+    merged_columns = list(insertions.get(None, []))
+    comments = {}
+    for index, column in enumerate(columns):
+        # Remove columns which don't exist in new schema.
+        if column["name"] not in new_names:
+            continue
+        if index in columns.ca.items:
+            comments[len(merged_columns)] = columns.ca.items[index]
+        merged_columns.append(column)
+        merged_columns.extend(insertions.get(id(column), []))
+    # Replace items at once, because `CommentedSeq` shifts its comments
+    # on every insertion and deletion.
+    list.clear(columns)
+    list.extend(columns, merged_columns)
+    columns.ca.items.clear()
+    columns.ca.items.update(comments)
@@ -22,9 +22,12 @@ from __future__ import absolute_import, division, print_function
 import difflib
 import re
 import os
-import glob
+from concurrent.futures import (
+    FIRST_COMPLETED, ThreadPoolExecutor, as_completed, wait)
 from datetime import datetime
-from typing import Optional, Union, List, Dict
+from typing import (
+    Optional, Union, List, Dict, Callable, Iterable, Iterator, Any, Pattern,
+    Tuple)
 import json
 
 import ruamel
@@ -140,6 +143,9 @@ def parse_labels(labels: List[str] = None) -> Dict[str, str]:
     return label_dict
 
 
+YAML_FILE_PATTERN = re.compile(r"\.(yml|yaml)$")
+
+
 def find_yaml_files(path: str):
     """Find YAML files in a directory
 
@@ -149,11 +155,51 @@ def find_yaml_files(path: str):
     Returns:
         iterator:
     """
-    pattern = re.compile(r"\.(yml|tools)$")
-    base_dir = os.path.join(path, '**', '*')
-    for file_or_dir in glob.iglob(base_dir, recursive=True):
-        if os.path.isfile(file_or_dir) and pattern.search(file_or_dir):
-            yield file_or_dir
+    for entry, _ in scan_yaml_files(path):
+        yield entry.path
+
+
+def scan_yaml_files(
+    path: str,
+    dir_patterns: Optional[List[Pattern]] = None
+) -> Iterator[Tuple[os.DirEntry, List[str]]]:
+    """Scan YAML files in a directory with pruning directories
+
+    A directory at the depth `i` is descended into only if its name matches
+    `dir_patterns[i]`, and files shallower than `len(dir_patterns)`
+    are skipped. Directories deeper than the patterns are scanned without
+    filters. Entries are visited in order of names.
+
+    Args:
+        path (str): path to a directory
+        dir_patterns (list): compiled patterns of directory names per depth
+
+    Returns:
+        iterator: tuples of a `os.DirEntry` of a YAML file and names of
+            directories from `path` to the file
+    """
+    dir_patterns = [] if dir_patterns is None else dir_patterns
+    # A stack of directories to scan in a depth-first order.
+    stack = [(path, [])]  # type: List[Tuple[str, List[str]]]
+    while stack:
+        dir_path, dir_names = stack.pop()
+        depth = len(dir_names)
+        try:
+            with os.scandir(dir_path) as it:
+                entries = sorted(it, key=lambda e: e.name)
+        except (FileNotFoundError, NotADirectoryError, PermissionError):
+            continue
+        sub_dirs = []
+        for entry in entries:
+            if entry.is_dir():
+                if depth < len(dir_patterns) \
+                        and not dir_patterns[depth].search(entry.name):
+                    continue
+                sub_dirs.append((entry.path, dir_names + [entry.name]))
+            elif depth >= len(dir_patterns) and entry.is_file() \
+                    and YAML_FILE_PATTERN.search(entry.name):
+                yield entry, dir_names
+        stack.extend(reversed(sub_dirs))
 
 
 def extract_diff(x: Optional[str],
@@ -171,6 +217,9 @@ def extract_diff(x: Optional[str],
     """
     x = x if x is not None else ""
     y = y if y is not None else ""
+    # Skip building a diff if the strings are equal.
+    if x == y:
+        return "" if as_str is True else []
 
     differ = difflib.Differ()
     diff = differ.compare(x.splitlines(True), y.splitlines(True))
@@ -184,6 +233,17 @@ def extract_diff(x: Optional[str],
         return only_diff
 
 
+# The C loader of libyaml is much faster than the pure Python one.
+# The pure Python one is used, if PyYAML is built without libyaml.
+_SafeLoader = getattr(yaml, "CSafeLoader", yaml.SafeLoader)
+
+# A line of a plain top-level key (e.g. 'sources:').
+TOP_LEVEL_KEY_PATTERN = re.compile(r"([A-Za-z0-9_][\w\-.]*)\s*:(\s|$)")
+
+# A line of a document start marker or a comment.
+DOCUMENT_START_PATTERN = re.compile(r"---\s*(#.*)?$")
+
+
 def load_yaml(path: str) -> str:
     """Load a YAML file
 
@@ -194,11 +254,53 @@ def load_yaml(path: str) -> str:
         dict: YAML block
     """
     with open(path, "r") as f:
-        schema_source = yaml.safe_load(f.read())
-        # If it can't parse the file, raise an exception.
-        if not isinstance(schema_source, dict):
-            raise ValueError("invalid YAML file")
-        return schema_source
+        return parse_yaml(f.read())
+
+
+def parse_yaml(text: str) -> dict:
+    """Parse a YAML string
+
+    Args:
+        text (str): YAML string
+
+    Returns:
+        dict: YAML block
+    """
+    schema_source = yaml.load(text, Loader=_SafeLoader)
+    # If it can't parse the file, raise an exception.
+    if not isinstance(schema_source, dict):
+        raise ValueError("invalid YAML file")
+    return schema_source
+
+
+def may_have_top_level_key(text: str, key: str) -> bool:
+    """Check if a YAML string may have a top-level key without parsing it
+
+    The check is conservative. It returns False only if all the top-level
+    lines are plain keys other than the key, sequence items, comments or
+    document start markers. Otherwise, e.g. flow mappings, quoted keys or
+    complex keys, it returns True.
+
+    Args:
+        text (str): YAML string
+        key (str): top-level key (e.g. 'sources')
+
+    Returns:
+        bool: False if the YAML surely doesn't have the key
+    """
+    for line in text.splitlines():
+        # Skip blank, indented and comment lines.
+        if not line or line[0] in " \t#-\r":
+            if line.startswith("---") \
+                    and not DOCUMENT_START_PATTERN.match(line):
+                return True
+            continue
+        matched = TOP_LEVEL_KEY_PATTERN.match(line)
+        if matched is None:
+            return True
+        if matched.group(1) == key:
+            return True
+    return False
 
 
 def load_json(path: str) -> str:
@@ -242,6 +344,28 @@ def strip_date_suffix(table_id: str) -> str:
         return table_id
 
 
+def get_newest_shards(table_ids: Iterable[str]) -> Dict[str, str]:
+    """Group sharded tables by the table ID without the date suffix
+
+    A table without a date suffix makes a group by itself.
+
+    Args:
+        table_ids (Iterable[str]): BigQuery table IDs
+
+    Returns:
+        dict: the newest table ID by the stripped table ID (e.g. 'events_')
+            in order of the first appearance of the groups
+    """
+    newest_shards = {}
+    for table_id in table_ids:
+        family = strip_date_suffix(table_id=table_id)
+        newest_shard = newest_shards.get(family)
+        # NOTE: Date suffixes of a family have the same length.
+        if newest_shard is None or newest_shard < table_id:
+            newest_shards[family] = table_id
+    return newest_shards
+
+
 def is_sharded_identifier(identifier: str):
     """Check if an identifier matches '_*$'.
 
@@ -268,3 +392,37 @@ def get_ruamel_yaml() -> ruamel.yaml.YAML:
     ruamel_yaml_obj.preserve_quotes = True
     ruamel_yaml_obj.indent(mapping=2, sequence=4, offset=2)
     return ruamel_yaml_obj
+
+
+def imap_unordered(
+        func: Callable[[Any], Any],
+        items: Iterable[Any],
+        concurrency: int = 1) -> Iterator[Any]:
+    """Apply a function to items with a bounded thread pool.
+
+    Results are yielded as soon as they are completed.
+    Items are consumed lazily, so that at most `concurrency * 2` items
+    are in flight at the same time.
+
+    Args:
+        func: A function to apply
+        items: items to pass to the function
+        concurrency (int): the maximum number of threads
+
+    Returns:
+        iterator: results of the function in the completion order
+    """
+    if concurrency < 1:
+        raise ValueError("concurrency must be positive: {}".format(concurrency))
+
+    max_in_flight = concurrency * 2
+    with ThreadPoolExecutor(max_workers=concurrency) as executor:
+        in_flight = set()
+        for item in items:
+            in_flight.add(executor.submit(func, item))
+            if len(in_flight) >= max_in_flight:
+                done, in_flight = wait(in_flight, return_when=FIRST_COMPLETED)
+                for future in done:
+                    yield future.result()
+        for future in as_completed(in_flight):
+            yield future.result()
@@ -0,0 +1,19 @@
+#!/bin/bash
+set -e
+
+# Run the benchmark suite and store the results by git commit.
+#
+# Usage:
+#   bash ./dev/run_benchmarks.sh [--scale small] [--case compare] ...
+#
+# Compare results between commits:
+#   python -m benchmarks.compare \
+#     benchmarks/results/${BASE_COMMIT}.json benchmarks/results/${HEAD_COMMIT}.json
+
+# Constants
+SCRIPT_DIR="$(dirname "$(readlink -f "$0")")"
+MODULE_DIR="$(dirname "$SCRIPT_DIR")"
+
+cd "$MODULE_DIR"
+COMMIT="$(git rev-parse --short HEAD)"
+python -m benchmarks.run --output "${MODULE_DIR}/benchmarks/results/${COMMIT}.json" "$@"
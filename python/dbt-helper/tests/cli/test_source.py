@@ -0,0 +1,556 @@
+# -*- coding: utf-8 -*-
+
+#
+# Licensed to the Apache Software Foundation (ASF) under one or more
+# contributor license agreements.  See the NOTICE file distributed with
+# this work for additional information regarding copyright ownership.
+# The ASF licenses this file to You under the Apache License, Version 2.0
+# (the "License"); you may not use this file except in compliance with
+# the License.  You may obtain a copy of the License at
+#
+#    http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+#
+
+from __future__ import absolute_import, division, print_function
+
+import json
+import os
+import shutil
+import tempfile
+import unittest
+from unittest import mock
+
+import requests
+from click.testing import CliRunner
+from google.api_core.exceptions import (
+    InternalServerError, NotFound, PreconditionFailed)
+from google.cloud import bigquery
+
+from dbt_helper.bigquery import (
+    API_ENDPOINT_ENV, DEFAULT_POOL_SIZE, close_shared_bigquery_clients,
+    iter_bigquery_tables)
+from dbt_helper.cache import MetadataCache
+from dbt_helper.cli import source as cli_source
+from dbt_helper.scheduler import WriteScheduler
+from dbt_helper.source_loader import parse_dbt_sources
+from dbt_helper.testing.fake_server import FakeBigQueryServer
+from dbt_helper.tools.v2.source_updater import SourceTableUpdaterV2
+from dbt_helper.utils import find_yaml_files, load_yaml
+
+SOURCE_YAML = '''
+version: 2
+sources:
+  - name: {dataset}
+    database: "{{{{ var('projects')['test-project'] }}}}"
+    description: "dataset description"
+    meta:
+      owner: data_team
+    tables:
+      - name: test_project__{dataset}__{table}
+        identifier: {table}
+        description: "table description"
+        meta:
+          contains_pii: "false"
+        columns:
+          - name: id
+            description: "ID"
+'''
+
+MULTI_SOURCE_YAML = '''
+version: 2
+sources:
+  - name: test_dataset
+    tables:
+      - name: table_0
+        description: "table description"
+        columns:
+          - name: id
+            description: "ID"
+      - name: table_1
+      - name: sharded
+        identifier: "sharded_*"
+        description: "sharded"
+  - name: another_dataset
+    tables:
+      - name: another_table_2
+        identifier: table_2
+      - name: missing
+        description: "missing"
+'''
+
+
+class FakeBigQueryClient:
+    """A fake BigQuery client which keeps tables and datasets in memory."""
+
+    def __init__(self, tables):
+        self.tables = {t.table_id: t for t in tables}
+        self.updated_tables = []
+        self.updated_datasets = []
+        self.retries = []
+        self.num_closed = 0
+
+    def get_dataset(self, dataset_ref):
+        return bigquery.Dataset(dataset_ref)
+
+    def get_table(self, table):
+        if table.table_id not in self.tables:
+            raise NotFound("{} is not found".format(table.table_id))
+        return self.tables[table.table_id]
+
+    def update_dataset(self, dataset, fields, retry=None):
+        self.retries.append(retry)
+        self.updated_datasets.append((dataset.dataset_id, fields))
+        return dataset
+
+    def update_table(self, table, fields, retry=None):
+        self.retries.append(retry)
+        self.updated_tables.append((table.table_id, fields))
+        return table
+
+    def close(self):
+        self.num_closed += 1
+
+
+def create_test_table(table_id):
+    """Create a test BigQuery table."""
+    schema = [bigquery.SchemaField("id", "INTEGER")]
+    return bigquery.Table("test-project.test_dataset.{}".format(table_id), schema=schema)
+
+
+class TestSourceCommands(unittest.TestCase):
+
+    def setUp(self):
+        self.temp_dir = tempfile.mkdtemp()
+        self.models_dir = os.path.join(self.temp_dir, "models")
+        self.vars_path = os.path.join(self.temp_dir, "vars.yml")
+        with open(self.vars_path, "w") as f:
+            f.write("projects:\n  test-project: test-project-prod\n")
+
+    def tearDown(self):
+        shutil.rmtree(self.temp_dir)
+
+    def create_source_yaml(self, dataset, table):
+        """Create a dbt source YAML file under the models dir."""
+        table_dir = os.path.join(self.models_dir, "test_project", dataset, table)
+        os.makedirs(table_dir, exist_ok=True)
+        path = os.path.join(table_dir, "src_{}.yml".format(table))
+        with open(path, "w") as f:
+            f.write(SOURCE_YAML.format(dataset=dataset, table=table))
+        return path
+
+    def test_update_from_sources(self):
+        source_paths = [
+            self.create_source_yaml("test_dataset", "table_{}".format(i)) for i in range(3)
+        ]
+        missing_path = self.create_source_yaml("test_dataset", "missing")
+        client = FakeBigQueryClient([create_test_table("table_{}".format(i)) for i in range(3)])
+        runner = CliRunner()
+        with mock.patch.object(cli_source, "get_shared_bigquery_client", return_value=client) as m:
+            result = runner.invoke(
+                cli_source.source,
+                ["update-from-sources",
+                 "--models_dir", self.models_dir,
+                 "--vars_path", self.vars_path,
+                 "--source_path", source_paths[0],
+                 "--source_paths_from_stdin",
+                 "--concurrency", "2"],
+                input="\n".join(source_paths[1:] + [missing_path]))
+        # The shared client is got only once and isn't closed.
+        self.assertEqual(m.call_count, 1)
+        self.assertEqual(m.call_args[1]["pool_size"], DEFAULT_POOL_SIZE)
+        self.assertEqual(client.num_closed, 0)
+        # The missing table is reported.
+        self.assertEqual(result.exit_code, 1)
+        self.assertTrue("patched: 7, skipped: 0, failed: 1" in result.output)
+        self.assertEqual(
+            sorted([t for t, _ in client.updated_tables]),
+            ["table_0", "table_1", "table_2"])
+        # Writes are retried by the scheduler, not by the client.
+        self.assertEqual(set(client.retries), {None})
+
+    def test_update_from_source_skips_unchanged_resources(self):
+        source_path = self.create_source_yaml("test_dataset", "table_0")
+        table = create_test_table("table_0")
+        client = FakeBigQueryClient([table])
+        runner = CliRunner()
+        args = ["update-from-source",
+                "--models_dir", self.models_dir,
+                "--vars_path", self.vars_path,
+                "--source_path", source_path]
+        with mock.patch.object(cli_source, "get_shared_bigquery_client", return_value=client):
+            result = runner.invoke(cli_source.source, args)
+        self.assertEqual(result.exit_code, 0)
+        self.assertEqual(
+            client.updated_tables, [("table_0", ["description", "labels", "schema"])])
+        self.assertTrue("patched: 2, skipped: 0, failed: 0" in result.output)
+
+        # Nothing is sent when the table is already up-to-date.
+        table.description = "table description"
+        table.labels = {"contains_pii": "false"}
+        table.schema = [bigquery.SchemaField("id", "INTEGER", description="ID")]
+        client.updated_tables = []
+        with mock.patch.object(cli_source, "get_shared_bigquery_client", return_value=client):
+            result = runner.invoke(cli_source.source, args)
+        self.assertEqual(result.exit_code, 0)
+        self.assertEqual(client.updated_tables, [])
+        self.assertTrue("patched: 1, skipped: 1, failed: 0" in result.output)
+
+    def test_drift(self):
+        for i in range(3):
+            self.create_source_yaml("test_dataset", "table_{}".format(i))
+        self.create_source_yaml("test_dataset", "missing")
+        tables = [create_test_table("table_{}".format(i)) for i in range(3)]
+        # table_0 is the same as the dbt source.
+        tables[0].description = "table description"
+        tables[0].labels = {"contains_pii": "false"}
+        tables[0].schema = [bigquery.SchemaField("id", "INTEGER", description="ID")]
+        client = FakeBigQueryClient(tables)
+        runner = CliRunner()
+        with mock.patch.object(cli_source, "get_shared_bigquery_client", return_value=client):
+            result = runner.invoke(
+                cli_source.source,
+                ["drift",
+                 "--models_dir", self.models_dir,
+                 "--vars_path", self.vars_path,
+                 "--concurrency", "2"])
+        self.assertEqual(result.exit_code, 1)
+        records = [
+            json.loads(line) for line in result.output.splitlines() if line.startswith("{")
+        ]
+        records = {r["table"]: r for r in records}
+        self.assertEqual(sorted(records.keys()), ["missing", "table_0", "table_1", "table_2"])
+        self.assertEqual(records["table_0"]["status"], "ok")
+        self.assertEqual(records["table_0"]["project"], "test-project-prod")
+        self.assertEqual(records["missing"]["status"], "error")
+        self.assertEqual(records["table_1"]["status"], "drift")
+        self.assertEqual(
+            sorted(records["table_1"]["differences"].keys()),
+            ["column_descriptions", "description", "labels"])
+        self.assertTrue("ok: 1, drift: 2, skipped: 0, error: 1" in result.output)
+
+    def test_drift_with_transport_error(self):
+        for i in range(2):
+            self.create_source_yaml("test_dataset", "table_{}".format(i))
+        client = FakeBigQueryClient([create_test_table("table_{}".format(i)) for i in range(2)])
+        get_table = client.get_table
+
+        def get_broken_table(table):
+            if table.table_id == "table_0":
+                raise requests.exceptions.ConnectionError("connection reset")
+            return get_table(table)
+
+        client.get_table = get_broken_table
+        runner = CliRunner()
+        with mock.patch.object(cli_source, "get_shared_bigquery_client", return_value=client):
+            result = runner.invoke(
+                cli_source.source,
+                ["drift", "--models_dir", self.models_dir, "--vars_path", self.vars_path])
+        # The error is reported per table and the other table is compared.
+        self.assertEqual(result.exit_code, 1, result.output)
+        records = [
+            json.loads(line) for line in result.output.splitlines() if line.startswith("{")
+        ]
+        records = {r["table"]: r for r in records}
+        self.assertEqual(records["table_0"]["status"], "error")
+        self.assertEqual(records["table_0"]["error"], "ConnectionError: connection reset")
+        self.assertEqual(records["table_1"]["status"], "drift")
+
+    def test_close_shared_bigquery_clients_at_exit(self):
+        os.makedirs(self.models_dir)
+        client = FakeBigQueryClient([])
+        runner = CliRunner()
+        with mock.patch.object(cli_source, "get_shared_bigquery_client", return_value=client), \
+                mock.patch.object(cli_source, "close_shared_bigquery_clients") as m:
+            result = runner.invoke(
+                cli_source.source,
+                ["drift", "--models_dir", self.models_dir, "--vars_path", self.vars_path])
+        self.assertEqual(result.exit_code, 0, result.output)
+        m.assert_called_once_with()
+
+    def test_update_bigquery_metadata_with_stale_cache(self):
+        cache = MetadataCache(cache_dir=os.path.join(self.temp_dir, "cache"))
+        # The cached table is outdated, but it is up to date in BigQuery.
+        stale_table = create_test_table("table_0")
+        stale_table.description = "stale description"
+        cache.put_table(stale_table)
+        table = create_test_table("table_0")
+        table.description = "table description"
+        table.labels = {"contains_pii": "false"}
+        table.schema = [bigquery.SchemaField("id", "INTEGER", description="ID")]
+        client = FakeBigQueryClient([table])
+        dbt_sources = parse_dbt_sources(
+            SOURCE_YAML.format(dataset="test_dataset", table="table_0"))
+        stats = cli_source.update_bigquery_metadata(
+            gcp_project="test-project", dbt_sources=dbt_sources, client=client, cache=cache)
+        # The table isn't patched based on the cached one.
+        self.assertEqual(client.updated_tables, [])
+        self.assertEqual(stats.failed, 0)
+
+        # A table modified after it was fetched is evicted from the cache.
+        table.description = "modified description"
+
+        def update_table(**_):
+            raise PreconditionFailed("etag mismatch")
+
+        client.update_table = update_table
+        stats = cli_source.update_bigquery_metadata(
+            gcp_project="test-project", dbt_sources=dbt_sources, client=client, cache=cache)
+        self.assertEqual(stats.failed, 1)
+        self.assertIsNone(cache.get_table("test-project.test_dataset.table_0"))
+        cache.close()
+
+    def test_update_bigquery_metadata_with_applied_retry(self):
+        client = FakeBigQueryClient([create_test_table("table_0")])
+        dbt_sources = parse_dbt_sources(
+            SOURCE_YAML.format(dataset="test_dataset", table="table_0"))
+        attempts = []
+
+        def update_table(table, fields, retry=None):  # pylint: disable=W0613
+            attempts.append(fields)
+            if len(attempts) > 1:
+                raise PreconditionFailed("etag mismatch")
+            # The first attempt fails with a server error after it is applied
+            # or the table is modified by others.
+            applied_table = bigquery.Table.from_api_repr(
+                client.tables[table.table_id].to_api_repr())
+            for f in fields:
+                setattr(applied_table, f, getattr(table, f))
+            if is_modified_by_others:
+                applied_table.description = "modified by others"
+            client.tables[table.table_id] = applied_table
+            raise InternalServerError("backendError")
+
+        client.update_table = update_table
+        for is_modified_by_others in [False, True]:
+            client.tables["table_0"] = create_test_table("table_0")
+            attempts.clear()
+            with WriteScheduler(initial_backoff=0.0) as scheduler:
+                stats = cli_source.update_bigquery_metadata(
+                    gcp_project="test-project", dbt_sources=dbt_sources, client=client,
+                    scheduler=scheduler)
+            self.assertEqual(len(attempts), 2)
+            if is_modified_by_others:
+                # The dataset is patched, but the table fails.
+                self.assertEqual((stats.patched, stats.failed), (1, 1))
+            else:
+                # 412 of the retry is caused by the first attempt itself.
+                self.assertEqual((stats.patched, stats.failed), (2, 0))
+
+    def test_drift_with_invalid_files(self):
+        self.create_source_yaml("test_dataset", "table_0")
+        # A file of an unknown project alias and a broken file
+        unknown_dir = os.path.join(self.models_dir, "unknown_project", "test_dataset", "table_1")
+        os.makedirs(unknown_dir)
+        unknown_path = os.path.join(unknown_dir, "src_table_1.yml")
+        with open(unknown_path, "w") as f:
+            f.write(SOURCE_YAML.format(dataset="test_dataset", table="table_1"))
+        broken_path = self.create_source_yaml("test_dataset", "table_2")
+        client = FakeBigQueryClient([create_test_table("table_0")])
+        runner = CliRunner()
+        with mock.patch.object(cli_source, "get_shared_bigquery_client", return_value=client), \
+                mock.patch.object(cli_source, "find_source_schema_paths",
+                                  return_value=[unknown_path, broken_path,
+                                                os.path.join(self.models_dir, "test_project",
+                                                             "test_dataset", "table_0",
+                                                             "src_table_0.yml")]):
+            with open(broken_path, "w") as f:
+                f.write("sources: [")
+            result = runner.invoke(
+                cli_source.source,
+                ["drift",
+                 "--models_dir", self.models_dir,
+                 "--vars_path", self.vars_path])
+        self.assertEqual(result.exit_code, 1)
+        records = [
+            json.loads(line) for line in result.output.splitlines() if line.startswith("{")
+        ]
+        records = {r["source_path"]: r for r in records}
+        self.assertEqual(len(records), 3)
+        self.assertEqual(records[unknown_path]["status"], "error")
+        self.assertTrue("KeyError" in records[unknown_path]["error"])
+        self.assertEqual(records[broken_path]["status"], "error")
+        self.assertTrue("skipped: 0, error: 2" in result.output)
+
+    def test_update_dbt_source_with_multiple_tables(self):
+        source_dir = os.path.join(self.models_dir, "test_project", "test_dataset", "grouped")
+        os.makedirs(source_dir)
+        source_path = os.path.join(source_dir, "src_grouped.yml")
+        with open(source_path, "w") as f:
+            f.write(MULTI_SOURCE_YAML)
+        tables = [create_test_table("table_{}".format(i)) for i in range(3)]
+        for table in tables:
+            table.description = "updated {}".format(table.table_id)
+            table.schema = [
+                bigquery.SchemaField("id", "INTEGER", description="new ID"),
+                bigquery.SchemaField("name", "STRING", description="name"),
+            ]
+        client = FakeBigQueryClient(tables)
+        runner = CliRunner()
+        with mock.patch.object(cli_source, "get_shared_bigquery_client", return_value=client):
+            result = runner.invoke(
+                cli_source.source,
+                ["update-dbt-source",
+                 "--models_dir", self.models_dir,
+                 "--vars_path", self.vars_path,
+                 "--source_path", source_path,
+                 "--concurrency", "2"])
+        # The missing table is reported, but the others are updated.
+        self.assertEqual(result.exit_code, 1)
+        self.assertTrue("missing" in result.output)
+        self.assertTrue("sharded identifier sharded_*" in result.output)
+        updater = SourceTableUpdaterV2.load(source_path)
+        tables = {table_id: block for _, table_id, block in updater.iter_tables()}
+        for table_id in ["table_0", "table_1", "table_2"]:
+            self.assertEqual(tables[table_id]["description"], "updated {}".format(table_id))
+            self.assertEqual(
+                [(c["name"], c["description"]) for c in tables[table_id]["columns"]],
+                [("id", "new ID"), ("name", "name")])
+        self.assertEqual(tables["sharded_*"]["description"], "sharded")
+        self.assertEqual(tables["missing"]["description"], "missing")
+
+    def test_importing_shards(self):
+        os.makedirs(self.models_dir)
+        with FakeBigQueryServer(page_size=2) as server:
+            schema = [{"name": "id", "type": "INTEGER", "description": "ID"}]
+            table_ids = ["events_20200101", "events_20200103", "events_20200102", "users"]
+            for table_id in table_ids:
+                server.add_table(
+                    "test-project-prod", "test_dataset", table_id, schema=schema,
+                    description=table_id)
+            environ = {API_ENDPOINT_ENV: server.url, "GOOGLE_CLOUD_PROJECT": "test-project-prod"}
+            close_shared_bigquery_clients()
+            with mock.patch.dict(os.environ, environ):
+                result = CliRunner().invoke(
+                    cli_source.source,
+                    ["importing",
+                     "--models_dir", self.models_dir,
+                     "--project", "test-project-prod",
+                     "--project_alias", "test-project",
+                     "--dataset", "test_dataset",
+                     "--table", ".*",
+                     "--is_shard"])
+            close_shared_bigquery_clients()
+            self.assertEqual(result.exit_code, 0, result.output)
+            # 2 pages of tables and the newest shard of each family.
+            self.assertEqual(server.request_counts["GET"], 2 + 2)
+        dataset_dir = os.path.join(self.models_dir, "test_project", "test_dataset")
+        self.assertEqual(sorted(os.listdir(dataset_dir)), ["events_", "users"])
+        [source_path] = find_yaml_files(os.path.join(dataset_dir, "events_"))
+        table_block = load_yaml(source_path)["sources"][0]["tables"][0]
+        self.assertEqual(table_block["identifier"], "events_*")
+        self.assertEqual(table_block["description"].strip(), "events_20200103")
+
+    def test_importing_with_cache(self):
+        os.makedirs(self.models_dir)
+        args = ["importing",
+                "--models_dir", self.models_dir,
+                "--project", "test-project-prod",
+                "--project_alias", "test-project",
+                "--dataset", "test_dataset",
+                "--table", ".*",
+                "--overwrite",
+                "--cache_dir", os.path.join(self.temp_dir, "cache")]
+        table_dir = os.path.join(self.models_dir, "test_project", "test_dataset", "table_0")
+        with FakeBigQueryServer() as server:
+            server.add_table(
+                "test-project-prod", "test_dataset", "table_0", description="original")
+            environ = {API_ENDPOINT_ENV: server.url, "GOOGLE_CLOUD_PROJECT": "test-project-prod"}
+            for description in ["original", "modified"]:
+                if description == "modified":
+                    # The table is modified within the max age of the cache.
+                    client = server.create_client("test-project-prod")
+                    table = client.get_table("test-project-prod.test_dataset.table_0")
+                    table.description = description
+                    client.update_table(table, ["description"])
+                close_shared_bigquery_clients()
+                with mock.patch.dict(os.environ, environ):
+                    result = CliRunner().invoke(cli_source.source, args)
+                close_shared_bigquery_clients()
+                self.assertEqual(result.exit_code, 0, result.output)
+                # The modified table isn't read from the cache.
+                [source_path] = find_yaml_files(table_dir)
+                table_block = load_yaml(source_path)["sources"][0]["tables"][0]
+                self.assertEqual(table_block["description"].strip(), description)
+
+    def test_importing_pipeline(self):
+        # An existing source isn't overwritten, but the others are imported.
+        os.makedirs(os.path.join(self.models_dir, "test_project", "test_dataset", "table_3"))
+        with FakeBigQueryServer(page_size=3) as server:
+            schema = [{"name": "id", "type": "INTEGER", "description": "ID"}]
+            for i in range(8):
+                server.add_table(
+                    "test-project-prod", "test_dataset", "table_{}".format(i), schema=schema,
+                    description="table {}".format(i))
+            environ = {API_ENDPOINT_ENV: server.url, "GOOGLE_CLOUD_PROJECT": "test-project-prod"}
+            close_shared_bigquery_clients()
+            with mock.patch.dict(os.environ, environ):
+                result = CliRunner().invoke(
+                    cli_source.source,
+                    ["importing",
+                     "--models_dir", self.models_dir,
+                     "--project", "test-project-prod",
+                     "--project_alias", "test-project",
+                     "--dataset", "test_dataset",
+                     "--table", ".*",
+                     "--concurrency", "3",
+                     "--render_workers", "2",
+                     "--write_workers", "2",
+                     "--queue_size", "1"])
+            close_shared_bigquery_clients()
+        self.assertEqual(result.exit_code, 1, result.output)
+        self.assertTrue("Failed to import 1 of 8 tables" in result.output)
+        # Throughput of each stage is reported.
+        self.assertTrue("list: 8 tables, 0 failed, 1 workers" in result.output)
+        self.assertTrue("fetch: 8 tables, 0 failed, 3 workers" in result.output)
+        self.assertTrue("render: 8 tables, 0 failed, 2 workers" in result.output)
+        self.assertTrue("write: 7 tables, 1 failed, 2 workers" in result.output)
+        dataset_dir = os.path.join(self.models_dir, "test_project", "test_dataset")
+        for i in range(8):
+            source_paths = list(find_yaml_files(os.path.join(dataset_dir, "table_{}".format(i))))
+            if i == 3:
+                self.assertEqual(source_paths, [])
+                continue
+            [source_path] = source_paths
+            table_block = load_yaml(source_path)["sources"][0]["tables"][0]
+            self.assertEqual(table_block["description"].strip(), "table {}".format(i))
+
+    def test_importing_with_list_error(self):
+        # Tables listed before an error are imported.
+        def iter_broken_tables(**kwargs):
+            for i, table_item in enumerate(iter_bigquery_tables(**kwargs)):
+                if i == 2:
+                    raise RuntimeError("broken page")
+                yield table_item
+
+        os.makedirs(self.models_dir)
+        with FakeBigQueryServer(page_size=2) as server:
+            for i in range(4):
+                server.add_table("test-project-prod", "test_dataset", "table_{}".format(i))
+            environ = {API_ENDPOINT_ENV: server.url, "GOOGLE_CLOUD_PROJECT": "test-project-prod"}
+            close_shared_bigquery_clients()
+            with mock.patch.dict(os.environ, environ), \
+                    mock.patch.object(cli_source, "iter_bigquery_tables", iter_broken_tables):
+                result = CliRunner().invoke(
+                    cli_source.source,
+                    ["importing",
+                     "--models_dir", self.models_dir,
+                     "--project", "test-project-prod",
+                     "--project_alias", "test-project",
+                     "--dataset", "test_dataset",
+                     "--table", ".*"])
+            close_shared_bigquery_clients()
+        self.assertEqual(result.exit_code, 1, result.output)
+        self.assertTrue(
+            "Failed to list tables in test-project-prod.test_dataset: broken page"
+            in result.output)
+        # The error isn't reported as a table.
+        self.assertFalse("Failed to import" in result.output)
+        self.assertTrue("list: 2 tables, 1 failed, 1 workers" in result.output)
+        dataset_dir = os.path.join(self.models_dir, "test_project", "test_dataset")
+        self.assertEqual(sorted(os.listdir(dataset_dir)), ["table_0", "table_1"])
@@ -20,6 +20,8 @@
 
 from __future__ import absolute_import, division, print_function
 
+import copy
+import pickle
 import unittest
 
 from google.cloud import bigquery
@@ -28,7 +30,10 @@ from dbt_helper.parser.bigquery import (
     SchemaInfo,
     parse_schema_field,
     parse_scalar_schema_field,
-    extract_schema_info
+    SchemaMemo,
+    extract_schema_info,
+    iter_schema_info,
+    schema_fingerprint,
 )
 
 scalar_schema_field = bigquery.SchemaField(
@@ -114,3 +119,84 @@ class TestBigQuery(unittest.TestCase):
             SchemaInfo(name='user.addresses.numberOfYears'),
         ]
         self.assertEqual(result, expected)
+
+    def test_iter_schema_info(self):
+        # Deeply nested fields don't hit the recursion limit.
+        schema_field = bigquery.SchemaField("leaf", "STRING")
+        for i in range(2000):
+            schema_field = bigquery.SchemaField(
+                "f{}".format(i), "RECORD", fields=[schema_field])
+        results = iter_schema_info([schema_field, scalar_schema_field])
+        first = next(results)
+        self.assertTrue(first.name.startswith("f1999.f1998."))
+        self.assertTrue(first.name.endswith(".f0.leaf"))
+        self.assertEqual(
+            list(results), [SchemaInfo(name="user_id", description="user ID")])
+        # A prefix of parent field names is prepended.
+        self.assertEqual(
+            list(iter_schema_info([scalar_schema_field], prefix="parent.")),
+            [SchemaInfo(name="parent.user_id", description="user ID")])
+        with self.assertRaises(AttributeError):
+            first.other = "other"
+
+    def test_schema_fingerprint(self):
+        schema = [scalar_schema_field, struct_schema_field]
+        fingerprint = schema_fingerprint(schema)
+        self.assertEqual(
+            fingerprint,
+            schema_fingerprint([scalar_schema_field, struct_schema_field]))
+        # Descriptions are ignored by default.
+        described = bigquery.SchemaField(
+            "user_id", "STRING", description="another")
+        self.assertEqual(
+            fingerprint, schema_fingerprint([described, struct_schema_field]))
+        self.assertNotEqual(
+            schema_fingerprint(schema, include_metadata=True),
+            schema_fingerprint(
+                [described, struct_schema_field], include_metadata=True))
+        # Types, modes and nesting are hashed.
+        other_schemas = [
+            [bigquery.SchemaField("user_id", "INTEGER"), struct_schema_field],
+            [
+                bigquery.SchemaField("user_id", "STRING", mode="REQUIRED"),
+                struct_schema_field
+            ],
+            [struct_schema_field, scalar_schema_field],
+            [
+                scalar_schema_field,
+                bigquery.SchemaField(
+                    "user",
+                    "STRUCT",
+                    fields=[
+                        bigquery.SchemaField(
+                            "wrapped",
+                            "STRUCT",
+                            fields=struct_schema_field.fields)
+                    ])
+            ],
+        ]
+        for other_schema in other_schemas:
+            self.assertNotEqual(fingerprint, schema_fingerprint(other_schema))
+
+    def test_extract_schema_info_with_memo(self):
+        memo = SchemaMemo(max_entries=1)
+        schema = [scalar_schema_field, struct_schema_field]
+        results = [extract_schema_info(schema, memo=memo) for _ in range(2)]
+        self.assertEqual(results[0], extract_schema_info(schema))
+        self.assertEqual(results[0], results[1])
+        self.assertIsNot(results[0], results[1])
+        self.assertEqual((memo.hits, memo.misses), (1, 1))
+        # The least recently used result is evicted.
+        extract_schema_info([array_schema_field], memo=memo)
+        extract_schema_info(schema, memo=memo)
+        self.assertEqual((memo.hits, memo.misses), (1, 3))
+
+    def test_schema_info_is_immutable(self):
+        schema_info = SchemaInfo(name="a", description="b")
+        with self.assertRaises(AttributeError):
+            schema_info.description = "c"
+        with self.assertRaises(AttributeError):
+            del schema_info.name
+        self.assertEqual(hash(schema_info), hash(SchemaInfo("a", "b")))
+        self.assertEqual(copy.copy(schema_info), schema_info)
+        self.assertEqual(pickle.loads(pickle.dumps(schema_info)), schema_info)
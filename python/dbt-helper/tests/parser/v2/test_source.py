@@ -25,6 +25,7 @@ import unittest
 
 from google.cloud.bigquery import SchemaField, Table
 
+from dbt_helper.parser.bigquery import SchemaMemo
 from dbt_helper.parser.v2 import source
 from dbt_helper.utils import (
     get_module_root,
@@ -105,12 +106,46 @@ class TestDbtUtils(unittest.TestCase):
         with self.assertRaises(ValueError):
             source.DbtSources.parse(yaml_block)
 
+    def test_table_get_column(self):
+        dbt_source = source.DbtSource.parse(self.yaml_block)
+        parsed_table = dbt_source.tables[0]
+        self.assertEqual(parsed_table.get_column("id").description, "ID")
+        self.assertEqual(parsed_table.get_column("updated").description, "updated timestamp")
+        self.assertIsNone(parsed_table.get_column("not_found"))
+        # The index is built once and reused.
+        self.assertIs(parsed_table.column_index, parsed_table.column_index)
+
+    def test_table_replace_columns(self):
+        parsed_table = source.DbtSource.parse(self.yaml_block).tables[0]
+        fingerprint = parsed_table.columns_fingerprint
+        # Columns can't be modified in place.
+        self.assertIsInstance(parsed_table.columns, tuple)
+        # The index and the fingerprint are rebuilt with new columns.
+        parsed_table.columns = [source.DbtSourceTableColumn(name="new")]
+        self.assertEqual(parsed_table.columns, (source.DbtSourceTableColumn(name="new"),))
+        self.assertIsNone(parsed_table.get_column("id"))
+        self.assertEqual(parsed_table.get_column("new").name, "new")
+        self.assertNotEqual(parsed_table.columns_fingerprint, fingerprint)
+
     def test_table_compare(self):
         dbt_source = source.DbtSource.parse(self.yaml_block)
         parsed_table = dbt_source.tables[0]
         result = parsed_table.compare(create_correct_bq_table())
         self.assertDictEqual(result, {})
 
+        # A column whose description is different
+        bq_table = create_correct_bq_table()
+        bq_table.schema = [
+            SchemaField("id", "INTEGER", description="ID"),
+            SchemaField("updated", "TIMESTAMP", description="modified timestamp"),
+        ]
+        result = parsed_table.compare(bq_table)
+        expected = {
+            'description of column updated is different':
+                '- updated timestamp\n+ modified timestamp',
+        }
+        self.assertDictEqual(result, expected)
+
         result = parsed_table.compare(create_wrong_bq_table())
         expected = {
             'not found column id': 'not found column id',
@@ -120,3 +155,21 @@ class TestDbtUtils(unittest.TestCase):
         }
         self.assertDictEqual(result, expected)
 
+
+    def test_table_compare_with_memo(self):
+        dbt_source = source.DbtSource.parse(self.yaml_block)
+        parsed_table = dbt_source.tables[0]
+        memo = SchemaMemo()
+        bq_table = create_wrong_bq_table()
+        expected = parsed_table.compare_details(bq_table)
+        for _ in range(2):
+            self.assertDictEqual(parsed_table.compare_details(bq_table, memo=memo), expected)
+        self.assertEqual((memo.hits, memo.misses), (1, 1))
+        # Memoized results aren't modified by callers.
+        parsed_table.compare_details(bq_table, memo=memo)["missing_columns"].clear()
+        self.assertDictEqual(parsed_table.compare_details(bq_table, memo=memo), expected)
+        # Another table with the same columns shares the result.
+        other_table = source.DbtSource.parse(self.yaml_block).tables[0]
+        self.assertEqual(other_table.columns_fingerprint, parsed_table.columns_fingerprint)
+        other_table.compare_details(bq_table, memo=memo)
+        self.assertEqual(memo.hits, 4)
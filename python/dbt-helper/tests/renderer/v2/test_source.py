@@ -20,11 +20,15 @@
 
 from __future__ import absolute_import, division, print_function
 
+import os
+import tempfile
 import unittest
 
 import yaml
 
-from dbt_helper.renderer.v2.source import _render_source_yaml_for_bq_table, get_source_yaml_file_name
+from dbt_helper.renderer.v2.source import (
+    _render_source_yaml_for_bq_table, get_source_yaml_file_name,
+    render_source_for_bq_table, write_rendered_source)
 
 
 class TestSource(unittest.TestCase):
@@ -98,3 +102,31 @@ class TestSource(unittest.TestCase):
         self.assertEqual(
             rendered_source_dict["sources"][0]["tables"][0]["columns"][1]["description"],
             "name")
+
+    def test_render_and_write_source(self):
+        with tempfile.TemporaryDirectory() as models_dir:
+            rendered_source = render_source_for_bq_table(
+                models_dir=models_dir,
+                project="dummy-project-prod",
+                project_alias="dummy-project",
+                dataset="dummy_dataset",
+                table="events_20200101",
+                table_description="events",
+                is_shard=True)
+            # Nothing is written until the rendered source is written.
+            self.assertEqual(os.listdir(models_dir), [])
+            self.assertEqual(
+                rendered_source.file_name,
+                "src_dummy_project__dummy_dataset__events_.yml")
+            table_block = yaml.safe_load(
+                rendered_source.content)["sources"][0]["tables"][0]
+            self.assertEqual(table_block["identifier"], "events_*")
+
+            path = write_rendered_source(rendered_source)
+            self.assertEqual(path, rendered_source.path)
+            with open(rendered_source.file_path, "r") as f:
+                self.assertEqual(f.read(), rendered_source.content)
+            # An existing source isn't overwritten by default.
+            with self.assertRaises(ValueError):
+                write_rendered_source(rendered_source)
+            write_rendered_source(rendered_source, overwrite=True)
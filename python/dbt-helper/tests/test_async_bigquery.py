@@ -0,0 +1,235 @@
+# -*- coding: utf-8 -*-
+
+#
+# Licensed to the Apache Software Foundation (ASF) under one or more
+# contributor license agreements.  See the NOTICE file distributed with
+# this work for additional information regarding copyright ownership.
+# The ASF licenses this file to You under the Apache License, Version 2.0
+# (the "License"); you may not use this file except in compliance with
+# the License.  You may obtain a copy of the License at
+#
+#    http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+#
+
+from __future__ import absolute_import, division, print_function
+
+import asyncio
+import threading
+import time
+import unittest
+
+from google.api_core.exceptions import NotFound
+from google.cloud import bigquery
+
+from dbt_helper.async_bigquery import AsyncBigQueryClient
+from dbt_helper.bigquery import iter_bigquery_tables
+from dbt_helper.testing.fake_server import FakeBigQueryServer
+
+
+class FakeTablePage(list):
+    """A fake page of table list items with a token of the next page."""
+
+    def __init__(self, table_items, next_page_token=None):
+        super().__init__(table_items)
+        self.next_page_token = next_page_token
+
+
+class FakeMetadataClient:
+    """A fake BigQuery client which counts concurrent calls."""
+
+    def __init__(self, table_ids, latency=0.0):
+        self.table_ids = table_ids
+        self.latency = latency
+        self.num_running = 0
+        self.max_running = 0
+        self.updated = []
+        self.page_tokens = []
+        self._lock = threading.Lock()
+
+    def _enter(self):
+        with self._lock:
+            self.num_running += 1
+            self.max_running = max(self.max_running, self.num_running)
+        time.sleep(self.latency)
+        with self._lock:
+            self.num_running -= 1
+
+    def get_dataset(self, dataset_ref):
+        self._enter()
+        if dataset_ref.dataset_id != "test_dataset":
+            raise NotFound("{} is not found".format(dataset_ref.dataset_id))
+        return bigquery.Dataset(dataset_ref)
+
+    def list_tables(self, dataset, max_results=None, page_token=None):
+        """List tables by page like `bigquery.Client.list_tables`"""
+        self._enter()
+        if dataset.dataset_id != "test_dataset":
+            raise NotFound("{} is not found".format(dataset.dataset_id))
+        self.page_tokens.append(page_token)
+        # A page token is the index of the first table of the page.
+        start = int(page_token) if page_token is not None else 0
+        end = len(self.table_ids)
+        if max_results is not None:
+            end = min(start + max_results, end)
+        next_page_token = str(end) if end < len(self.table_ids) else None
+        return FakeTablePage(
+            [
+                bigquery.table.TableListItem(
+                    {
+                        "tableReference":
+                            {
+                                "projectId": dataset.project,
+                                "datasetId": dataset.dataset_id,
+                                "tableId": table_id,
+                            }
+                    }) for table_id in self.table_ids[start:end]
+            ],
+            next_page_token=next_page_token)
+
+    def get_table(self, table):
+        self._enter()
+        if table.table_id not in self.table_ids:
+            raise NotFound("{} is not found".format(table.table_id))
+        return bigquery.Table(table)
+
+    def update_dataset(self, dataset, fields):
+        self._enter()
+        self.updated.append((dataset.dataset_id, fields))
+        return dataset
+
+    def update_table(self, table, fields):
+        self._enter()
+        self.updated.append((table.table_id, fields))
+        return table
+
+
+def run(coroutine):
+    loop = asyncio.new_event_loop()
+    try:
+        return loop.run_until_complete(coroutine)
+    finally:
+        loop.close()
+
+
+class TestAsyncBigQueryClient(unittest.TestCase):
+
+    def test_get_dataset(self):
+        client = AsyncBigQueryClient(FakeMetadataClient([]))
+        dataset = run(client.get_dataset("test-project", "test_dataset"))
+        self.assertEqual(dataset.dataset_id, "test_dataset")
+        self.assertIsNone(run(client.get_dataset("test-project", "missing")))
+        client.close()
+
+    def test_list_tables(self):
+        client = AsyncBigQueryClient(FakeMetadataClient(["a", "b"]))
+        table_items = run(client.list_tables("test-project", "test_dataset"))
+        self.assertEqual([t.table_id for t in table_items], ["a", "b"])
+        self.assertEqual(run(client.list_tables("test-project", "missing")), [])
+        client.close()
+
+    def test_list_tables_by_page(self):
+        table_ids = ["table_{}".format(i) for i in range(5)]
+        fake_client = FakeMetadataClient(table_ids)
+        table_items = iter_bigquery_tables(
+            fake_client,
+            "test-project",
+            "test_dataset",
+            table_pattern="table_[0-3]",
+            page_size=2)
+        self.assertEqual(
+            [t.table_id for t in table_items],
+            ["table_{}".format(i) for i in range(4)])
+        self.assertEqual(fake_client.page_tokens, [None, "2", "4"])
+        self.assertEqual(
+            list(
+                iter_bigquery_tables(
+                    fake_client, "test-project", "missing", page_size=2)), [])
+
+    def test_get_tables(self):
+        table_ids = ["table_{}".format(i) for i in range(20)]
+        fake_client = FakeMetadataClient(table_ids, latency=0.01)
+
+        async def get_tables():
+            async with AsyncBigQueryClient(fake_client,
+                                           concurrency=4) as client:
+                return await client.get_tables(
+                    "test-project", "test_dataset", table_ids + ["missing"])
+
+        results = run(get_tables())
+        # The results keep the order and a failure doesn't abort the others.
+        self.assertEqual([r.table_id for r in results], table_ids + ["missing"])
+        self.assertTrue(all(r.error is None for r in results[:-1]))
+        self.assertIsInstance(results[-1].error, NotFound)
+        # In-flight calls are bounded.
+        self.assertLessEqual(fake_client.max_running, 4)
+        self.assertGreater(fake_client.max_running, 1)
+
+    def test_reuse_on_another_loop(self):
+        # A client is reused by event loops one after another.
+        fake_client = FakeMetadataClient(["a", "b", "c"], latency=0.01)
+        client = AsyncBigQueryClient(fake_client, concurrency=1)
+        for _ in range(2):
+            results = run(client.get_tables("test-project", "test_dataset", ["a", "b", "c"]))
+            self.assertTrue(all(r.error is None for r in results))
+        self.assertEqual(fake_client.max_running, 1)
+        client.close()
+
+    def test_update(self):
+        fake_client = FakeMetadataClient(["a"])
+
+        async def update():
+            async with AsyncBigQueryClient(fake_client,
+                                           concurrency=2) as client:
+                dataset = await client.get_dataset(
+                    "test-project", "test_dataset")
+                table = await client.get_table(
+                    "test-project", "test_dataset", "a")
+                await asyncio.gather(
+                    client.update_dataset(dataset, ["description"]),
+                    client.update_table(table, ["labels"]))
+
+        run(update())
+        self.assertEqual(
+            sorted(fake_client.updated),
+            [("a", ["labels"]), ("test_dataset", ["description"])])
+
+    def test_invalid_concurrency(self):
+        with self.assertRaises(ValueError):
+            AsyncBigQueryClient(FakeMetadataClient([]), concurrency=0)
+
+    def test_with_fake_server(self):
+        with FakeBigQueryServer(latency=0.01) as server:
+            for i in range(10):
+                server.add_table(
+                    "test-project", "test_dataset", "table_{}".format(i))
+            fake_client = server.create_client()
+
+            async def update_descriptions():
+                async with AsyncBigQueryClient(fake_client,
+                                               concurrency=4) as client:
+                    table_items = await client.list_tables(
+                        "test-project", "test_dataset")
+                    results = await client.get_tables(
+                        "test-project", "test_dataset",
+                        [t.table_id for t in table_items])
+                    tables = [r.table for r in results]
+                    for table in tables:
+                        table.description = "updated"
+                    await asyncio.gather(
+                        *[
+                            client.update_table(table, ["description"])
+                            for table in tables
+                        ])
+
+            run(update_descriptions())
+            fake_client.close()
+            for i in range(10):
+                resource = server.get_table_resource(
+                    "test-project", "test_dataset", "table_{}".format(i))
+                self.assertEqual(resource["description"], "updated")
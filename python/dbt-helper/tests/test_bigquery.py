@@ -24,6 +24,8 @@ import unittest
 
 import yaml
 
+from google.api_core.exceptions import NotFound
+from google.auth.credentials import AnonymousCredentials
 from google.cloud import bigquery
 
 from dbt_helper.bigquery import (
@@ -33,7 +35,17 @@ from dbt_helper.bigquery import (
     replace_bq_table_metadata,
     merge_bigquery_labels,
     get_updated_table_fields,
+    get_bigquery_tables_concurrently,
+    get_changed_table_fields,
+    get_changed_dataset_fields,
+    is_labels_changed,
+    create_bigquery_client,
+    get_shared_bigquery_client,
+    close_shared_bigquery_clients,
+    get_pool_size,
+    get_pool_stats,
 )
+from dbt_helper.parser.bigquery import SchemaMemo
 from dbt_helper.parser.v2.source import DbtSources
 
 
@@ -75,6 +87,18 @@ def create_test_table(labels=None):
 
 
 # pylint: disable=C0116
+class FakeTableClient:
+    """A fake BigQuery client which only implements `get_table`."""
+
+    def __init__(self, missing_table_ids=None):
+        self.missing_table_ids = missing_table_ids if missing_table_ids else []
+
+    def get_table(self, table):
+        if table.table_id in self.missing_table_ids:
+            raise NotFound("{} is not found".format(table.table_id))
+        return bigquery.Table(table)
+
+
 def create_test_dbt_sources_yaml():
     """Create a test source schema YAML."""
     yaml_str = '''
@@ -157,6 +181,49 @@ class TestBigQuery(unittest.TestCase):
         expected = {'contains_pii': 'false', 'label1': None, 'owner': 'dummy owner'}
         self.assertDictEqual(replaced_bq_table.labels, expected)
 
+    def test_replace_bq_table_metadata_keeps_table(self):
+        yaml_block = create_test_dbt_sources_yaml()
+        dbt_source_table = DbtSources.parse(yaml_block=yaml_block).sources[0].tables[0]
+        bq_table = create_test_table(labels={"label1": "value1"})
+        bq_table._properties["etag"] = "test-etag"  # pylint: disable=W0212
+        bq_table._properties["numRows"] = "100"  # pylint: disable=W0212
+        original_resource = bq_table.to_api_repr()
+        replaced_bq_table = replace_bq_table_metadata(
+            table=bq_table, dbt_source_table=dbt_source_table)
+        # The given table is not modified.
+        self.assertDictEqual(bq_table.to_api_repr(), original_resource)
+        # The patch object has only the updated fields.
+        self.assertEqual(replaced_bq_table.reference, bq_table.reference)
+        self.assertEqual(replaced_bq_table.etag, "test-etag")
+        self.assertIsNone(replaced_bq_table.num_rows)
+        # Unchanged fields are kept.
+        self.assertEqual(replaced_bq_table.schema[1].fields[2], bq_table.schema[1].fields[2])
+
+    def test_replace_bq_table_metadata_with_memo(self):
+        yaml_block = create_test_dbt_sources_yaml()
+        dbt_source_table = DbtSources.parse(yaml_block=yaml_block).sources[0].tables[0]
+        memo = SchemaMemo()
+        # Shards with an identical schema are updated once.
+        results = [
+            replace_bq_table_metadata(
+                table=create_test_table(), dbt_source_table=dbt_source_table, memo=memo)
+            for _ in range(3)
+        ]
+        self.assertEqual((memo.hits, memo.misses), (2, 1))
+        expected = replace_bq_table_metadata(
+            table=create_test_table(), dbt_source_table=dbt_source_table)
+        for result in results:
+            self.assertEqual(result.schema, expected.schema)
+
+        # A different description isn't memoized.
+        bq_table = create_test_table()
+        bq_table.schema = [
+            bigquery.SchemaField("id", "INTEGER", description="another ID")
+        ] + bq_table.schema[1:]
+        replace_bq_table_metadata(
+            table=bq_table, dbt_source_table=dbt_source_table, memo=memo)
+        self.assertEqual((memo.hits, memo.misses), (2, 2))
+
     def test_merge_bigquery_labels(self):
         old_labels = {
             "key1": "value1",
@@ -207,3 +274,91 @@ class TestBigQuery(unittest.TestCase):
         fields = get_updated_table_fields(table)
         expected = ['description', 'labels', 'schema']
         self.assertEqual(fields, expected)
+
+    def test_get_bigquery_tables_concurrently(self):
+        client = FakeTableClient(missing_table_ids=["table_3"])
+        table_ids = ["table_{}".format(i) for i in range(10)]
+        results = get_bigquery_tables_concurrently(
+            client=client, project="test-project", dataset_id="test_dataset",
+            table_ids=table_ids, concurrency=4)
+        # The order of results is the same as the given table IDs.
+        self.assertEqual([r.table_id for r in results], table_ids)
+        for r in results:
+            if r.table_id == "table_3":
+                self.assertIsNone(r.table)
+                self.assertIsInstance(r.error, NotFound)
+            else:
+                self.assertIsNone(r.error)
+                self.assertEqual(r.table.table_id, r.table_id)
+        # Invalid concurrency
+        with self.assertRaises(ValueError):
+            get_bigquery_tables_concurrently(
+                client=client, project="test-project", dataset_id="test_dataset",
+                table_ids=table_ids, concurrency=0)
+
+    def test_get_changed_table_fields(self):
+        yaml_block = create_test_dbt_sources_yaml()
+        dbt_source_table = DbtSources.parse(yaml_block=yaml_block).sources[0].tables[0]
+        bq_table = create_test_table(labels={"label1": "value1"})
+        replaced_bq_table = replace_bq_table_metadata(
+            table=bq_table, dbt_source_table=dbt_source_table)
+        fields = get_changed_table_fields(original=bq_table, replaced=replaced_bq_table)
+        self.assertEqual(fields, ["description", "labels", "schema"])
+        # Nothing is changed
+        fields = get_changed_table_fields(original=bq_table, replaced=bq_table)
+        self.assertEqual(fields, [])
+
+    def test_get_changed_dataset_fields(self):
+        original = create_test_dataset(description="old", labels={"x": "a"})
+        replaced = create_test_dataset(description="old", labels={"x": "a"})
+        self.assertEqual(get_changed_dataset_fields(original, replaced), [])
+        replaced = create_test_dataset(description="new", labels={"x": None})
+        self.assertEqual(
+            get_changed_dataset_fields(original, replaced), ["description", "labels"])
+        # An empty description doesn't clear the dataset description.
+        replaced = create_test_dataset(description="", labels={"x": "a"})
+        self.assertEqual(get_changed_dataset_fields(original, replaced), [])
+
+    def test_is_labels_changed(self):
+        self.assertFalse(is_labels_changed({"x": "a"}, {"x": "a"}))
+        self.assertFalse(is_labels_changed({}, {"x": None}))
+        self.assertTrue(is_labels_changed({"x": "a"}, {"x": None}))
+        self.assertTrue(is_labels_changed({"x": "a"}, {"x": "b"}))
+        self.assertTrue(is_labels_changed({}, {"x": "a"}))
+
+
+class TestSharedBigQueryClient(unittest.TestCase):
+
+    def tearDown(self):
+        close_shared_bigquery_clients()
+
+    def test_create_bigquery_client(self):
+        client = create_bigquery_client(
+            project="test_project", pool_size=32, credentials=AnonymousCredentials())
+        self.assertEqual(client.project, "test_project")
+        self.assertEqual(get_pool_size(client), 32)
+        self.assertEqual(
+            get_pool_stats(client),
+            {"pool_size": 32, "connections": 0, "requests": 0, "idle_connections": 0})
+        client.close()
+
+    def test_get_shared_bigquery_client(self):
+        credentials = AnonymousCredentials()
+        client = get_shared_bigquery_client(
+            project="test_project", pool_size=32, credentials=credentials)
+        # The same client is reused per project and credentials.
+        self.assertIs(
+            get_shared_bigquery_client(project="test_project", credentials=credentials), client)
+        self.assertIsNot(
+            get_shared_bigquery_client(project="other_project", credentials=credentials),
+            client)
+        self.assertIsNot(
+            get_shared_bigquery_client(
+                project="test_project", credentials=AnonymousCredentials()),
+            client)
+        # The pool is sized only when the client is created.
+        self.assertIs(
+            get_shared_bigquery_client(
+                project="test_project", pool_size=64, credentials=credentials),
+            client)
+        self.assertEqual(get_pool_size(client), 32)
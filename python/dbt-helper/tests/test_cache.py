@@ -0,0 +1,171 @@
+# -*- coding: utf-8 -*-
+
+#
+# Licensed to the Apache Software Foundation (ASF) under one or more
+# contributor license agreements.  See the NOTICE file distributed with
+# this work for additional information regarding copyright ownership.
+# The ASF licenses this file to You under the Apache License, Version 2.0
+# (the "License"); you may not use this file except in compliance with
+# the License.  You may obtain a copy of the License at
+#
+#    http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+#
+
+from __future__ import absolute_import, division, print_function
+
+import shutil
+import tempfile
+import unittest
+
+from google.cloud import bigquery
+
+from dbt_helper.bigquery import get_bigquery_table
+from dbt_helper.cache import MetadataCache, get_validator
+
+
+class FakeClock:
+    """A fake clock to control the time."""
+
+    def __init__(self):
+        self.now = 1000000.0
+
+    def __call__(self):
+        return self.now
+
+
+class CountingClient:
+    """A fake BigQuery client which counts `get_table` calls."""
+
+    def __init__(self):
+        self.num_calls = 0
+        self.partial_requests = []
+        self.last_modified_time = "100"
+
+    def get_table(self, table):
+        self.num_calls += 1
+        bq_table = bigquery.Table(table)
+        bq_table._properties["lastModifiedTime"] = self.last_modified_time  # pylint: disable=W0212
+        bq_table._properties["creationTime"] = "1"  # pylint: disable=W0212
+        return bq_table
+
+    def _call_api(self, retry, method, path, query_params):  # pylint: disable=W0613
+        """Get a partial response of a table"""
+        self.partial_requests.append((method, path, query_params))
+        return {"lastModifiedTime": self.last_modified_time}
+
+
+def create_test_table(table_id="test_table", last_modified_time="100"):
+    """Create a test table."""
+    table = bigquery.Table(
+        "test-project.test_dataset.{}".format(table_id),
+        schema=[bigquery.SchemaField("id", "INTEGER", description="ID")])
+    table.description = "test description"
+    table._properties["lastModifiedTime"] = last_modified_time  # pylint: disable=W0212
+    table._properties["creationTime"] = "1"  # pylint: disable=W0212
+    return table
+
+
+class TestMetadataCache(unittest.TestCase):
+
+    def setUp(self):
+        self.cache_dir = tempfile.mkdtemp()
+        self.clock = FakeClock()
+        self.cache = MetadataCache(
+            cache_dir=self.cache_dir, max_age_seconds=60, max_entries=2, clock=self.clock)
+
+    def tearDown(self):
+        self.cache.close()
+        shutil.rmtree(self.cache_dir)
+
+    def test_get_validator(self):
+        resource = {"lastModifiedTime": "100", "creationTime": "1", "etag": None, "id": "x"}
+        self.assertDictEqual(
+            get_validator(resource), {"lastModifiedTime": "100", "creationTime": "1"})
+
+    def test_put_and_get_table(self):
+        self.assertIsNone(self.cache.get_table("test-project.test_dataset.test_table"))
+        self.cache.put_table(create_test_table())
+        cached = self.cache.get_table("test-project.test_dataset.test_table")
+        self.assertEqual(cached.description, "test description")
+        self.assertEqual(cached.schema[0].description, "ID")
+
+    def test_revalidate_table(self):
+        self.cache.put_table(create_test_table())
+        ref = "test-project.test_dataset.test_table"
+        # A strong validator keeps the entry valid even if it is old.
+        self.clock.now += 120
+        self.assertIsNotNone(self.cache.get_table(ref, validator={"lastModifiedTime": "100"}))
+        # A modified table is re-fetched.
+        self.assertIsNone(self.cache.get_table(ref, validator={"lastModifiedTime": "200"}))
+        # Only a weak validator is available, so the age is checked.
+        self.assertIsNone(self.cache.get_table(ref, validator={"creationTime": "1"}))
+        self.assertIsNone(self.cache.get_table(ref))
+
+    def test_evict(self):
+        for i in range(3):
+            self.clock.now += 1
+            self.cache.put_table(create_test_table(table_id="table_{}".format(i)))
+        self.cache.evict()
+        self.assertIsNone(self.cache.get_table("test-project.test_dataset.table_0"))
+        self.assertIsNotNone(self.cache.get_table("test-project.test_dataset.table_2"))
+        # Entries which are not accessed for a while are evicted.
+        self.clock.now += 120
+        self.cache.evict()
+        self.assertIsNone(
+            self.cache.get_table("test-project.test_dataset.table_2",
+                                 validator={"lastModifiedTime": "100"}))
+
+    def test_get_bigquery_table_with_cache(self):
+        client = CountingClient()
+        kwargs = {
+            "client": client,
+            "project": "test-project",
+            "dataset_id": "test_dataset",
+            "table_id": "test_table",
+            "cache": self.cache,
+        }
+        get_bigquery_table(**kwargs)
+        get_bigquery_table(validator={"lastModifiedTime": "100"}, **kwargs)
+        self.assertEqual(client.num_calls, 1)
+        get_bigquery_table(validator={"lastModifiedTime": "200"}, **kwargs)
+        self.assertEqual(client.num_calls, 2)
+        # A refreshed table is fetched regardless of the cache and stored.
+        get_bigquery_table(refresh=True, **kwargs)
+        self.assertEqual(client.num_calls, 3)
+        get_bigquery_table(validator={"lastModifiedTime": "100"}, **kwargs)
+        self.assertEqual(client.num_calls, 3)
+
+    def test_get_bigquery_table_with_weak_validator(self):
+        client = CountingClient()
+        kwargs = {
+            "client": client, "project": "test-project", "dataset_id": "test_dataset",
+            "table_id": "test_table", "cache": self.cache,
+        }
+        get_bigquery_table(**kwargs)
+        # A listed table has only a weak validator, so the cached table is
+        # revalidated with a partial response.
+        get_bigquery_table(validator={"creationTime": "1"}, **kwargs)
+        self.assertEqual(client.num_calls, 1)
+        self.assertEqual(
+            client.partial_requests,
+            [("GET", "/projects/test-project/datasets/test_dataset/tables/test_table",
+              {"fields": "lastModifiedTime,etag"})])
+        # A table modified within the max age is fetched.
+        client.last_modified_time = "200"
+        get_bigquery_table(validator={"creationTime": "1"}, **kwargs)
+        self.assertEqual((client.num_calls, len(client.partial_requests)), (2, 2))
+
+    def test_delete(self):
+        self.cache.put_table(create_test_table())
+        self.cache.delete_table("test-project.test_dataset.test_table")
+        self.assertIsNone(self.cache.get_table("test-project.test_dataset.test_table"))
+        dataset = bigquery.Dataset("test-project.test_dataset")
+        self.cache.put_dataset(dataset)
+        self.cache.delete_dataset("test-project.test_dataset")
+        self.assertIsNone(self.cache.get_dataset("test-project.test_dataset"))
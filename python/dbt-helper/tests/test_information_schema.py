@@ -0,0 +1,158 @@
+# -*- coding: utf-8 -*-
+
+#
+# Licensed to the Apache Software Foundation (ASF) under one or more
+# contributor license agreements.  See the NOTICE file distributed with
+# this work for additional information regarding copyright ownership.
+# The ASF licenses this file to You under the Apache License, Version 2.0
+# (the "License"); you may not use this file except in compliance with
+# the License.  You may obtain a copy of the License at
+#
+#    http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+#
+
+from __future__ import absolute_import, division, print_function
+
+import unittest
+
+from google.cloud import bigquery
+
+from dbt_helper.parser.bigquery import extract_schema_info
+from dbt_helper.information_schema import (
+    get_tables_metadata,
+    is_scalar_data_type,
+    parse_labels_option,
+    parse_string_option,
+    parse_struct_field_names,
+)
+
+
+def create_test_schema():
+    """Create a test schema with nested fields."""
+    return [
+        bigquery.SchemaField("id", "INTEGER", description="user ID"),
+        bigquery.SchemaField(
+            "address",
+            "RECORD",
+            mode="REPEATED",
+            fields=[
+                bigquery.SchemaField("city", "STRING", description="city"),
+                bigquery.SchemaField(
+                    "geo",
+                    "STRUCT",
+                    fields=[
+                        bigquery.SchemaField("lat", "FLOAT64"),
+                        bigquery.SchemaField("lng", "FLOAT64"),
+                    ]),
+            ],
+        ),
+        bigquery.SchemaField("created_at", "TIMESTAMP"),
+    ]
+
+
+def create_test_rows():
+    """Create rows of the INFORMATION_SCHEMA query for `create_test_schema`."""
+    geo_type = "STRUCT<lat FLOAT64, lng FLOAT64>"
+    address_type = "ARRAY<STRUCT<city STRING, geo {}>>".format(geo_type)
+    table_options = {
+        "table_name": "users",
+        "table_description": '"user table\\nwith a new line"',
+        "table_labels": '[STRUCT("owner", "data_team"), STRUCT("pii", "true")]',
+    }
+    # Nested fields in a column aren't ordered in the rows.
+    fields = [
+        (2, "address.geo.lng", "FLOAT64", None),
+        (2, "address", address_type, None),
+        (2, "address.geo", geo_type, None),
+        (2, "address.geo.lat", "FLOAT64", None),
+        (2, "address.city", "STRING", "city"),
+        (3, "created_at", "TIMESTAMP", None),
+        (1, "id", "INT64", "user ID"),
+    ]
+    rows = [
+        dict(table_options, ordinal_position=p, field_path=f, data_type=t, description=d)
+        for p, f, t, d in fields
+    ]
+    # A table without options and columns
+    rows.append({
+        "table_name": "empty",
+        "table_description": None,
+        "table_labels": None,
+        "ordinal_position": None,
+        "field_path": None,
+        "data_type": None,
+        "description": None,
+    })
+    return rows
+
+
+class FakeQueryRunner:
+    """A local stand-in to run a query."""
+
+    def __init__(self, rows):
+        self.rows = rows
+        self.queries = []
+
+    def __call__(self, query):
+        self.queries.append(query)
+        return iter(self.rows)
+
+
+class TestInformationSchema(unittest.TestCase):
+
+    def test_get_tables_metadata(self):
+        query_runner = FakeQueryRunner(create_test_rows())
+        result = get_tables_metadata(
+            query_runner=query_runner, project="test-project", dataset_id="test_dataset")
+        # It runs only a query.
+        self.assertEqual(len(query_runner.queries), 1)
+        for view in ["TABLES", "TABLE_OPTIONS", "COLUMN_FIELD_PATHS"]:
+            self.assertTrue(
+                "`test-project`.test_dataset.INFORMATION_SCHEMA.{}".format(view)
+                in query_runner.queries[0])
+        self.assertEqual([t.table_id for t in result], ["empty", "users"])
+        # Test a table without columns
+        self.assertIsNone(result[0].description)
+        self.assertDictEqual(result[0].labels, {})
+        self.assertEqual(result[0].columns, [])
+        # Test a table with nested columns
+        self.assertEqual(result[1].description, "user table\nwith a new line")
+        self.assertDictEqual(result[1].labels, {"owner": "data_team", "pii": "true"})
+        self.assertEqual(result[1].columns, extract_schema_info(create_test_schema()))
+
+    def test_get_tables_metadata_with_pattern(self):
+        query_runner = FakeQueryRunner(create_test_rows())
+        result = get_tables_metadata(
+            query_runner=query_runner, project="test-project", dataset_id="test_dataset",
+            table_pattern="^user")
+        self.assertEqual([t.table_id for t in result], ["users"])
+
+    def test_parse_struct_field_names(self):
+        self.assertEqual(
+            parse_struct_field_names(
+                "ARRAY<STRUCT<city STRING, geo STRUCT<lat FLOAT64>, price NUMERIC(10, 2)>>"),
+            ["city", "geo", "price"])
+        self.assertEqual(parse_struct_field_names("STRUCT<`select` INT64>"), ["select"])
+        self.assertEqual(parse_struct_field_names("STRING"), [])
+
+    def test_is_scalar_data_type(self):
+        self.assertTrue(is_scalar_data_type("STRING"))
+        self.assertTrue(is_scalar_data_type("ARRAY<INT64>"))
+        self.assertFalse(is_scalar_data_type("STRUCT<a STRING>"))
+        self.assertFalse(is_scalar_data_type("ARRAY< STRUCT<a STRING>>"))
+
+    def test_parse_string_option(self):
+        self.assertIsNone(parse_string_option(None))
+        self.assertEqual(parse_string_option('"a \\"quoted\\" value"'), 'a "quoted" value')
+
+    def test_parse_labels_option(self):
+        self.assertDictEqual(parse_labels_option(None), {})
+        self.assertDictEqual(
+            parse_labels_option('[STRUCT("a", "x"), STRUCT("b", "")]'),
+            {"a": "x", "b": ""})
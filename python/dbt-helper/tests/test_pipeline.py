@@ -0,0 +1,119 @@
+# -*- coding: utf-8 -*-
+
+#
+# Licensed to the Apache Software Foundation (ASF) under one or more
+# contributor license agreements.  See the NOTICE file distributed with
+# this work for additional information regarding copyright ownership.
+# The ASF licenses this file to You under the Apache License, Version 2.0
+# (the "License"); you may not use this file except in compliance with
+# the License.  You may obtain a copy of the License at
+#
+#    http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+#
+
+from __future__ import absolute_import, division, print_function
+
+import itertools
+import threading
+import time
+import unittest
+
+from dbt_helper.pipeline import Pipeline, PipelineStage
+
+
+class TestPipeline(unittest.TestCase):
+
+    def test_run(self):
+        pipeline = Pipeline(
+            stages=[
+                PipelineStage(name="double", func=lambda x: x * 2, workers=3),
+                PipelineStage(name="format", func=str, workers=2),
+            ],
+            queue_size=2,
+            source_name="list")
+        outputs = dict(pipeline.run(range(100)))
+        self.assertEqual(outputs, {i: str(i * 2) for i in range(100)})
+        self.assertEqual(pipeline.failures, [])
+        self.assertEqual(
+            [(s.name, s.workers, s.processed) for s in pipeline.stats],
+            [("list", 1, 100), ("double", 3, 100), ("format", 2, 100)])
+
+    def test_failures(self):
+
+        def check(x):
+            if len(x) % 3 == 0:
+                raise ValueError("invalid {}".format(x))
+            return x
+
+        pipeline = Pipeline(
+            stages=[PipelineStage(name="check", func=check, workers=2)])
+        outputs = dict(pipeline.run(["a", "bb", "ccc"], key_func=len))
+        # A failed item is dropped, but the others aren't affected.
+        self.assertEqual(sorted(outputs.keys()), [1, 2])
+        self.assertEqual(
+            [(f.key, f.stage) for f in pipeline.failures], [(3, "check")])
+        self.assertEqual(pipeline.stats[1].processed, 2)
+        self.assertEqual(pipeline.stats[1].failed, 1)
+
+    def test_source_failure(self):
+
+        def generate():
+            yield 1
+            raise RuntimeError("broken")
+
+        pipeline = Pipeline(
+            stages=[PipelineStage(name="identity", func=lambda x: x)])
+        self.assertEqual(list(pipeline.run(generate())), [(1, 1)])
+        self.assertEqual(
+            [(f.key, f.stage) for f in pipeline.failures], [(None, "source")])
+
+    def test_stages_overlap(self):
+        # The second stage starts before the first one finishes all items.
+        events = []
+        lock = threading.Lock()
+
+        def record(name):
+
+            def func(x):
+                time.sleep(0.01)
+                with lock:
+                    events.append(name)
+                return x
+
+            return func
+
+        pipeline = Pipeline(
+            stages=[
+                PipelineStage(name="first", func=record("first")),
+                PipelineStage(name="second", func=record("second")),
+            ],
+            queue_size=1)
+        list(pipeline.run(range(10)))
+        last_first = len(events) - 1 - events[::-1].index("first")
+        self.assertLess(events.index("second"), last_first)
+
+    def test_cancel(self):
+        # Stopping iterating outputs stops the workers of an endless source.
+        num_threads = threading.active_count()
+        pipeline = Pipeline(
+            stages=[PipelineStage(name="identity", func=lambda x: x, workers=2)],
+            queue_size=1)
+        outputs = pipeline.run(itertools.count())
+        self.assertEqual(next(outputs), (0, 0))
+        self.assertEqual(threading.active_count(), num_threads + 3)
+        outputs.close()
+        self.assertEqual(threading.active_count(), num_threads)
+
+    def test_invalid_arguments(self):
+        with self.assertRaises(ValueError):
+            Pipeline(stages=[])
+        with self.assertRaises(ValueError):
+            Pipeline(stages=[PipelineStage(name="x", func=str, workers=0)])
+        with self.assertRaises(ValueError):
+            Pipeline(stages=[PipelineStage(name="x", func=str)], queue_size=0)
@@ -0,0 +1,144 @@
+# -*- coding: utf-8 -*-
+
+#
+# Licensed to the Apache Software Foundation (ASF) under one or more
+# contributor license agreements.  See the NOTICE file distributed with
+# this work for additional information regarding copyright ownership.
+# The ASF licenses this file to You under the Apache License, Version 2.0
+# (the "License"); you may not use this file except in compliance with
+# the License.  You may obtain a copy of the License at
+#
+#    http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+#
+
+from __future__ import absolute_import, division, print_function
+
+import threading
+import time
+import unittest
+
+from google.api_core.exceptions import (
+    BadRequest, Forbidden, InternalServerError, TooManyRequests)
+
+from dbt_helper.scheduler import TokenBucket, WriteScheduler, is_retriable_error
+
+
+class FakeClock:
+
+    def __init__(self):
+        self.now = 0.0
+
+    def __call__(self):
+        return self.now
+
+
+class TestTokenBucket(unittest.TestCase):
+
+    def test_get_wait_time(self):
+        clock = FakeClock()
+        bucket = TokenBucket(capacity=5, period=10.0, clock=clock)
+        for _ in range(5):
+            self.assertEqual(bucket.get_wait_time(), 0.0)
+            bucket.acquire()
+        self.assertAlmostEqual(bucket.get_wait_time(), 2.0)
+        clock.now = 1.0
+        self.assertAlmostEqual(bucket.get_wait_time(), 1.0)
+        clock.now = 2.0
+        self.assertEqual(bucket.get_wait_time(), 0.0)
+        # Tokens don't exceed the capacity.
+        clock.now = 100.0
+        for _ in range(5):
+            bucket.acquire()
+        self.assertAlmostEqual(bucket.get_wait_time(), 2.0)
+
+
+class TestWriteScheduler(unittest.TestCase):
+
+    def test_is_retriable_error(self):
+        self.assertTrue(
+            is_retriable_error(
+                Forbidden("quota", errors=[{"reason": "rateLimitExceeded"}])))
+        self.assertTrue(is_retriable_error(TooManyRequests("too many")))
+        self.assertTrue(is_retriable_error(InternalServerError("internal")))
+        self.assertFalse(
+            is_retriable_error(Forbidden("denied", errors=[{"reason": "accessDenied"}])))
+        self.assertFalse(is_retriable_error(BadRequest("invalid")))
+        self.assertFalse(is_retriable_error(ValueError("invalid")))
+
+    def test_get_backoff(self):
+        with WriteScheduler(
+                initial_backoff=1.0, max_backoff=8.0, random_func=lambda: 0.5) as scheduler:
+            self.assertEqual(scheduler.get_backoff(0), 0.5)
+            self.assertEqual(scheduler.get_backoff(2), 2.0)
+            self.assertEqual(scheduler.get_backoff(10), 4.0)
+
+    def test_submit_with_retries(self):
+        attempts = []
+
+        def write():
+            attempts.append(1)
+            if len(attempts) < 3:
+                raise Forbidden("quota", errors=[{"reason": "rateLimitExceeded"}])
+            return "done"
+
+        with WriteScheduler(initial_backoff=0.01, max_backoff=0.01) as scheduler:
+            future = scheduler.submit("project.dataset.table", write)
+            self.assertEqual(future.result(timeout=10), "done")
+        self.assertEqual(len(attempts), 3)
+
+    def test_submit_with_too_many_retries(self):
+
+        def write():
+            raise InternalServerError("internal")
+
+        with WriteScheduler(max_retries=2, initial_backoff=0.01) as scheduler:
+            future = scheduler.submit("project.dataset.table", write)
+            with self.assertRaises(InternalServerError):
+                future.result(timeout=10)
+
+    def test_submit_with_non_retriable_error(self):
+        attempts = []
+
+        def write():
+            attempts.append(1)
+            raise BadRequest("invalid")
+
+        with WriteScheduler(initial_backoff=0.01) as scheduler:
+            future = scheduler.submit("project.dataset.table", write)
+            with self.assertRaises(BadRequest):
+                future.result(timeout=10)
+        self.assertEqual(len(attempts), 1)
+
+    def test_rate_limit_per_resource(self):
+        written_at = {}
+        lock = threading.Lock()
+
+        def write(key):
+            with lock:
+                written_at.setdefault(key, []).append(time.monotonic())
+
+        # 2 writes per 0.2 seconds per resource.
+        with WriteScheduler(
+                concurrency=2, resource_capacity=2, resource_period=0.2) as scheduler:
+            started_at = time.monotonic()
+            futures = [scheduler.submit("slow", write, "slow") for _ in range(4)]
+            futures.append(scheduler.submit("other", write, "other"))
+            for future in futures:
+                future.result(timeout=10)
+        self.assertEqual(len(written_at["slow"]), 4)
+        # The third and fourth writes wait for tokens.
+        self.assertGreaterEqual(written_at["slow"][3] - started_at, 0.15)
+        # Other resources don't wait for the throttled one.
+        self.assertLess(written_at["other"][0], written_at["slow"][2])
+
+    def test_submit_after_shutdown(self):
+        scheduler = WriteScheduler()
+        scheduler.shutdown()
+        with self.assertRaises(RuntimeError):
+            scheduler.submit("project.dataset.table", lambda: None)
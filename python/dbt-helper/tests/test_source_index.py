@@ -0,0 +1,181 @@
+# -*- coding: utf-8 -*-
+
+#
+# Licensed to the Apache Software Foundation (ASF) under one or more
+# contributor license agreements.  See the NOTICE file distributed with
+# this work for additional information regarding copyright ownership.
+# The ASF licenses this file to You under the Apache License, Version 2.0
+# (the "License"); you may not use this file except in compliance with
+# the License.  You may obtain a copy of the License at
+#
+#    http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+#
+
+from __future__ import absolute_import, division, print_function
+
+import os
+import shutil
+import tempfile
+import unittest
+from unittest import mock
+
+from dbt_helper.renderer.v2.source import (
+    find_source_schema_paths, has_source_tables)
+from dbt_helper.source_index import SourceIndex, SourceIndexEntry
+
+SOURCE_YAML = """version: 2
+sources:
+  - name: {dataset}
+    tables:
+      - name: {table}
+"""
+
+MODEL_YAML = """version: 2
+models:
+  - name: test_model
+"""
+
+
+class TestSourceIndex(unittest.TestCase):
+
+    def setUp(self):
+        self.temp_dir = tempfile.mkdtemp()
+        self.models_dir = os.path.join(self.temp_dir, "models")
+        self.index_path = os.path.join(
+            self.temp_dir, "cache", "source_index.json")
+
+    def tearDown(self):
+        shutil.rmtree(self.temp_dir)
+
+    def write_file(self, relative_path, content):
+        path = os.path.join(self.models_dir, relative_path)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        with open(path, "w") as f:
+            f.write(content)
+        return path
+
+    def test_save_and_load(self):
+        index = SourceIndex(path=self.index_path, models_dir=self.models_dir)
+        entry = SourceIndexEntry(
+            mtime_ns=1,
+            size=2,
+            has_tables=True,
+            project_alias="project",
+            dataset="dataset",
+            table="table")
+        index.put(relative_path="project/dataset/table/a.yml", entry=entry)
+        index.save()
+
+        loaded = SourceIndex.load(
+            path=self.index_path, models_dir=self.models_dir)
+        self.assertEqual(
+            loaded.get(
+                relative_path="project/dataset/table/a.yml", mtime_ns=1,
+                size=2), entry)
+        # Stale entries are ignored.
+        self.assertIsNone(
+            loaded.get(
+                relative_path="project/dataset/table/a.yml", mtime_ns=1,
+                size=3))
+        # An index of another models directory is discarded.
+        other = SourceIndex.load(path=self.index_path, models_dir=self.temp_dir)
+        self.assertEqual(len(other.entries), 0)
+
+    def test_load_broken_file(self):
+        os.makedirs(os.path.dirname(self.index_path))
+        with open(self.index_path, "w") as f:
+            f.write("{broken")
+        index = SourceIndex.load(
+            path=self.index_path, models_dir=self.models_dir)
+        self.assertEqual(len(index.entries), 0)
+
+    def test_find_source_schema_paths(self):
+        source_path = self.write_file(
+            "project/dataset/table/source.yml",
+            SOURCE_YAML.format(dataset="dataset", table="table"))
+        self.write_file(
+            "project/dataset/other_table/source.yml",
+            SOURCE_YAML.format(dataset="dataset", table="other_table"))
+        self.write_file("project/dataset/table/model.yml", MODEL_YAML)
+        self.write_file("project/top_level.yml", MODEL_YAML)
+
+        with mock.patch(
+                "dbt_helper.renderer.v2.source.has_source_tables",
+                wraps=has_source_tables) \
+                as mock_has_source_tables:
+            paths = list(
+                find_source_schema_paths(
+                    models_dir=self.models_dir,
+                    table="^table$",
+                    index_path=self.index_path))
+            self.assertEqual(paths, [source_path])
+            # Files which don't match the patterns aren't opened.
+            self.assertEqual(mock_has_source_tables.call_count, 2)
+            self.assertTrue(os.path.isfile(self.index_path))
+
+            # Unchanged files are taken from the index.
+            mock_has_source_tables.reset_mock()
+            paths = list(
+                find_source_schema_paths(
+                    models_dir=self.models_dir,
+                    table="^table$",
+                    index_path=self.index_path))
+            self.assertEqual(paths, [source_path])
+            self.assertEqual(mock_has_source_tables.call_count, 0)
+
+            # Changed files are parsed again.
+            self.write_file(
+                "project/dataset/table/source.yml",
+                SOURCE_YAML.format(dataset="dataset", table="renamed_table"))
+            paths = list(
+                find_source_schema_paths(
+                    models_dir=self.models_dir,
+                    table="^table$",
+                    index_path=self.index_path))
+            self.assertEqual(paths, [source_path])
+            self.assertEqual(mock_has_source_tables.call_count, 1)
+
+    def test_find_source_schema_paths_prunes_deleted_files(self):
+        self.write_file(
+            "project/dataset/table/source.yml",
+            SOURCE_YAML.format(dataset="dataset", table="table"))
+        other_path = self.write_file(
+            "project/dataset/other_table/source.yml",
+            SOURCE_YAML.format(dataset="dataset", table="other_table"))
+        list(
+            find_source_schema_paths(
+                models_dir=self.models_dir, index_path=self.index_path))
+        os.remove(os.path.join(self.models_dir, "project/dataset/table/source.yml"))
+        os.remove(other_path)
+        # Only entries in the scanned directories are removed.
+        list(
+            find_source_schema_paths(
+                models_dir=self.models_dir,
+                table="^table$",
+                index_path=self.index_path))
+        index = SourceIndex.load(
+            path=self.index_path, models_dir=self.models_dir)
+        self.assertEqual(
+            sorted(index.entries.keys()),
+            [os.path.join("project", "dataset", "other_table", "source.yml")])
+
+    def test_find_source_schema_paths_saves_index_when_stopped(self):
+        for table in ["table_0", "table_1"]:
+            self.write_file(
+                "project/dataset/{}/source.yml".format(table),
+                SOURCE_YAML.format(dataset="dataset", table=table))
+        paths = find_source_schema_paths(
+            models_dir=self.models_dir, index_path=self.index_path)
+        next(paths)
+        paths.close()
+        index = SourceIndex.load(
+            path=self.index_path, models_dir=self.models_dir)
+        self.assertEqual(
+            sorted(index.entries.keys()),
+            [os.path.join("project", "dataset", "table_0", "source.yml")])
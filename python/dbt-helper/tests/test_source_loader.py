@@ -0,0 +1,128 @@
+# -*- coding: utf-8 -*-
+
+#
+# Licensed to the Apache Software Foundation (ASF) under one or more
+# contributor license agreements.  See the NOTICE file distributed with
+# this work for additional information regarding copyright ownership.
+# The ASF licenses this file to You under the Apache License, Version 2.0
+# (the "License"); you may not use this file except in compliance with
+# the License.  You may obtain a copy of the License at
+#
+#    http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+#
+
+from __future__ import absolute_import, division, print_function
+
+import os
+import shutil
+import tempfile
+import unittest
+from unittest import mock
+
+from dbt_helper.source_loader import DbtSourcesLoader
+
+SOURCE_YAML = b"""version: 2
+sources:
+  - name: test_dataset
+    tables:
+      - name: test_table
+"""
+
+MODEL_YAML = b"""version: 2
+models:
+  - name: test_model
+"""
+
+
+class TestDbtSourcesLoader(unittest.TestCase):
+
+    def setUp(self):
+        self.temp_dir = tempfile.mkdtemp()
+
+    def tearDown(self):
+        shutil.rmtree(self.temp_dir)
+
+    def write_file(self, name, content):
+        path = os.path.join(self.temp_dir, name)
+        with open(path, "wb") as f:
+            f.write(content)
+        return path
+
+    def test_load(self):
+        loader = DbtSourcesLoader(max_entries=1)
+        path = self.write_file("a.yml", SOURCE_YAML)
+        copied_path = self.write_file("b.yml", SOURCE_YAML)
+        dbt_sources = loader.load(path)
+        self.assertEqual(dbt_sources.sources[0].tables[0].name, "test_table")
+        # The same contents are parsed only once.
+        self.assertIs(loader.load(copied_path), dbt_sources)
+        self.assertEqual((loader.hits, loader.misses), (1, 1))
+
+        # Non-source YAML files raise ValueError even if they are cached.
+        model_path = self.write_file("model.yml", MODEL_YAML)
+        for _ in range(2):
+            with self.assertRaises(ValueError):
+                loader.load(model_path)
+        self.assertEqual((loader.hits, loader.misses), (2, 2))
+
+        # The least recently used entry is evicted.
+        self.assertIsNot(loader.load(path), dbt_sources)
+        self.assertEqual((loader.hits, loader.misses), (2, 3))
+
+    def test_load_with_cache_dir(self):
+        cache_dir = os.path.join(self.temp_dir, "cache")
+        path = self.write_file("a.yml", SOURCE_YAML)
+        expected = DbtSourcesLoader(cache_dir=cache_dir).load(path)
+
+        # Another process loads the pickled result without parsing.
+        with mock.patch("dbt_helper.source_loader.parse_yaml") as parse_yaml:
+            dbt_sources = DbtSourcesLoader(cache_dir=cache_dir).load(path)
+            parse_yaml.assert_not_called()
+        self.assertEqual(dbt_sources, expected)
+
+        # A broken pickle is ignored.
+        for root, _, files in os.walk(cache_dir):
+            for name in files:
+                with open(os.path.join(root, name), "wb") as f:
+                    f.write(b"broken")
+        dbt_sources = DbtSourcesLoader(cache_dir=cache_dir).load(path)
+        self.assertEqual(dbt_sources, expected)
+
+    def test_evict_pickles(self):
+        cache_dir = os.path.join(self.temp_dir, "cache")
+        # Pickles of an old format version are removed.
+        old_path = os.path.join(cache_dir, "v1", "00", "00.pickle")
+        os.makedirs(os.path.dirname(old_path))
+        with open(old_path, "wb") as f:
+            f.write(b"old")
+
+        loader = DbtSourcesLoader(cache_dir=cache_dir, max_pickles=2)
+        contents = [
+            SOURCE_YAML.replace(b"test_table", "table_{}".format(i).encode())
+            for i in range(3)
+        ]
+        for content in contents[:2]:
+            loader.loads(content)
+        # Make the pickles old.
+        for root, _, files in os.walk(cache_dir):
+            for name in files:
+                os.utime(os.path.join(root, name), (0, 0))
+        self.assertFalse(os.path.exists(os.path.dirname(old_path)))
+
+        # A loaded pickle is the most recently used one.
+        DbtSourcesLoader(cache_dir=cache_dir).loads(contents[0])
+        loader.loads(contents[2])
+        # The least recently used pickle is evicted.
+        with mock.patch("dbt_helper.source_loader.parse_yaml") as parse_yaml:
+            another_loader = DbtSourcesLoader(cache_dir=cache_dir)
+            another_loader.loads(contents[0])
+            another_loader.loads(contents[2])
+            parse_yaml.assert_not_called()
+        num_pickles = sum(len(files) for _, _, files in os.walk(cache_dir))
+        self.assertEqual(num_pickles, 2)
@@ -19,9 +19,14 @@
 
 
 import os
+import re
+import shutil
+import tempfile
 import unittest
+from unittest import mock
 
 import ruamel
+import yaml
 
 from dbt_helper.utils import (
     get_module_root,
@@ -30,12 +35,17 @@ from dbt_helper.utils import (
     normalize_gcp_project,
     parse_labels,
     find_yaml_files,
+    scan_yaml_files,
     extract_diff,
     strip_date_suffix,
+    get_newest_shards,
     load_yaml,
+    parse_yaml,
+    may_have_top_level_key,
     load_json,
     is_sharded_identifier,
     get_ruamel_yaml,
+    imap_unordered,
 )
 
 
@@ -78,6 +88,74 @@ class TestUtils(unittest.TestCase):
         expected = 2
         self.assertEqual(len(result), expected)
 
+    def test_scan_yaml_files(self):
+        temp_dir = tempfile.mkdtemp()
+        try:
+            for relative_path in ["top.yml", "project/dataset/table/a.yml",
+                                  "project/dataset/table/nested/b.yaml",
+                                  "project/dataset/table/c.txt",
+                                  "project/other_dataset/table/d.yml"]:
+                path = os.path.join(temp_dir, relative_path)
+                os.makedirs(os.path.dirname(path), exist_ok=True)
+                with open(path, "w") as f:
+                    f.write("version: 2\n")
+            result = [
+                (entry.name, dir_names)
+                for entry, dir_names in scan_yaml_files(temp_dir)
+            ]
+            self.assertEqual(len(result), 4)
+
+            dir_patterns = [
+                re.compile(".*"),
+                re.compile("^dataset$"),
+                re.compile(".*")
+            ]
+            with mock.patch("os.scandir", wraps=os.scandir) as scandir:
+                result = [
+                    (entry.name, dir_names)
+                    for entry, dir_names in scan_yaml_files(
+                        temp_dir, dir_patterns=dir_patterns)
+                ]
+                expected = [
+                    ("a.yml", ["project", "dataset", "table"]),
+                    ("b.yaml", ["project", "dataset", "table", "nested"]),
+                ]
+                self.assertEqual(result, expected)
+                # 'other_dataset' isn't scanned.
+                self.assertEqual(scandir.call_count, 5)
+        finally:
+            shutil.rmtree(temp_dir)
+
+    def test_parse_yaml(self):
+        self.assertEqual(parse_yaml("a: 1\nb: [x]\n"), {"a": 1, "b": ["x"]})
+        with self.assertRaises(ValueError):
+            parse_yaml("- a\n- b\n")
+        # The result is the same as the one of the pure Python loader.
+        path = os.path.join(
+            get_module_root(), "tests", "fixtures", "v2",
+            "test_source_schema.yml")
+        with mock.patch("dbt_helper.utils._SafeLoader", yaml.SafeLoader):
+            expected = load_yaml(path)
+        self.assertEqual(load_yaml(path), expected)
+
+    def test_may_have_top_level_key(self):
+        test_cases = [
+            ("version: 2\nsources:\n  - name: x\n", True),
+            ("---\nversion: 2\nsources: []\n", True),
+            ("version: 2\nmodels:\n  - name: sources\n", False),
+            ("# sources:\nversion: 2\n", False),
+            ("version: 2\nmodels:\n- name: x\n", False),
+            ("", False),
+            # It can't tell without parsing them.
+            ("{version: 2, models: []}\n", True),
+            ('"sources": []\n', True),
+            ("--- {sources: []}\n", True),
+        ]
+        for text, expected in test_cases:
+            self.assertEqual(
+                may_have_top_level_key(text=text, key="sources"), expected,
+                text)
+
     def test_extract_diff(self):
         x = "a\nb\nc\n\n"
         y = "a\nx\nc\nd"
@@ -90,6 +168,24 @@ class TestUtils(unittest.TestCase):
         expected = '- b\n\n+ x\n\n- \n\n+ d'
         self.assertEqual(result, expected)
 
+        # Equal strings
+        self.assertEqual(extract_diff(x, x), [])
+        self.assertEqual(extract_diff(None, "", as_str=True), "")
+
+    def test_get_newest_shards(self):
+        table_ids = [
+            "events_20200102", "events_20200101", "users", "events_20191231",
+            "logs_20200101"
+        ]
+        expected = {
+            "events_": "events_20200102",
+            "users": "users",
+            "logs_": "logs_20200101",
+        }
+        self.assertEqual(get_newest_shards(table_ids), expected)
+        self.assertEqual(
+            list(get_newest_shards(table_ids).keys()), list(expected.keys()))
+
     def test_strip_date_suffix(self):
         self.assertEqual(strip_date_suffix('test_table_1'),
                          'test_table_1')
@@ -131,3 +227,19 @@ class TestUtils(unittest.TestCase):
     def test_get_ruamel_yaml(self):
         ruamel_yaml = get_ruamel_yaml()
         self.assertTrue(isinstance(ruamel_yaml, ruamel.yaml.main.YAML))
+
+    def test_imap_unordered(self):
+        consumed = []
+
+        def items():
+            for i in range(20):
+                consumed.append(i)
+                yield i
+
+        results = imap_unordered(lambda x: x * 2, items(), concurrency=2)
+        first = next(results)
+        # Items are consumed lazily.
+        self.assertTrue(len(consumed) <= 4)
+        self.assertEqual(sorted([first] + list(results)), [i * 2 for i in range(20)])
+        with self.assertRaises(ValueError):
+            list(imap_unordered(lambda x: x, [1], concurrency=0))
@@ -0,0 +1,152 @@
+# -*- coding: utf-8 -*-
+
+#
+# Licensed to the Apache Software Foundation (ASF) under one or more
+# contributor license agreements.  See the NOTICE file distributed with
+# this work for additional information regarding copyright ownership.
+# The ASF licenses this file to You under the Apache License, Version 2.0
+# (the "License"); you may not use this file except in compliance with
+# the License.  You may obtain a copy of the License at
+#
+#    http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+#
+
+from __future__ import absolute_import, division, print_function
+
+import os
+import unittest
+from unittest import mock
+
+from google.api_core.exceptions import BadRequest, Forbidden, NotFound, PreconditionFailed
+
+from dbt_helper.bigquery import (
+    API_ENDPOINT_ENV,
+    create_bigquery_client,
+    drop_bigquery_dataset,
+    get_bigquery_dataset,
+    get_bigquery_table_items,
+    iter_bigquery_tables,
+    get_pool_stats,
+)
+from dbt_helper.scheduler import WriteScheduler
+from dbt_helper.testing.fake_server import FakeBigQueryServer
+
+SCHEMA = [
+    {"name": "id", "type": "INTEGER", "mode": "NULLABLE"},
+    {"name": "user", "type": "RECORD", "mode": "NULLABLE", "fields": [
+        {"name": "name", "type": "STRING", "mode": "NULLABLE", "description": "name"},
+    ]},
+]
+
+
+class TestFakeBigQueryServer(unittest.TestCase):
+
+    def setUp(self):
+        self.server = FakeBigQueryServer(page_size=2)
+        self.server.start()
+        self.server.add_dataset("test-project", "test_dataset", description="dataset")
+        for i in range(5):
+            self.server.add_table(
+                "test-project", "test_dataset", "table_{}".format(i),
+                schema=SCHEMA, labels={"owner": "a"})
+        self.client = self.server.create_client()
+
+    def tearDown(self):
+        self.client.close()
+        self.server.stop()
+
+    def test_get_dataset_and_table(self):
+        dataset = get_bigquery_dataset(self.client, "test-project", "test_dataset")
+        self.assertEqual(dataset.description, "dataset")
+        self.assertIsNone(get_bigquery_dataset(self.client, "test-project", "missing"))
+        table = self.client.get_table("test-project.test_dataset.table_0")
+        self.assertEqual(table.schema[1].fields[0].description, "name")
+        self.assertEqual(table.labels, {"owner": "a"})
+        with self.assertRaises(NotFound):
+            self.client.get_table("test-project.test_dataset.missing")
+
+    def test_list_tables_with_paging(self):
+        table_items = get_bigquery_table_items(self.client, "test-project", "test_dataset")
+        self.assertEqual(
+            [t.table_id for t in table_items], ["table_{}".format(i) for i in range(5)])
+        # 3 pages of 2 tables without a request to get the dataset.
+        self.assertEqual(self.server.request_counts["GET"], 3)
+
+    def test_iter_bigquery_tables(self):
+        table_items = iter_bigquery_tables(
+            self.client, "test-project", "test_dataset", table_pattern="_[13]$",
+            page_size=1)
+        # Items are yielded as soon as a page arrives.
+        self.assertEqual(next(table_items).table_id, "table_1")
+        self.assertEqual(self.server.request_counts["GET"], 2)
+        self.assertEqual([t.table_id for t in table_items], ["table_3"])
+        self.assertEqual(self.server.request_counts["GET"], 5)
+        # A missing dataset has no tables.
+        self.assertEqual(
+            list(iter_bigquery_tables(self.client, "test-project", "missing")), [])
+
+    def test_patch_table(self):
+        table = self.client.get_table("test-project.test_dataset.table_0")
+        table.description = "updated"
+        table.labels = {"owner": None, "team": "b"}
+        updated = self.client.update_table(table, ["description", "labels"])
+        self.assertEqual(updated.description, "updated")
+        self.assertEqual(updated.labels, {"team": "b"})
+        self.assertNotEqual(updated.etag, table.etag)
+        # A stale etag is rejected.
+        table.description = "stale"
+        with self.assertRaises(PreconditionFailed):
+            self.client.update_table(table, ["description"])
+        resource = self.server.get_table_resource("test-project", "test_dataset", "table_0")
+        self.assertEqual(resource["description"], "updated")
+
+    def test_patch_dataset(self):
+        dataset = self.client.get_dataset("test-project.test_dataset")
+        dataset.labels = {"owner": "a"}
+        updated = self.client.update_dataset(dataset, ["labels"])
+        self.assertEqual(updated.labels, {"owner": "a"})
+
+    def test_delete(self):
+        self.client.delete_table("test-project.test_dataset.table_0")
+        self.assertIsNone(
+            self.server.get_table_resource("test-project", "test_dataset", "table_0"))
+        # A non-empty dataset isn't dropped.
+        with self.assertRaises(BadRequest):
+            self.client.delete_dataset("test-project.test_dataset")
+        for i in range(1, 5):
+            self.client.delete_table("test-project.test_dataset.table_{}".format(i))
+        drop_bigquery_dataset(self.client, "test-project", "test_dataset")
+        self.assertIsNone(self.server.get_dataset_resource("test-project", "test_dataset"))
+
+    def test_inject_error(self):
+        self.server.inject_error(
+            code=403, reason="rateLimitExceeded", method="PATCH", count=2)
+        table = self.client.get_table("test-project.test_dataset.table_0")
+        table.description = "updated"
+        with self.assertRaises(Forbidden) as context:
+            self.client.update_table(table, ["description"], retry=None)
+        self.assertEqual(context.exception.errors[0]["reason"], "rateLimitExceeded")
+        # The scheduler retries the rest of the injected errors.
+        with WriteScheduler(initial_backoff=0.01) as scheduler:
+            future = scheduler.submit(
+                "test-project.test_dataset.table_0", self.client.update_table,
+                table, ["description"], retry=None)
+            self.assertEqual(future.result(timeout=10).description, "updated")
+        self.assertEqual(self.server.request_counts["PATCH"], 3)
+
+    def test_create_bigquery_client_with_endpoint(self):
+        with mock.patch.dict(os.environ, {API_ENDPOINT_ENV: self.server.url}):
+            client = create_bigquery_client(project="test-project", pool_size=4)
+        for i in range(3):
+            client.get_table("test-project.test_dataset.table_{}".format(i))
+        stats = get_pool_stats(client)
+        # Connections are reused.
+        self.assertEqual(stats["requests"], 3)
+        self.assertEqual(stats["connections"], 1)
+        client.close()
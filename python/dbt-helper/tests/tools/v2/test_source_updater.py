@@ -20,13 +20,14 @@
 
 from __future__ import absolute_import, division, print_function
 
+import io
 import os
 import unittest
 import tempfile
 
 from google.cloud import bigquery
 
-from dbt_helper.utils import get_module_root
+from dbt_helper.utils import get_module_root, get_ruamel_yaml
 from dbt_helper.tools.v2.source_updater import SourceTableUpdaterV2
 
 
@@ -106,3 +107,58 @@ class TestSourceUpdatorV2(unittest.TestCase):
         # Load the dumped YAML file.
         loaded = SourceTableUpdaterV2.load(temp_file)
         self.assertEqual(loaded.table_description, "updated description")
+
+    def test_update_columns_order_and_comments(self):
+        yaml = get_ruamel_yaml()
+        data = yaml.load(
+            """version: 2
+sources:
+  - name: test_dataset
+    tables:
+      - name: test_table
+        columns:
+          - name: a  # comment of a
+          - name: removed_1
+          - name: removed_2
+          - name: b
+            description: B
+""")
+        updater = SourceTableUpdaterV2.loads(data)
+        schema = [
+            bigquery.SchemaField("new_0", "STRING"),
+            bigquery.SchemaField("a", "STRING", description="A"),
+            bigquery.SchemaField("new_1", "STRING"),
+            bigquery.SchemaField("new_2", "STRING"),
+            bigquery.SchemaField("b", "STRING"),
+        ]
+        updater.update_columns(schema)
+        # Adjacent columns are removed, and new columns keep their order.
+        self.assertEqual(
+            [c["name"] for c in updater.columns],
+            ["new_0", "a", "new_1", "new_2", "b"])
+        self.assertEqual(updater.columns[1]["description"], "A")
+        self.assertEqual(updater.columns[4]["description"], "B")
+        stream = io.StringIO()
+        yaml.dump(updater.data, stream)
+        self.assertIn("- name: a  # comment of a", stream.getvalue())
+
+    def test_validate_sources(self):
+        yaml = get_ruamel_yaml()
+        data = yaml.load(
+            """version: 2
+sources:
+  - name: dataset_1
+    tables:
+      - name: table_1
+      - name: table_2
+        identifier: table_2_alias
+  - name: dataset_2
+""")
+        self.assertTrue(SourceTableUpdaterV2.validate_sources(data))
+        updater = SourceTableUpdaterV2.loads(data)
+        self.assertEqual(
+            [(d, t) for d, t, _ in updater.iter_tables()],
+            [("dataset_1", "table_1"), ("dataset_1", "table_2_alias")])
+        with self.assertRaises(ValueError):
+            SourceTableUpdaterV2.validate_sources(
+                yaml.load("sources:\n  - name: dataset_1\n"))